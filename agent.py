@@ -5,23 +5,21 @@ from langchain.agents import AgentType, initialize_agent, AgentExecutor
 from langchain.agents.tools import Tool
 from langchain.chat_models import ChatOpenAI
 #from langchain.tools.tavily_search import TavilySearchResults
-from langchain.utilities.duckduckgo_search import DuckDuckGoSearchAPIWrapper
-from langchain.tools import DuckDuckGoSearchResults
 #from langchain.utilities.tavily_search import TavilySearchAPIWrapper
 from langchain.chains.conversation.memory import ConversationBufferWindowMemory
-from vector_storage import ZillizVectorDatabase
+from vector_storage import ZillizVectorDatabase, get_vector_db
 from langchain.prompts import PromptTemplate
 
-from constant import LLM_MODEL_4
+from constant import get_generate_llm
+from prompt import AGENT_PREFIX_PROMPT as AGENT_PREFIX_TEMPLATE
+from web_searcher import get_ddg_tool
 
-AGENT_PREFIX_PROMPT = PromptTemplate(
-    
-)
+AGENT_PREFIX_PROMPT = PromptTemplate.from_template(AGENT_PREFIX_TEMPLATE)
 
 
 class ResearchAssistant:
     agent: AgentExecutor | None = None
-    llm_model: ChatOpenAI = LLM_MODEL_4
+    llm_model: ChatOpenAI
     greeting_message: str = ""
     conversational_memory: ConversationBufferWindowMemory
     vector_db: ZillizVectorDatabase
@@ -33,6 +31,7 @@ class ResearchAssistant:
         using_tavily: bool = True,
     ):
         self.assistant_name = name
+        self.llm_model = get_generate_llm()
         self.conversational_memory = ConversationBufferWindowMemory(
             memory_key="chat_history",
             k=5,
@@ -40,16 +39,21 @@ class ResearchAssistant:
             output_key="output"
         )
         if using_ddg:
-            ddg_search = DuckDuckGoSearchAPIWrapper(max_results = 100)
-            self.ddg_tool = DuckDuckGoSearchResults(api_wrapper=ddg_search, max_results = 100)
+            # shares the rate limit and retries of every other DuckDuckGo call
+            self.ddg_tool = get_ddg_tool()
         
-        self.vector_db = ZillizVectorDatabase()
+        self.vector_db = get_vector_db()
         self.tool_list = [
             Tool(
                 name = "DuckDuckGo Search",
                 func=self.ddg_tool.run,
                 description="Search the web for relevant results.",
-            )
+            ),
+            Tool(
+                name = "Paper Library Search",
+                func=self.search_library,
+                description="Search the saved research papers. Put one query per line to search several topics at once.",
+            ),
         ]
         self.agent = initialize_agent(
             agent_type=AgentType.CHAT_CONVERSATIONAL_REACT_DESCRIPTION,
@@ -62,9 +66,22 @@ class ResearchAssistant:
             
         )
     
+    def search_library(self, queries: str, limit: int = 5) -> str:
+        # all lines share one embedding call and one vector search
+        query_list = [query.strip() for query in queries.splitlines() if query.strip()]
+        results = self.vector_db.search_many(query_list, limit=limit, dedupe=True)
+        lines = []
+        for query, hits in zip(query_list, results):
+            lines.append(f"Results for {query}:")
+            for metadata in hits["metadata"]:
+                metadata = (metadata or {}).get("metadata", metadata) or {}
+                lines.append(f"- {metadata.get('title', 'Untitled')} ({metadata.get('year', 'n.d.')})")
+        return "\n".join(lines)
+
     def query(self, query):
         self.agent.run(query)
 
 
-bot = ResearchAssistant()
-bot.query("Give me a bibliometrics with around 20 research papers, articles, journals or publication that related to the topic: Unleashing the Metaverse: Extended Reality (XR) in Marketing. Return the result in a table")
\ No newline at end of file
+if __name__ == "__main__":
+    bot = ResearchAssistant()
+    bot.query("Give me a bibliometrics with around 20 research papers, articles, journals or publication that related to the topic: Unleashing the Metaverse: Extended Reality (XR) in Marketing. Return the result in a table")
\ No newline at end of file
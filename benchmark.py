@@ -0,0 +1,818 @@
+"""
+Micro-benchmarks for the research pipeline.
+
+Each benchmark imports what it measures lazily so it can be run on its own:
+
+    python benchmark.py crawl --latency 0.4 --keywords 15
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import subprocess
+import sys
+import time
+import zlib
+
+
+def _timed(func, *args, **kwargs) -> float:
+    start = time.perf_counter()
+    func(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def _simulated_search(latency: float):
+    """Builds a search function that only waits `latency` seconds, standing in for a Semantic Scholar round trip."""
+
+    def search(keyword: str, field_of_study: str) -> dict:
+        time.sleep(latency)
+        return {"total": 0, "offset": 0, "data": []}
+
+    return search
+
+
+def bench_crawl(keyword_count: int = 15, latency: float = 0.4, max_workers: int = 8, live: bool = False) -> dict[str, float]:
+    """
+    Compares the old sequential keyword loop against search_papers_concurrently.
+
+    Args:
+        keyword_count (int, optional): Number of keywords to crawl. Defaults to 15.
+        latency (float, optional): Simulated round trip in seconds, ignored when `live` is set. Defaults to 0.4.
+        max_workers (int, optional): Concurrency of the fan-out. Defaults to 8.
+        live (bool, optional): Hit the real Semantic Scholar API instead of the simulated one. Defaults to False.
+
+    Returns:
+        dict[str, float]: Wall time of both strategies and the speedup.
+    """
+    from web_searcher import search_paper, search_papers_concurrently
+
+    keyword_list = [f"extended reality marketing {i}" for i in range(keyword_count)]
+    field_of_study = "Business,Computer Science"
+    search_func = search_paper if live else _simulated_search(latency)
+
+    def sequential():
+        for keyword in keyword_list:
+            search_func(keyword, field_of_study)
+
+    def concurrent():
+        for _ in search_papers_concurrently(keyword_list, field_of_study, max_workers=max_workers, search_func=search_func):
+            pass
+
+    sequential_time = _timed(sequential)
+    concurrent_time = _timed(concurrent)
+    return {
+        "sequential_s": sequential_time,
+        "concurrent_s": concurrent_time,
+        "speedup": sequential_time / concurrent_time,
+    }
+
+
+def _synthetic_payload(paper_count: int = 20, edge_count: int = 50, seed: int = 0) -> dict:
+    """Builds a search response shaped like Semantic Scholar's, with `edge_count` references and citations per paper."""
+    rng = random.Random(seed)
+
+    def stub():
+        return {"paperId": f"{rng.getrandbits(64):016x}", "title": f"Paper {rng.getrandbits(32)} on extended reality"}
+
+    data = []
+    for index in range(paper_count):
+        data.append({
+            "paperId": f"{seed:04d}{index:036d}",
+            "url": f"https://www.semanticscholar.org/paper/{seed:04d}{index:036d}",
+            "title": f"Extended reality in marketing {seed}-{index}",
+            "abstract": "An abstract about augmented and virtual reality in retail. " * 8,
+            "year": 2015 + index % 9,
+            "referenceCount": edge_count,
+            "citationCount": rng.randint(0, 500),
+            "fieldsOfStudy": ["Business"],
+            "s2FieldsOfStudy": [{"category": "Business", "source": "s2-fos-model"}, {"category": "Computer Science", "source": "external"}],
+            "publicationDate": f"{2015 + index % 9}-01-01",
+            "journal": {"name": "Journal of Marketing"},
+            "citationStyles": {"bibtex": "@Article{paper" + str(index) + ",\n title = {Extended reality}\n}"},
+            "authors": [{"authorId": str(rng.getrandbits(24)), "name": f"Author {rng.getrandbits(16)}"} for _ in range(rng.randint(1, 6))],
+            "references": [stub() for _ in range(edge_count)],
+            "citations": [stub() for _ in range(edge_count)],
+        })
+    return {"total": paper_count, "offset": 0, "data": data}
+
+
+def _load_payloads(payload_path: str | None, keyword_count: int, paper_count: int, edge_count: int) -> list[dict]:
+    if payload_path is None:
+        return [_synthetic_payload(paper_count, edge_count, seed) for seed in range(keyword_count)]
+    with open(payload_path) as file:
+        payloads = json.load(file)
+    return payloads if isinstance(payloads, list) else [payloads]
+
+
+def _legacy_parsing_api_result(response_json: dict) -> dict[str, list]:
+    """The per-column parser interface.py used before paper_parser, kept as the benchmark baseline."""
+    list_of_result = response_json["data"]
+    list_of_paper_id = [i["paperId"] for i in list_of_result]
+    list_of_year = [str(i["year"]) for i in list_of_result]
+    list_of_title = [i["title"] for i in list_of_result]
+    list_of_abstract = [i["abstract"] for i in list_of_result]
+    list_of_url = [i["url"] for i in list_of_result]
+    list_of_field_study = [[field["category"] for field in i["s2FieldsOfStudy"]] for i in list_of_result]
+    list_of_publication_date = [i["publicationDate"] for i in list_of_result]
+    list_of_authors = [[author["name"] for author in i["authors"]] for i in list_of_result]
+    list_of_count_authors = [len(i) for i in list_of_authors]
+    list_of_references = [" || ".join([paper["title"] for paper in i["references"]]) for i in list_of_result]
+    list_of_citation = [" || ".join([cite["title"] for cite in i["citations"]]) for i in list_of_result]
+    list_of_references_count = [i["referenceCount"] for i in list_of_result]
+    list_of_citation_count = [i["citationCount"] for i in list_of_result]
+    list_of_bibtext_paper_citation = [i["citationStyles"]["bibtex"] for i in list_of_result]
+    return {
+        "paper_id": list_of_paper_id,
+        "title": list_of_title,
+        "abstract": list_of_abstract,
+        "url": list_of_url,
+        "field_study": list_of_field_study,
+        "citation_count": list_of_citation_count,
+        "references_count": list_of_references_count,
+        "publication_date": list_of_publication_date,
+        "authors": list_of_authors,
+        "authors_count": list_of_count_authors,
+        "year": list_of_year,
+        "references": list_of_references,
+        "citation": list_of_citation,
+        "bibtext_paper_citation": list_of_bibtext_paper_citation,
+        "raw_result": list_of_result,
+    }
+
+
+def bench_parse(
+    keyword_count: int = 15,
+    paper_count: int = 20,
+    edge_count: int = 100,
+    repeat: int = 20,
+    payload_path: str | None = None,
+) -> dict[str, float]:
+    """
+    Compares the legacy per-column parser against paper_parser.parsing_api_result.
+
+    Args:
+        keyword_count (int, optional): Number of synthetic responses, one per keyword. Defaults to 15.
+        paper_count (int, optional): Papers per synthetic response. Defaults to 20.
+        edge_count (int, optional): References and citations per synthetic paper. Defaults to 100.
+        repeat (int, optional): Number of timed rounds, the best one is kept. Defaults to 20.
+        payload_path (str | None, optional): A JSON file with one or a list of recorded responses. Defaults to synthetic payloads.
+
+    Returns:
+        dict[str, float]: Best round time of both parsers over all payloads and the speedup.
+    """
+    from paper_parser import parsing_api_result
+
+    payloads = _load_payloads(payload_path, keyword_count, paper_count, edge_count)
+
+    def parse_all(parser):
+        for payload in payloads:
+            parser(payload)
+
+    legacy_time = min(_timed(parse_all, _legacy_parsing_api_result) for _ in range(repeat))
+    single_pass_time = min(_timed(parse_all, parsing_api_result) for _ in range(repeat))
+    return {
+        "legacy_s": legacy_time,
+        "single_pass_s": single_pass_time,
+        "speedup": legacy_time / single_pass_time,
+    }
+
+
+class _LatencyEmbeddings:
+    """A deterministic embedding model that charges a fixed latency per call, like one OpenAI round trip."""
+
+    def __init__(self, call_latency: float = 0.05, dim: int = 1536):
+        self.call_latency = call_latency
+        self.dim = dim
+        self.calls = 0
+
+    def _vector(self, text: str) -> list[float]:
+        rng = random.Random(text)
+        return [rng.random() for _ in range(self.dim)]
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        self.calls += 1
+        time.sleep(self.call_latency)
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_documents([text])[0]
+
+
+class _LatencyCollection:
+    """An in-memory stand-in for a Milvus collection with fixed write and flush latencies."""
+
+    def __init__(self, write_latency: float = 0.01, flush_latency: float = 0.2):
+        self.write_latency = write_latency
+        self.flush_latency = flush_latency
+        self.rows: dict[int, tuple] = {}
+
+    @property
+    def num_entities(self) -> int:
+        time.sleep(self.write_latency)
+        return len(self.rows)
+
+    def insert(self, data: list[list]) -> None:
+        time.sleep(self.write_latency)
+        for row in zip(*data):
+            self.rows[len(self.rows) + 1] = row
+
+    def upsert(self, data: list[list]) -> None:
+        time.sleep(self.write_latency)
+        for row in zip(*data):
+            self.rows[row[0]] = row
+
+    def flush(self) -> None:
+        time.sleep(self.flush_latency)
+
+
+def bench_ingest(
+    document_count: int = 200,
+    batch_size: int = 64,
+    embed_latency: float = 0.05,
+    write_latency: float = 0.01,
+    flush_latency: float = 0.2,
+) -> dict[str, float]:
+    """
+    Compares one-document-per-call ingestion against ZillizVectorDatabase.insert_many on a local Milvus stand-in.
+
+    Args:
+        document_count (int, optional): Number of paper documents to ingest. Defaults to 200.
+        batch_size (int, optional): Batch size of insert_many. Defaults to 64.
+        embed_latency (float, optional): Seconds per embedding call. Defaults to 0.05.
+        write_latency (float, optional): Seconds per insert, upsert or entity count. Defaults to 0.01.
+        flush_latency (float, optional): Seconds per flush. Defaults to 0.2.
+
+    Returns:
+        dict[str, float]: Documents per second of both strategies and the speedup.
+    """
+    from langchain.schema import Document as LangChainDocument
+    from vector_storage import ZillizVectorDatabase
+
+    documents = [
+        LangChainDocument(page_content=f"Abstract of paper {index} about extended reality.", metadata={"paperId": f"paper-{index}"})
+        for index in range(document_count)
+    ]
+
+    def legacy():
+        # the former insert_doc: one embedding call, an entity count, one insert and one flush per document
+        embeddings = _LatencyEmbeddings(embed_latency)
+        collection = _LatencyCollection(write_latency, flush_latency)
+        for document in documents:
+            embed_text = embeddings.embed_documents([document.page_content])
+            db_length = collection.num_entities
+            collection.insert([[db_length + 1], embed_text, [{"raw_text": document.page_content}], [{"metadata": document.metadata}]])
+            collection.flush()
+
+    def batched():
+        db = ZillizVectorDatabase(
+            embedding_function=_LatencyEmbeddings(embed_latency),
+            collection=_LatencyCollection(write_latency, flush_latency),
+        )
+        db.insert_many(documents, batch_size=batch_size, flush=True)
+
+    legacy_time = _timed(legacy)
+    batched_time = _timed(batched)
+    return {
+        "legacy_docs_per_s": document_count / legacy_time,
+        "batched_docs_per_s": document_count / batched_time,
+        "speedup": legacy_time / batched_time,
+    }
+
+
+def bench_local_search(
+    row_count: int = 20000,
+    dim: int = 256,
+    query_count: int = 32,
+    limit: int = 10,
+    nlist: int = 64,
+    nprobe: int = 8,
+) -> dict[str, float]:
+    """
+    Measures the local NumpyBackend: exact batched search against the IVF index, with recall of the latter.
+
+    Args:
+        row_count (int, optional): Number of stored vectors. Defaults to 20000.
+        dim (int, optional): Vector dimension. Defaults to 256.
+        query_count (int, optional): Queries per batch. Defaults to 32.
+        limit (int, optional): Hits per query. Defaults to 10.
+        nlist (int, optional): IVF partitions. Defaults to 64.
+        nprobe (int, optional): Partitions scanned per query. Defaults to 8.
+
+    Returns:
+        dict[str, float]: Per-query latency of both modes and the IVF recall@limit.
+    """
+    import numpy as np
+    from vector_backends import NumpyBackend
+
+    rng = np.random.default_rng(0)
+    # clustered data, closer to real embeddings than uniform noise
+    centers = rng.normal(size=(nlist, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, nlist, row_count)] + 0.3 * rng.normal(size=(row_count, dim)).astype(np.float32)
+    queries = vectors[rng.integers(0, row_count, query_count)] + 0.05 * rng.normal(size=(query_count, dim)).astype(np.float32)
+
+    backend = NumpyBackend()
+    backend.upsert(list(range(row_count)), vectors, [{}] * row_count, [{}] * row_count)
+
+    backend.search(queries[:1], limit)
+    start = time.perf_counter()
+    exact = backend.search(queries, limit)
+    exact_time = time.perf_counter() - start
+
+    backend.build_ivf(nlist=nlist, nprobe=nprobe)
+    backend.search(queries[:1], limit)
+    start = time.perf_counter()
+    approximate = backend.search(queries, limit)
+    ivf_time = time.perf_counter() - start
+
+    recall = np.mean([len(set(a["ids"]) & set(e["ids"])) / limit for a, e in zip(approximate, exact)])
+    return {
+        "exact_ms_per_query": 1000 * exact_time / query_count,
+        "ivf_ms_per_query": 1000 * ivf_time / query_count,
+        "ivf_recall": float(recall),
+    }
+
+
+def bench_graph(paper_count: int = 20000, edge_count: int = 40, corpus_size: int = 60000, seed: int = 0) -> dict[str, float]:
+    """
+    Measures the citation graph on a synthetic corpus: streaming ingestion, PageRank and co-citation.
+
+    Args:
+        paper_count (int, optional): Number of crawled papers. Defaults to 20000.
+        edge_count (int, optional): References and citations per paper. Defaults to 40.
+        corpus_size (int, optional): Number of distinct paperIds edges point to. Defaults to 60000.
+        seed (int, optional): Seed of the random graph. Defaults to 0.
+
+    Returns:
+        dict[str, float]: Timings of each operation and the size of the graph.
+    """
+    from citation_graph import CitationGraph
+
+    rng = random.Random(seed)
+    # a skewed choice of cited papers, so a few of them collect most citations like in a real field
+    weights = [1 / (rank + 1) for rank in range(corpus_size)]
+    cited = rng.choices(range(corpus_size), weights=weights, k=paper_count * edge_count)
+    citing = rng.choices(range(corpus_size), k=paper_count * edge_count)
+    papers = [
+        {
+            "paperId": f"p{index}",
+            "references": [{"paperId": f"p{other}"} for other in cited[index * edge_count : (index + 1) * edge_count]],
+            "citations": [{"paperId": f"p{other}"} for other in citing[index * edge_count : (index + 1) * edge_count]],
+        }
+        for index in range(paper_count)
+    ]
+
+    graph = CitationGraph()
+    batch = max(1, paper_count // 20)
+
+    def ingest():
+        for start in range(0, paper_count, batch):
+            graph.add_papers(papers[start : start + batch])
+
+    ingest_time = _timed(ingest)
+    build_time = _timed(lambda: graph.edge_count)
+    pagerank_time = _timed(graph.pagerank)
+    co_citation_time = _timed(graph.co_citation, "p0")
+    coupling_time = _timed(graph.bibliographic_coupling, "p0")
+    return {
+        "nodes": len(graph),
+        "edges": graph.edge_count,
+        "ingest_s": ingest_time,
+        "csr_build_s": build_time,
+        "pagerank_s": pagerank_time,
+        "co_citation_ms": 1000 * co_citation_time,
+        "coupling_ms": 1000 * coupling_time,
+    }
+
+
+class _TopicEmbeddings:
+    """
+    A deterministic embedding that, like a real model, captures topics well and exact rare terms poorly.
+
+    Known topic words map to their own random direction; every other token only adds a faint
+    hashed direction, so a query made of an author name or acronym barely points anywhere.
+    """
+
+    def __init__(self, vocabulary: list[str], dim: int = 128, rare_weight: float = 0.15):
+        import numpy as np
+
+        rng = np.random.default_rng(1)
+        self.dim = dim
+        self.rare_weight = rare_weight
+        self.word_vectors = {word: rng.normal(size=dim) for word in vocabulary}
+
+    def _vector(self, text: str) -> list[float]:
+        import numpy as np
+        from lexical_index import tokenize
+
+        vector = np.zeros(self.dim)
+        for token in tokenize(text):
+            if token in self.word_vectors:
+                vector += self.word_vectors[token]
+            else:
+                vector += self.rare_weight * np.random.default_rng(zlib.crc32(token.encode())).normal(size=self.dim)
+        return vector.tolist()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._vector(text)
+
+
+def _hybrid_fixture(document_count: int, seed: int = 0) -> tuple[list, list[tuple[str, set[int]]], list[str]]:
+    """A corpus of topical abstracts with author names and acronyms, and topic and exact-term queries with their relevant ids."""
+    from langchain.schema import Document as LangChainDocument
+    from vector_storage import document_primary_key
+
+    rng = random.Random(seed)
+    vocabulary = [f"topic{index}" for index in range(200)]
+    topics = [rng.sample(vocabulary, 5) for _ in range(20)]
+    authors = [f"author{index}x" for index in range(document_count // 4)]
+    acronyms = [f"acr{index}" for index in range(50)]
+
+    documents, by_topic, by_term = [], {}, {}
+    for index in range(document_count):
+        topic = rng.randrange(len(topics))
+        author, acronym = rng.choice(authors), rng.choice(acronyms)
+        words = rng.choices(topics[topic], k=30) + rng.choices(vocabulary, k=10)
+        document = LangChainDocument(
+            page_content=f"{' '.join(words)} {acronym.upper()} study",
+            metadata={"paperId": f"paper{index}", "title": f"{' '.join(topics[topic][:3])} by {author}"},
+        )
+        documents.append(document)
+        pk = document_primary_key(document)
+        by_topic.setdefault(topic, set()).add(pk)
+        by_term.setdefault(author, set()).add(pk)
+        by_term.setdefault(acronym.upper(), set()).add(pk)
+
+    queries = [(" ".join(topics[topic][:2]), relevant) for topic, relevant in by_topic.items()]
+    queries += [(term, relevant) for term, relevant in rng.sample(sorted(by_term.items()), min(40, len(by_term)))]
+    return documents, queries, vocabulary
+
+
+def bench_hybrid(document_count: int = 5000, limit: int = 10, rrf_k: int = 60) -> dict[str, float]:
+    """
+    Compares dense-only and hybrid (dense + BM25, reciprocal-rank fusion) retrieval on a synthetic fixture corpus.
+
+    Half of the queries name a topic, the other half an exact author name or acronym.
+
+    Args:
+        document_count (int, optional): Number of indexed documents. Defaults to 5000.
+        limit (int, optional): Hits per query, recall is measured at this depth. Defaults to 10.
+        rrf_k (int, optional): The k of reciprocal-rank fusion. Defaults to 60.
+
+    Returns:
+        dict[str, float]: Per-query latency and recall@limit of both modes.
+    """
+    from lexical_index import BM25Index
+    from vector_backends import NumpyBackend
+    from vector_storage import ZillizVectorDatabase
+
+    documents, queries, vocabulary = _hybrid_fixture(document_count)
+    db = ZillizVectorDatabase(
+        embedding_function=_TopicEmbeddings(vocabulary),
+        backend=NumpyBackend(metric="cosine"),
+        lexical_index=BM25Index(),
+    )
+    db.insert_many(documents, batch_size=512)
+
+    result = {}
+    for mode, hybrid in (("dense", False), ("hybrid", True)):
+        recalls = []
+        start = time.perf_counter()
+        for query, relevant in queries:
+            hits = db.search_doc(query, limit=limit, hybrid=hybrid, rrf_k=rrf_k)[0]["ids"]
+            recalls.append(len(relevant.intersection(hits)) / min(limit, len(relevant)))
+        result[f"{mode}_ms_per_query"] = 1000 * (time.perf_counter() - start) / len(queries)
+        result[f"{mode}_recall"] = sum(recalls) / len(recalls)
+    return result
+
+
+def bench_search_many(
+    query_count: int = 15,
+    document_count: int = 2000,
+    embed_latency: float = 0.05,
+    search_latency: float = 0.03,
+    limit: int = 5,
+) -> dict[str, float]:
+    """
+    Compares one search_doc per keyword against a single search_many over all of them.
+
+    Args:
+        query_count (int, optional): Number of keywords searched. Defaults to 15.
+        document_count (int, optional): Number of indexed documents. Defaults to 2000.
+        embed_latency (float, optional): Seconds per embedding call, like one OpenAI round trip. Defaults to 0.05.
+        search_latency (float, optional): Seconds per search call, like one Zilliz round trip. Defaults to 0.03.
+        limit (int, optional): Hits per query. Defaults to 5.
+
+    Returns:
+        dict[str, float]: Total time of both ways and the per-keyword latency of search_many.
+    """
+    from lexical_index import BM25Index
+    from vector_backends import NumpyBackend
+    from vector_storage import ZillizVectorDatabase
+
+    documents, queries, vocabulary = _hybrid_fixture(document_count)
+    embeddings = _TopicEmbeddings(vocabulary)
+    backend = NumpyBackend(metric="cosine")
+    db = ZillizVectorDatabase(embedding_function=embeddings, backend=backend, lexical_index=BM25Index())
+    db.insert_many(documents, batch_size=512)
+
+    # every call now pays one round trip
+    embed_documents, search = embeddings.embed_documents, backend.search
+    embeddings.embed_documents = lambda texts: time.sleep(embed_latency) or embed_documents(texts)
+    embeddings.embed_query = lambda text: embeddings.embed_documents([text])[0]
+    backend.search = lambda vectors, limit: time.sleep(search_latency) or search(vectors, limit)
+
+    keywords = [query for query, _ in queries[:query_count]]
+    one_by_one = _timed(lambda: [db.search_doc(keyword, limit=limit) for keyword in keywords])
+    batched = _timed(db.search_many, keywords, limit=limit)
+    return {
+        "search_doc_s": one_by_one,
+        "search_many_s": batched,
+        "ms_per_keyword": 1000 * batched / len(keywords),
+        "speedup": one_by_one / batched,
+    }
+
+
+def _latency_summary(stage: str, samples: list[float], elapsed: float) -> dict[str, float]:
+    """p50 and p95 of the per-item latencies of a stage, and its throughput in items per second."""
+    import numpy as np
+
+    p50, p95 = np.percentile(samples, [50, 95]) if samples else (0.0, 0.0)
+    return {
+        f"{stage}_p50_ms": 1000 * float(p50),
+        f"{stage}_p95_ms": 1000 * float(p95),
+        f"{stage}_per_s": len(samples) / elapsed if elapsed else 0.0,
+    }
+
+
+def bench_pipeline(
+    topic_count: int = 8,
+    keyword_count: int = 12,
+    papers_per_keyword: int = 40,
+    http_latency: float = 0.05,
+    throttle_rate: float = 0.05,
+    llm_latency: float = 0.2,
+    embed_latency: float = 0.01,
+    max_workers: int = 8,
+    payload_path: str | None = None,
+) -> dict[str, float]:
+    """
+    Runs the whole pipeline offline against the fakes and reports p50/p95 latency and throughput per stage.
+
+    Keyword generation uses FakeKeywordLLM and HashEmbeddings, crawling goes to a local
+    FakeSemanticScholar serving recorded (or synthetic) payloads with latency and 429s,
+    parsing runs on the crawled responses, and retrieval searches an in-memory NumpyBackend
+    with a BM25 index filled with the crawled papers.
+
+    Args:
+        topic_count (int, optional): Distinct topics, one keyword generation each. Defaults to 8.
+        keyword_count (int, optional): Keywords crawled. Defaults to 12.
+        papers_per_keyword (int, optional): Papers collected per keyword. Defaults to 40.
+        http_latency (float, optional): Seconds per fake Semantic Scholar request. Defaults to 0.05.
+        throttle_rate (float, optional): Share of fake Semantic Scholar requests answered with a 429. Defaults to 0.05.
+        llm_latency (float, optional): Seconds per fake LLM call. Defaults to 0.2.
+        embed_latency (float, optional): Seconds per fake embedding call. Defaults to 0.01.
+        max_workers (int, optional): Keywords crawled in parallel. Defaults to 8.
+        payload_path (str | None, optional): A JSON file with one or a list of recorded responses. Defaults to synthetic payloads.
+
+    Returns:
+        dict[str, float]: Latency percentiles and throughput of each stage, and the crawl's request, 429 and retry counts.
+    """
+    import os
+    import tempfile
+    from functools import partial
+
+    import web_searcher
+    from fakes import FakeKeywordLLM, FakeSemanticScholar, HashEmbeddings
+    from keyword_processing import prepare_keywords
+    from lexical_index import BM25Index
+    from paper_parser import parsing_api_result
+    from question_generator import QuestionGenerator, clear_keyword_cache
+    from response_cache import ResponseCache
+    from semantic_cache import SemanticQueryCache
+    from vector_backends import NumpyBackend
+    from vector_storage import ZillizVectorDatabase
+    from langchain.schema import Document as LangChainDocument
+
+    os.environ.setdefault("SEMANTIC_SCHOLAR_API", "offline")
+    result = {}
+    embeddings = HashEmbeddings(latency=embed_latency)
+
+    clear_keyword_cache()
+    generator = QuestionGenerator(llm_model=FakeKeywordLLM(latency=llm_latency), semantic_cache=SemanticQueryCache(embeddings))
+    samples = []
+    start = time.perf_counter()
+    for index in range(topic_count):
+        samples.append(_timed(generator.generate_keywords, f"Topic {index}: extended reality in sector {index}", f"Project description {index}"))
+    result.update(_latency_summary("keywords", samples, time.perf_counter() - start))
+    keywords = prepare_keywords(generator.generate_keywords("Topic 0: extended reality in sector 0", "Project description 0"), embeddings)["keywords"]
+    keywords = (keywords * (keyword_count // max(len(keywords), 1) + 1))[:keyword_count]
+    keywords = [f"{keyword} {index}" for index, keyword in enumerate(keywords)]
+
+    payloads = _load_payloads(payload_path, keyword_count, papers_per_keyword, 10)
+    with tempfile.TemporaryDirectory() as directory, FakeSemanticScholar(payloads, http_latency, throttle_rate) as server:
+        base_url, cache, scheduler = web_searcher.SEMANTIC_SCHOLAR_BASE_URL, web_searcher.response_cache, web_searcher.s2_scheduler
+        web_searcher.set_base_url(server.base_url)
+        # a fresh scheduler with the default budget, so its retry counters are this run's
+        web_searcher.set_request_rate(web_searcher.S2_REQUESTS_PER_SECOND)
+        # a cold cache, and the user's cache is left alone
+        web_searcher.response_cache = ResponseCache(os.path.join(directory, "responses.sqlite"))
+        try:
+            search = partial(web_searcher.search_paper_pages, max_papers=papers_per_keyword)
+            crawl_latencies = {}
+
+            def timed_search(keyword, field_of_study):
+                keyword_start = time.perf_counter()
+                page = search(keyword, field_of_study)
+                crawl_latencies[keyword] = time.perf_counter() - keyword_start
+                return page
+
+            start = time.perf_counter()
+            responses = [page for _, page in web_searcher.search_papers_concurrently(keywords, "", max_workers, search_func=timed_search)]
+            result.update(_latency_summary("crawl", list(crawl_latencies.values()), time.perf_counter() - start))
+            result["crawl_papers"] = sum(len(page["data"]) for page in responses)
+            result["crawl_requests"] = server.requests
+            result["crawl_throttled"] = server.throttled
+            result["crawl_retries"] = web_searcher.s2_scheduler.stats()["retries"]
+        finally:
+            web_searcher.set_base_url(base_url)
+            web_searcher.response_cache = cache
+            web_searcher.s2_scheduler = scheduler
+
+    samples = []
+    start = time.perf_counter()
+    for page in responses:
+        samples.append(_timed(parsing_api_result, page))
+    result.update(_latency_summary("parse", samples, time.perf_counter() - start))
+
+    db = ZillizVectorDatabase(embedding_function=embeddings, backend=NumpyBackend(metric="cosine"), lexical_index=BM25Index())
+    papers = {paper["paperId"]: paper for page in responses for paper in page["data"]}.values()
+    db.insert_many([
+        LangChainDocument(page_content=paper.get("abstract") or "", metadata={"paperId": paper["paperId"], "title": paper.get("title")})
+        for paper in papers
+    ], batch_size=256)
+    samples = []
+    start = time.perf_counter()
+    for keyword in keywords:
+        samples.append(_timed(db.search_doc, keyword, limit=10))
+    result.update(_latency_summary("retrieval", samples, time.perf_counter() - start))
+    result["retrieval_batched_per_s"] = len(keywords) / _timed(db.search_many, keywords, limit=10)
+    return result
+
+
+def check_regressions(result: dict[str, float], baseline: dict[str, float], tolerance: float = 0.2) -> list[str]:
+    """
+    Compares the latency percentiles of a run against a saved baseline.
+
+    Args:
+        result (dict[str, float]): The current run.
+        baseline (dict[str, float]): A previous run, e.g. of the deployed version.
+        tolerance (float, optional): Allowed relative slowdown. Defaults to 0.2.
+
+    Returns:
+        list[str]: One message per metric slower than the baseline by more than `tolerance`.
+    """
+    regressions = []
+    for name, value in result.items():
+        if name.endswith("_ms") and baseline.get(name) and value > baseline[name] * (1 + tolerance):
+            regressions.append(f"{name}: {value:.2f} ms vs {baseline[name]:.2f} ms baseline")
+    return regressions
+
+
+IMPORT_TIME_MODULES = ("constant", "web_searcher", "question_generator", "summarizer", "vector_storage", "paper_parser", "result_accumulator")
+
+
+def bench_import_time(modules: tuple[str, ...] = IMPORT_TIME_MODULES) -> dict[str, float]:
+    """
+    Measures the cold import time of each module in a fresh interpreter with `python -X importtime`.
+
+    Args:
+        modules (tuple[str, ...], optional): The modules to import. Defaults to IMPORT_TIME_MODULES.
+
+    Returns:
+        dict[str, float]: Cumulative import time of each module in milliseconds.
+    """
+    result = {}
+    for module in modules:
+        process = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        # lines look like "import time:       self [us] |  cumulative | imported package"
+        for line in process.stderr.splitlines():
+            _, _, timings = line.partition("import time:")
+            fields = [field.strip() for field in timings.split("|")]
+            if len(fields) == 3 and fields[2] == module:
+                result[f"{module}_ms"] = int(fields[1]) / 1000
+    return result
+
+
+def _print_result(result: dict[str, float]) -> None:
+    for name, value in result.items():
+        print(f"{name:>24}: {value:.4f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a pipeline benchmark.")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    crawl_parser = subparsers.add_parser("crawl", help="sequential vs concurrent keyword crawl")
+    crawl_parser.add_argument("--keywords", type=int, default=15)
+    crawl_parser.add_argument("--latency", type=float, default=0.4)
+    crawl_parser.add_argument("--workers", type=int, default=8)
+    crawl_parser.add_argument("--live", action="store_true")
+    crawl_parser.set_defaults(run=lambda args: bench_crawl(args.keywords, args.latency, args.workers, args.live))
+
+    parse_parser = subparsers.add_parser("parse", help="legacy vs single-pass response parser")
+    parse_parser.add_argument("--keywords", type=int, default=15)
+    parse_parser.add_argument("--papers", type=int, default=20)
+    parse_parser.add_argument("--edges", type=int, default=100)
+    parse_parser.add_argument("--repeat", type=int, default=20)
+    parse_parser.add_argument("--payload", default=None, help="JSON file of recorded search responses")
+    parse_parser.set_defaults(run=lambda args: bench_parse(args.keywords, args.papers, args.edges, args.repeat, args.payload))
+
+    ingest_parser = subparsers.add_parser("ingest", help="per-document vs batched vector ingestion")
+    ingest_parser.add_argument("--documents", type=int, default=200)
+    ingest_parser.add_argument("--batch-size", type=int, default=64)
+    ingest_parser.add_argument("--embed-latency", type=float, default=0.05)
+    ingest_parser.add_argument("--write-latency", type=float, default=0.01)
+    ingest_parser.add_argument("--flush-latency", type=float, default=0.2)
+    ingest_parser.set_defaults(
+        run=lambda args: bench_ingest(args.documents, args.batch_size, args.embed_latency, args.write_latency, args.flush_latency)
+    )
+
+    local_search_parser = subparsers.add_parser("local-search", help="exact vs IVF search on the NumPy backend")
+    local_search_parser.add_argument("--rows", type=int, default=20000)
+    local_search_parser.add_argument("--dim", type=int, default=256)
+    local_search_parser.add_argument("--queries", type=int, default=32)
+    local_search_parser.add_argument("--limit", type=int, default=10)
+    local_search_parser.add_argument("--nlist", type=int, default=64)
+    local_search_parser.add_argument("--nprobe", type=int, default=8)
+    local_search_parser.set_defaults(
+        run=lambda args: bench_local_search(args.rows, args.dim, args.queries, args.limit, args.nlist, args.nprobe)
+    )
+
+    graph_parser = subparsers.add_parser("graph", help="citation graph ingestion, PageRank and co-citation")
+    graph_parser.add_argument("--papers", type=int, default=20000)
+    graph_parser.add_argument("--edges", type=int, default=40)
+    graph_parser.add_argument("--corpus", type=int, default=60000)
+    graph_parser.set_defaults(run=lambda args: bench_graph(args.papers, args.edges, args.corpus))
+
+    hybrid_parser = subparsers.add_parser("hybrid", help="dense vs hybrid BM25 + vector retrieval")
+    hybrid_parser.add_argument("--documents", type=int, default=5000)
+    hybrid_parser.add_argument("--limit", type=int, default=10)
+    hybrid_parser.add_argument("--rrf-k", type=int, default=60)
+    hybrid_parser.set_defaults(run=lambda args: bench_hybrid(args.documents, args.limit, args.rrf_k))
+
+    search_many_parser = subparsers.add_parser("search-many", help="per-keyword search_doc vs one batched search_many")
+    search_many_parser.add_argument("--queries", type=int, default=15)
+    search_many_parser.add_argument("--documents", type=int, default=2000)
+    search_many_parser.add_argument("--embed-latency", type=float, default=0.05)
+    search_many_parser.add_argument("--search-latency", type=float, default=0.03)
+    search_many_parser.set_defaults(
+        run=lambda args: bench_search_many(args.queries, args.documents, args.embed_latency, args.search_latency)
+    )
+
+    pipeline_parser = subparsers.add_parser("pipeline", help="the whole pipeline offline, against fake services")
+    pipeline_parser.add_argument("--topics", type=int, default=8)
+    pipeline_parser.add_argument("--keywords", type=int, default=12)
+    pipeline_parser.add_argument("--papers", type=int, default=40)
+    pipeline_parser.add_argument("--http-latency", type=float, default=0.05)
+    pipeline_parser.add_argument("--throttle-rate", type=float, default=0.05)
+    pipeline_parser.add_argument("--llm-latency", type=float, default=0.2)
+    pipeline_parser.add_argument("--embed-latency", type=float, default=0.01)
+    pipeline_parser.add_argument("--workers", type=int, default=8)
+    pipeline_parser.add_argument("--payload", default=None, help="JSON file of recorded search responses")
+    pipeline_parser.add_argument("--save-baseline", default=None, help="write the result to this JSON file")
+    pipeline_parser.add_argument("--baseline", default=None, help="exit with an error if a latency regressed against this JSON file")
+    pipeline_parser.add_argument("--tolerance", type=float, default=0.2)
+    pipeline_parser.set_defaults(
+        run=lambda args: bench_pipeline(
+            args.topics, args.keywords, args.papers, args.http_latency, args.throttle_rate,
+            args.llm_latency, args.embed_latency, args.workers, args.payload,
+        )
+    )
+
+    import_time_parser = subparsers.add_parser("import-time", help="cold import time of the app modules")
+    import_time_parser.add_argument("modules", nargs="*", default=list(IMPORT_TIME_MODULES))
+    import_time_parser.add_argument("--budget-ms", type=float, default=None, help="exit with an error if a module is slower")
+    import_time_parser.set_defaults(run=lambda args: bench_import_time(tuple(args.modules)))
+
+    args = parser.parse_args()
+    result = args.run(args)
+    _print_result(result)
+    if getattr(args, "budget_ms", None) is not None and max(result.values()) > args.budget_ms:
+        sys.exit(f"import time budget of {args.budget_ms} ms exceeded")
+    if getattr(args, "save_baseline", None):
+        with open(args.save_baseline, "w") as file:
+            json.dump(result, file, indent=2)
+    if getattr(args, "baseline", None):
+        with open(args.baseline) as file:
+            regressions = check_regressions(result, json.load(file), args.tolerance)
+        if regressions:
+            sys.exit("performance regressions:\n" + "\n".join(regressions))
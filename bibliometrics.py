@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+BIBLIOMETRICS_CACHE_SIZE = 64
+CITATION_PERCENTILES = (25, 50, 75, 90, 99)
+DEFAULT_TOP_N = 20
+
+
+def result_fingerprint(dataframe: pd.DataFrame) -> str:
+    """
+    Identifies a result set by its papers, their citation counts, years and number of authors, regardless of row order.
+
+    Re-sorting the table keeps the fingerprint, filtering or hydrating rows changes it.
+    """
+    rows = sorted(zip(
+        dataframe["paper_id"].astype(str),
+        dataframe["citation_count"].fillna(0).astype(np.int64),
+        dataframe["year"].astype(str),
+        dataframe["authors_count"].fillna(0).astype(np.int64),
+    ))
+    digest = hashlib.blake2b(digest_size=16)
+    for row in rows:
+        digest.update(("\t".join(map(str, row)) + "\n").encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _exploded(dataframe: pd.DataFrame, column: str) -> pd.DataFrame:
+    """One (row, value) pair per list entry, duplicates within a paper removed."""
+    pairs = dataframe[[column]].assign(row=np.arange(len(dataframe))).explode(column)
+    return pairs.dropna(subset=[column]).drop_duplicates()
+
+
+def publications_per_year(dataframe: pd.DataFrame) -> pd.Series:
+    """The number of papers per publication year, oldest first; papers without a year are left out."""
+    years = pd.to_numeric(dataframe["year"], errors="coerce").dropna().astype(np.int64)
+    return years.value_counts().sort_index().rename("papers")
+
+
+def top_authors(dataframe: pd.DataFrame, top_n: int = DEFAULT_TOP_N) -> pd.DataFrame:
+    """
+    Ranks authors by number of papers in the result set, then by the citations of those papers.
+
+    Returns:
+        pd.DataFrame: "author", "papers" and "citations", `top_n` rows.
+    """
+    authors = _exploded(dataframe, "authors")
+    citations = dataframe["citation_count"].fillna(0).to_numpy(dtype=np.int64)
+    authors = authors.assign(citations=citations[authors["row"].to_numpy()])
+    ranked = authors.groupby("authors").agg(papers=("row", "size"), citations=("citations", "sum"))
+    ranked = ranked.sort_values(["papers", "citations"], ascending=False).head(top_n)
+    return ranked.rename_axis("author").reset_index()
+
+
+def coauthorship_counts(dataframe: pd.DataFrame, top_n: int = DEFAULT_TOP_N) -> pd.DataFrame:
+    """
+    Counts the papers each pair of authors wrote together.
+
+    Returns:
+        pd.DataFrame: "author", "coauthor" and "papers", strongest pairs first, `top_n` rows.
+    """
+    authors = _exploded(dataframe, "authors")
+    pairs = authors.merge(authors, on="row", suffixes=("", "_other"))
+    # every unordered pair once
+    pairs = pairs[pairs["authors"] < pairs["authors_other"]]
+    counts = pairs.groupby(["authors", "authors_other"]).size().rename("papers")
+    counts = counts.sort_values(ascending=False).head(top_n).reset_index()
+    return counts.rename(columns={"authors": "author", "authors_other": "coauthor"})
+
+
+def field_distribution(dataframe: pd.DataFrame) -> pd.Series:
+    """The number of papers tagged with each field of study, most common first."""
+    fields = _exploded(dataframe, "field_study")
+    return fields["field_study"].value_counts().rename("papers")
+
+
+def citation_metrics(dataframe: pd.DataFrame) -> dict[str, float]:
+    """
+    Summarizes the citation counts of the result set.
+
+    The h-index is the largest h such that h papers have at least h citations each, the
+    g-index the largest g such that the top g papers have at least g² citations together.
+
+    Returns:
+        dict[str, float]: Totals, the CITATION_PERCENTILES, and the h-, g- and i10-index.
+    """
+    citations = np.sort(dataframe["citation_count"].fillna(0).to_numpy(dtype=np.int64))[::-1]
+    ranks = np.arange(1, len(citations) + 1)
+    metrics = {
+        "papers": len(citations),
+        "total_citations": int(citations.sum()),
+        "mean_citations": float(citations.mean()) if len(citations) else 0.0,
+        "h_index": int((citations >= ranks).sum()),
+        "g_index": int((np.cumsum(citations) >= ranks**2).sum()),
+        "i10_index": int((citations >= 10).sum()),
+    }
+    if len(citations):
+        for percentile, value in zip(CITATION_PERCENTILES, np.percentile(citations, CITATION_PERCENTILES)):
+            metrics[f"p{percentile}_citations"] = float(value)
+    return metrics
+
+
+_bibliometrics_cache: OrderedDict[tuple[str, int], dict] = OrderedDict()
+_bibliometrics_cache_lock = threading.Lock()
+
+
+def compute_bibliometrics(dataframe: pd.DataFrame, top_n: int = DEFAULT_TOP_N) -> dict:
+    """
+    Computes every aggregate of the bibliometrics panel for the results table.
+
+    Results are cached per result_fingerprint, so re-sorting the table or rerunning the
+    Streamlit script reuses them.
+
+    Args:
+        dataframe (pd.DataFrame): The results table, with list columns "authors" and "field_study".
+        top_n (int, optional): Rows of the author and co-authorship rankings. Defaults to DEFAULT_TOP_N.
+
+    Returns:
+        dict: "publications_per_year", "top_authors", "coauthorship", "fields" and "citations".
+    """
+    key = (result_fingerprint(dataframe), top_n)
+    with _bibliometrics_cache_lock:
+        if (cached := _bibliometrics_cache.get(key)) is not None:
+            _bibliometrics_cache.move_to_end(key)
+            return cached
+
+    aggregates = {
+        "publications_per_year": publications_per_year(dataframe),
+        "top_authors": top_authors(dataframe, top_n),
+        "coauthorship": coauthorship_counts(dataframe, top_n),
+        "fields": field_distribution(dataframe),
+        "citations": citation_metrics(dataframe),
+    }
+    with _bibliometrics_cache_lock:
+        _bibliometrics_cache[key] = aggregates
+        while len(_bibliometrics_cache) > BIBLIOMETRICS_CACHE_SIZE:
+            _bibliometrics_cache.popitem(last=False)
+    return aggregates
@@ -0,0 +1,223 @@
+from __future__ import annotations
+
+from array import array
+
+import numpy as np
+
+DEFAULT_DAMPING = 0.85
+DEFAULT_TOLERANCE = 1e-8
+DEFAULT_MAX_ITERATIONS = 100
+
+
+def _gather(indptr: np.ndarray, indices: np.ndarray, rows: np.ndarray) -> np.ndarray:
+    """Concatenates the CSR rows `rows` without a Python loop over them."""
+    starts = indptr[rows]
+    lengths = indptr[rows + 1] - starts
+    total = int(lengths.sum())
+    if not total:
+        return np.empty(0, dtype=indices.dtype)
+    # position of every gathered entry: its row start plus its offset within the row
+    offsets = np.arange(total) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return indices[np.repeat(starts, lengths) + offsets]
+
+
+class CitationGraph:
+    """
+    The citation graph of the crawled papers, with an edge from each citing paper to the paper it cites.
+
+    paperIds are interned to consecutive integer ids and edges are appended to typed arrays as
+    keywords stream in; the CSR adjacency (duplicate edges removed) is rebuilt lazily the next
+    time a score is asked for. Papers only known as a reference or citation of a crawled paper
+    are part of the graph but not of the corpus.
+
+    Examples:
+        >>> graph = CitationGraph()
+        >>> graph.add_papers(search_result["data"])
+        >>> influence = graph.pagerank_of(result_df["paper_id"])
+        >>> graph.co_citation(result_df["paper_id"][0], top_k=5)
+    """
+
+    def __init__(self):
+        self._id_of: dict[str, int] = {}
+        self._paper_ids: list[str] = []
+        self._in_corpus = array("b")
+        self._source = array("q")
+        self._target = array("q")
+        self._out: tuple[np.ndarray, np.ndarray] | None = None
+        self._in: tuple[np.ndarray, np.ndarray] | None = None
+        self._pagerank: np.ndarray | None = None
+
+    def __len__(self) -> int:
+        return len(self._paper_ids)
+
+    @property
+    def edge_count(self) -> int:
+        """The number of distinct citation edges."""
+        return len(self._csr_out()[1])
+
+    def intern(self, paper_id: str) -> int:
+        """Returns the integer id of a paperId, assigning the next one to an unknown paper."""
+        node = self._id_of.get(paper_id)
+        if node is None:
+            node = self._id_of[paper_id] = len(self._paper_ids)
+            self._paper_ids.append(paper_id)
+            self._in_corpus.append(0)
+        return node
+
+    def add_papers(self, papers: list[dict]) -> int:
+        """
+        Adds crawled papers and the citation edges found in their `references` and `citations`.
+
+        Args:
+            papers (list[dict]): Raw Semantic Scholar papers, e.g. the "data" of a search response.
+
+        Returns:
+            int: The number of edges appended, duplicates included.
+        """
+        appended = len(self._source)
+        for paper in papers:
+            if not paper or not paper.get("paperId"):
+                continue
+            node = self.intern(paper["paperId"])
+            self._in_corpus[node] = 1
+            for reference in paper.get("references") or []:
+                if reference.get("paperId"):
+                    self._source.append(node)
+                    self._target.append(self.intern(reference["paperId"]))
+            for cite in paper.get("citations") or []:
+                if cite.get("paperId"):
+                    self._source.append(self.intern(cite["paperId"]))
+                    self._target.append(node)
+        appended = len(self._source) - appended
+        if appended:
+            self._out = self._in = self._pagerank = None
+        return appended
+
+    def _build(self, rows: np.ndarray, columns: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        node_count = len(self._paper_ids)
+        if not node_count:
+            return np.zeros(1, dtype=np.int64), np.empty(0, dtype=np.int64)
+        # one int64 key per edge, so sorting and deduplicating is a single np.unique
+        keys = np.unique(rows * node_count + columns)
+        indptr = np.zeros(node_count + 1, dtype=np.int64)
+        np.cumsum(np.bincount(keys // node_count, minlength=node_count), out=indptr[1:])
+        return indptr, keys % node_count
+
+    def _csr_out(self) -> tuple[np.ndarray, np.ndarray]:
+        if self._out is None:
+            self._out = self._build(np.frombuffer(self._source, dtype=np.int64), np.frombuffer(self._target, dtype=np.int64))
+        return self._out
+
+    def _csr_in(self) -> tuple[np.ndarray, np.ndarray]:
+        if self._in is None:
+            self._in = self._build(np.frombuffer(self._target, dtype=np.int64), np.frombuffer(self._source, dtype=np.int64))
+        return self._in
+
+    def _nodes(self, paper_ids) -> np.ndarray:
+        """The integer ids of `paper_ids`, -1 for papers not in the graph."""
+        return np.fromiter((self._id_of.get(paper_id, -1) for paper_id in paper_ids), dtype=np.int64)
+
+    def pagerank(
+        self,
+        damping: float = DEFAULT_DAMPING,
+        tolerance: float = DEFAULT_TOLERANCE,
+        max_iterations: int = DEFAULT_MAX_ITERATIONS,
+    ) -> np.ndarray:
+        """
+        Computes the PageRank of every node by power iteration over the CSR edges.
+
+        The mass of papers without outgoing edges is spread uniformly. The result with the
+        default parameters is kept until new edges are added.
+
+        Args:
+            damping (float, optional): The damping factor. Defaults to DEFAULT_DAMPING.
+            tolerance (float, optional): Stops once the L1 change of an iteration falls below it. Defaults to DEFAULT_TOLERANCE.
+            max_iterations (int, optional): Upper bound on the iterations. Defaults to DEFAULT_MAX_ITERATIONS.
+
+        Returns:
+            np.ndarray: The scores indexed by integer id, summing to 1.
+        """
+        default = (damping, tolerance, max_iterations) == (DEFAULT_DAMPING, DEFAULT_TOLERANCE, DEFAULT_MAX_ITERATIONS)
+        if default and self._pagerank is not None:
+            return self._pagerank
+        node_count = len(self._paper_ids)
+        if not node_count:
+            return np.empty(0, dtype=np.float64)
+
+        indptr, targets = self._csr_out()
+        out_degree = np.diff(indptr)
+        sources = np.repeat(np.arange(node_count), out_degree)
+        dangling = out_degree == 0
+        inverse_degree = np.divide(1.0, out_degree, out=np.zeros(node_count), where=~dangling)
+
+        rank = np.full(node_count, 1.0 / node_count)
+        for _ in range(max_iterations):
+            spread = np.bincount(targets, weights=(rank * inverse_degree)[sources], minlength=node_count)
+            updated = damping * (spread + rank[dangling].sum() / node_count) + (1 - damping) / node_count
+            converged = np.abs(updated - rank).sum() < tolerance
+            rank = updated
+            if converged:
+                break
+        if default:
+            self._pagerank = rank
+        return rank
+
+    def pagerank_of(self, paper_ids) -> np.ndarray:
+        """
+        Looks up the PageRank of papers, e.g. to rank the results table by influence.
+
+        Args:
+            paper_ids (Iterable[str]): The paperIds.
+
+        Returns:
+            np.ndarray: One score per paperId, 0 for papers not in the graph.
+        """
+        nodes = self._nodes(paper_ids)
+        rank = self.pagerank()
+        return np.where(nodes >= 0, rank[np.maximum(nodes, 0)] if len(rank) else 0.0, 0.0)
+
+    def local_citation_count(self, paper_ids) -> np.ndarray:
+        """The number of graph papers citing each of `paper_ids`, 0 for papers not in the graph."""
+        nodes = self._nodes(paper_ids)
+        in_degree = np.diff(self._csr_in()[0])
+        return np.where(nodes >= 0, in_degree[np.maximum(nodes, 0)] if len(in_degree) else 0, 0)
+
+    def _shared_neighbours(self, first: tuple[np.ndarray, np.ndarray], second: tuple[np.ndarray, np.ndarray], paper_id: str, top_k: int) -> list[tuple[str, int]]:
+        node = self._id_of.get(paper_id)
+        if node is None:
+            return []
+        # two hops: the neighbours of the paper, then their neighbours on the way back
+        hop = _gather(*first, np.array([node]))
+        counts = np.bincount(_gather(*second, hop), minlength=len(self._paper_ids))
+        counts[node] = 0
+        # only crawled papers are worth recommending from the corpus
+        counts[np.frombuffer(self._in_corpus, dtype=np.int8) == 0] = 0
+        top = np.flatnonzero(counts)
+        top = top[np.argsort(-counts[top], kind="stable")[:top_k]]
+        return [(self._paper_ids[other], int(counts[other])) for other in top]
+
+    def co_citation(self, paper_id: str, top_k: int = 10) -> list[tuple[str, int]]:
+        """
+        Finds the crawled papers most often cited together with `paper_id`.
+
+        Args:
+            paper_id (str): The paperId.
+            top_k (int, optional): Number of papers returned. Defaults to 10.
+
+        Returns:
+            list[tuple[str, int]]: paperIds and the number of papers citing both, strongest first.
+        """
+        return self._shared_neighbours(self._csr_in(), self._csr_out(), paper_id, top_k)
+
+    def bibliographic_coupling(self, paper_id: str, top_k: int = 10) -> list[tuple[str, int]]:
+        """
+        Finds the crawled papers sharing the most references with `paper_id`.
+
+        Args:
+            paper_id (str): The paperId.
+            top_k (int, optional): Number of papers returned. Defaults to 10.
+
+        Returns:
+            list[tuple[str, int]]: paperIds and the number of shared references, strongest first.
+        """
+        return self._shared_neighbours(self._csr_out(), self._csr_in(), paper_id, top_k)
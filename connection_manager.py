@@ -0,0 +1,247 @@
+"""
+Process-wide pymilvus connections.
+
+Every Streamlit session, the agent and the LangChain stores share the connections and
+collections opened here, so the per-session setup cost and the number of open connections
+stay constant however many users are connected.
+"""
+from __future__ import annotations
+
+import random
+import threading
+import time
+from functools import lru_cache
+from typing import Callable
+
+from pymilvus import Collection, connections, utility
+
+from constant import get_secret
+
+DEFAULT_ALIAS = "default"
+HEALTH_CHECK_INTERVAL = 30.0
+MAX_CONNECT_ATTEMPTS = 5
+RECONNECT_BASE_DELAY = 0.5
+RECONNECT_MAX_DELAY = 8.0
+
+
+class MilvusConnectionManager:
+    """
+    Opens pymilvus connections lazily under named aliases and keeps them healthy.
+
+    A connection is opened on the first connect() of its alias. Later calls reuse it, pinging the
+    server at most once every `health_check_interval` seconds; a connection that fails the ping
+    is reopened, retrying with jittered exponential backoff. Collections are looked up, loaded
+    and described once per alias and shared afterwards.
+
+    Examples:
+        >>> manager = get_connection_manager()
+        >>> manager.register("staging", uri="https://staging.zillizcloud.com", token="...")
+        >>> collection = manager.collection("Production")
+        >>> manager.describe("Production")["fields"]
+    """
+
+    def __init__(
+        self,
+        health_check_interval: float = HEALTH_CHECK_INTERVAL,
+        max_attempts: int = MAX_CONNECT_ATTEMPTS,
+        base_delay: float = RECONNECT_BASE_DELAY,
+        max_delay: float = RECONNECT_MAX_DELAY,
+    ):
+        """
+        Initializes a MilvusConnectionManager object.
+
+        Args:
+            health_check_interval (float, optional): Minimum seconds between two pings of a connection. Defaults to HEALTH_CHECK_INTERVAL.
+            max_attempts (int, optional): Connection attempts before giving up. Defaults to MAX_CONNECT_ATTEMPTS.
+            base_delay (float, optional): Backoff before the second attempt, doubled on every retry. Defaults to RECONNECT_BASE_DELAY.
+            max_delay (float, optional): Upper bound of the backoff. Defaults to RECONNECT_MAX_DELAY.
+        """
+        self.health_check_interval = health_check_interval
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.connect_count = 0
+        # guards the dicts below only, never held across network calls
+        self._lock = threading.Lock()
+        # one lock per alias and per collection, so a slow reconnect only blocks its own users
+        self._alias_locks: dict[str, threading.Lock] = {}
+        self._collection_locks: dict[tuple[str, str], threading.Lock] = {}
+        self._settings: dict[str, dict] = {}
+        self._last_healthy: dict[str, float] = {}
+        self._collections: dict[tuple[str, str], Collection] = {}
+        self._descriptions: dict[tuple[str, str], dict] = {}
+
+    def _lock_for(self, locks: dict, key) -> threading.Lock:
+        with self._lock:
+            return locks.setdefault(key, threading.Lock())
+
+    def register(self, alias: str, **connection_args) -> None:
+        """
+        Sets the arguments of connections.connect for an alias, without connecting.
+
+        Registering new arguments for an alias that is already connected closes that connection;
+        the next connect() opens it with the new arguments.
+
+        Args:
+            alias (str): The connection alias.
+            **connection_args: The arguments of connections.connect, e.g. uri and token.
+
+        Returns:
+            None
+        """
+        with self._lock_for(self._alias_locks, alias):
+            with self._lock:
+                if self._settings.get(alias) == connection_args:
+                    return
+                reconnect = alias in self._settings
+                self._settings[alias] = connection_args
+                self._last_healthy.pop(alias, None)
+            if reconnect and connections.has_connection(alias):
+                connections.disconnect(alias)
+
+    def connection_args(self, alias: str = DEFAULT_ALIAS) -> dict:
+        """The arguments registered for `alias`; the default alias falls back to the Zilliz secrets."""
+        with self._lock:
+            if alias not in self._settings:
+                if alias != DEFAULT_ALIAS:
+                    raise KeyError(f"No connection registered under alias {alias!r}")
+                self._settings[alias] = {"uri": get_secret("ZILLIZ_CLOUD_URI"), "token": get_secret("ZILLIZ_API_KEY")}
+            return dict(self._settings[alias])
+
+    def _healthy(self, alias: str) -> bool:
+        try:
+            utility.get_server_version(using=alias)
+        except Exception:
+            return False
+        return True
+
+    def _open(self, alias: str) -> None:
+        connection_args = self.connection_args(alias)
+        last_error = None
+        for attempt in range(self.max_attempts):
+            if attempt:
+                delay = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+                time.sleep(delay * random.uniform(0.5, 1.0))
+            try:
+                connections.connect(alias, **connection_args)
+            except Exception as error:
+                last_error = error
+                continue
+            with self._lock:
+                self.connect_count += 1
+                self._last_healthy[alias] = time.monotonic()
+            return
+        raise ConnectionError(f"Could not connect to Milvus under alias {alias!r} after {self.max_attempts} attempts") from last_error
+
+    def _recently_healthy(self, alias: str) -> bool:
+        with self._lock:
+            last_healthy = self._last_healthy.get(alias)
+        return last_healthy is not None and time.monotonic() - last_healthy < self.health_check_interval and connections.has_connection(alias)
+
+    def connect(self, alias: str = DEFAULT_ALIAS) -> str:
+        """
+        Returns a healthy connection alias, connecting or reconnecting when needed.
+
+        Only callers of the same alias wait for its health check or reconnect; other aliases
+        and collections already opened are served meanwhile.
+
+        Args:
+            alias (str, optional): The connection alias. Defaults to DEFAULT_ALIAS.
+
+        Returns:
+            str: The alias, to pass as `using` to pymilvus.
+
+        Raises:
+            ConnectionError: When every connection attempt failed.
+        """
+        if self._recently_healthy(alias):
+            return alias
+        with self._lock_for(self._alias_locks, alias):
+            # another caller may have reconnected while this one waited
+            if self._recently_healthy(alias):
+                return alias
+            if connections.has_connection(alias):
+                if self._healthy(alias):
+                    with self._lock:
+                        self._last_healthy[alias] = time.monotonic()
+                    return alias
+                connections.disconnect(alias)
+            self._open(alias)
+            return alias
+
+    def collection(
+        self,
+        name: str,
+        alias: str = DEFAULT_ALIAS,
+        create: Callable[[str, str], Collection] | None = None,
+    ) -> Collection:
+        """
+        Returns the shared, loaded collection `name`.
+
+        Args:
+            name (str): The collection name.
+            alias (str, optional): The connection alias. Defaults to DEFAULT_ALIAS.
+            create (Callable[[str, str], Collection] | None, optional): Creates the collection from its name and alias when it does not exist. Defaults to None.
+
+        Returns:
+            Collection: The collection, bound to `alias`.
+
+        Raises:
+            ValueError: When the collection does not exist and `create` is None.
+        """
+        key = (alias, name)
+        with self._lock:
+            if key in self._collections:
+                return self._collections[key]
+        with self._lock_for(self._collection_locks, key):
+            with self._lock:
+                if key in self._collections:
+                    return self._collections[key]
+            self.connect(alias)
+            if utility.has_collection(name, using=alias):
+                collection = Collection(name=name, using=alias, enable_dynamic_field=True)
+            elif create is not None:
+                collection = create(name, alias)
+            else:
+                raise ValueError(f"Collection {name!r} does not exist")
+            collection.load()
+            description = collection.describe()
+            with self._lock:
+                self._descriptions[key] = description
+                self._collections[key] = collection
+            return collection
+
+    def describe(self, name: str, alias: str = DEFAULT_ALIAS) -> dict:
+        """The description of a collection, fetched once when it was first opened."""
+        self.collection(name, alias)
+        return self._descriptions[(alias, name)]
+
+    def close(self) -> None:
+        """Disconnects every alias and forgets the opened collections."""
+        with self._lock:
+            aliases = list(self._settings)
+            self._last_healthy.clear()
+            self._collections.clear()
+            self._descriptions.clear()
+        for alias in aliases:
+            with self._lock_for(self._alias_locks, alias):
+                if connections.has_connection(alias):
+                    connections.disconnect(alias)
+
+    def stats(self) -> dict[str, int]:
+        """
+        Reports the connection counters.
+
+        Returns:
+            dict[str, int]: Connections opened so far, aliases currently connected and collections cached.
+        """
+        with self._lock:
+            aliases = list(self._settings)
+            stats = {"connects": self.connect_count, "collections": len(self._collections)}
+        return {**stats, "connected_aliases": sum(connections.has_connection(alias) for alias in aliases)}
+
+
+@lru_cache(maxsize=None)
+def get_connection_manager() -> MilvusConnectionManager:
+    """The process-wide connection manager."""
+    return MilvusConnectionManager()
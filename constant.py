@@ -1,34 +1,109 @@
-from langchain.chat_models import ChatOpenAI
-from langchain.prompts import PromptTemplate
-from langchain.embeddings import OpenAIEmbeddings
-from langchain.callbacks.streaming_stdout import StreamingStdOutCallbackHandler
-from langchain.chains import LLMChain
-from langchain.schema import StrOutputParser
-import streamlit as st
-
-
-LLM_MODEL_4_GENERATE = ChatOpenAI(
-    model_name="gpt-4-1106-preview",
-    temperature=0.2,
-    openai_api_key=st.secrets["OPENAI_API_KEY_1"],
-    # frequency_penalty=0.5,
-    # presence_penalty=0.5,
-    callbacks=[StreamingStdOutCallbackHandler()],
-    streaming=True,
-)
-
-#LLM_MODEL_4_SUMMARIZE = ChatOpenAI(
-#    model_name="gpt-4-1106-preview",
-#    temperature=0.2,
-#    openai_api_key=st.secrets["OPENAI_API_KEY_2"],
-    # frequency_penalty=0.5,
-    # presence_penalty=0.5,
-#    callbacks=[StreamingStdOutCallbackHandler()],
-#    streaming=True,
-#)
-
-EMBEDDING_FUNC = OpenAIEmbeddings(
-    openai_api_key=st.secrets["OPENAI_API_KEY_1"],
-    model="text-embedding-ada-002",
-)
+"""
+Shared model clients.
 
+Every client is built by a memoized factory on first use, so importing this module neither
+reads secrets nor pulls in the LangChain and OpenAI client stacks. The old module-level names
+(LLM_MODEL_4_GENERATE, LLM_MODEL_4_SUMMARIZE, EMBEDDING_FUNC) still resolve, lazily, through
+the module __getattr__.
+"""
+from __future__ import annotations
+
+import os
+from functools import lru_cache
+
+GENERATE_MODEL_NAME = "gpt-4-1106-preview"
+SUMMARIZE_MODEL_NAME = "gpt-4-1106-preview"
+EMBEDDING_MODEL_NAME = "text-embedding-ada-002"
+EMBEDDING_DIM = 1536
+
+
+def get_secret(name: str, default: str | None = None) -> str:
+    """
+    Reads a secret from the environment variable of the same name, else from the Streamlit secrets.
+
+    The environment comes first so the CLI, the benchmarks and containers run without a secrets.toml.
+
+    Args:
+        name (str): The secret name, e.g. "OPENAI_API_KEY_1".
+        default (str | None, optional): Returned when the secret is set nowhere. Defaults to None.
+
+    Returns:
+        str: The secret.
+
+    Raises:
+        KeyError: When the secret is set nowhere and there is no default.
+    """
+    if (value := os.environ.get(name)) is not None:
+        return value
+    # streamlit is only imported once a secret is actually needed
+    import streamlit as st
+
+    try:
+        return st.secrets[name]
+    except (FileNotFoundError, KeyError):
+        if default is not None:
+            return default
+        raise KeyError(f"Secret {name!r} is neither an environment variable nor in the Streamlit secrets") from None
+
+
+@lru_cache(maxsize=None)
+def get_generate_llm():
+    from langchain.chat_models import ChatOpenAI
+    from langchain.callbacks.streaming_stdout import StreamingStdOutCallbackHandler
+    from telemetry import llm_callback
+
+    return ChatOpenAI(
+        model_name=GENERATE_MODEL_NAME,
+        temperature=0.2,
+        openai_api_key=get_secret("OPENAI_API_KEY_1"),
+        # frequency_penalty=0.5,
+        # presence_penalty=0.5,
+        callbacks=[StreamingStdOutCallbackHandler(), llm_callback(GENERATE_MODEL_NAME)],
+        streaming=True,
+    )
+
+
+@lru_cache(maxsize=None)
+def get_summarize_llm():
+    from langchain.chat_models import ChatOpenAI
+    from telemetry import llm_callback
+
+    # summaries run many at a time, so they are not streamed to stdout
+    return ChatOpenAI(
+        model_name=SUMMARIZE_MODEL_NAME,
+        temperature=0.2,
+        openai_api_key=get_secret("OPENAI_API_KEY_2", get_secret("OPENAI_API_KEY_1")),
+        max_retries=6,
+        callbacks=[llm_callback(SUMMARIZE_MODEL_NAME)],
+    )
+
+
+@lru_cache(maxsize=None)
+def get_embedding_func():
+    from langchain.embeddings import OpenAIEmbeddings
+    from embedding_cache import CachedEmbeddings
+    from telemetry import get_telemetry
+
+    embeddings = CachedEmbeddings(
+        OpenAIEmbeddings(
+            openai_api_key=get_secret("OPENAI_API_KEY_1"),
+            model=EMBEDDING_MODEL_NAME,
+        ),
+        model_name=EMBEDDING_MODEL_NAME,
+        dim=EMBEDDING_DIM,
+    )
+    get_telemetry().register_collector("embedding_cache", embeddings.stats)
+    return embeddings
+
+
+_LAZY_CLIENTS = {
+    "LLM_MODEL_4_GENERATE": get_generate_llm,
+    "LLM_MODEL_4_SUMMARIZE": get_summarize_llm,
+    "EMBEDDING_FUNC": get_embedding_func,
+}
+
+
+def __getattr__(name: str):
+    if name in _LAZY_CLIENTS:
+        return _LAZY_CLIENTS[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+
+import numpy as np
+from langchain.schema.embeddings import Embeddings
+
+DEFAULT_CACHE_DIR = os.path.join(".cache", "embeddings")
+INITIAL_CAPACITY = 1024
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    A content-addressed cache in front of an embedding model.
+
+    Vectors are keyed on a hash of the model name and the text, and live in a memory-mapped
+    matrix with one row per cached text. A batch lookup only sends the cache misses upstream,
+    in a single embed_documents call.
+
+    Attributes:
+        embedding_function (Embeddings): The model computing vectors on a miss.
+        model_name (str): The model name, part of every cache key.
+        dim (int): The dimension of the vectors.
+        hits (int): Texts served from the cache.
+        misses (int): Texts sent to the model.
+
+    Examples:
+        >>> embeddings = CachedEmbeddings(OpenAIEmbeddings(model="text-embedding-ada-002"), "text-embedding-ada-002")
+        >>> vectors = embeddings.embed_documents(["paper abstract", "another abstract"])
+    """
+
+    def __init__(
+        self,
+        embedding_function: Embeddings,
+        model_name: str,
+        dim: int = 1536,
+        cache_dir: str = DEFAULT_CACHE_DIR,
+        dtype: str = "float32",
+    ):
+        """
+        Initializes a CachedEmbeddings object.
+
+        Args:
+            embedding_function (Embeddings): The model computing vectors on a miss.
+            model_name (str): The model name, part of every cache key.
+            dim (int, optional): The dimension of the vectors. Defaults to 1536 (ada-002).
+            cache_dir (str, optional): Parent directory of the cache files. Defaults to DEFAULT_CACHE_DIR.
+            dtype (str, optional): "float32" or "float16" storage for the vectors. Defaults to "float32".
+        """
+        if dtype not in ("float32", "float16"):
+            raise ValueError(f"Unsupported embedding cache dtype: {dtype}")
+        self.embedding_function = embedding_function
+        self.model_name = model_name
+        self.dim = dim
+        self.dtype = np.dtype(dtype)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.join(cache_dir, f"{model_name}-{dim}-{dtype}")
+        os.makedirs(directory, exist_ok=True)
+        self._vectors_path = os.path.join(directory, "vectors.bin")
+        self._keys_path = os.path.join(directory, "keys.txt")
+
+        self._row_of: dict[str, int] = {}
+        if os.path.exists(self._keys_path):
+            with open(self._keys_path) as file:
+                for row, key in enumerate(file.read().split()):
+                    self._row_of[key] = row
+        capacity = max(INITIAL_CAPACITY, len(self._row_of))
+        if os.path.exists(self._vectors_path):
+            capacity = max(capacity, os.path.getsize(self._vectors_path) // (self.dim * self.dtype.itemsize))
+        self._open_matrix(capacity)
+
+    def _open_matrix(self, capacity: int) -> None:
+        size = capacity * self.dim * self.dtype.itemsize
+        with open(self._vectors_path, "ab") as file:
+            if file.tell() < size:
+                file.truncate(size)
+        self._matrix = np.memmap(self._vectors_path, dtype=self.dtype, mode="r+", shape=(capacity, self.dim))
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode("utf-8")).hexdigest()
+
+    def _append(self, keys: list[str], vectors: list[list[float]]) -> None:
+        start = len(self._row_of)
+        if start + len(keys) > self._matrix.shape[0]:
+            self._matrix.flush()
+            self._open_matrix(max(2 * self._matrix.shape[0], start + len(keys)))
+        self._matrix[start : start + len(keys)] = np.asarray(vectors, dtype=self.dtype)
+        self._matrix.flush()
+        # keys are written after the vectors so a crash never leaves a key pointing at an empty row
+        with open(self._keys_path, "a") as file:
+            file.write("".join(f"{key}\n" for key in keys))
+        for offset, key in enumerate(keys):
+            self._row_of[key] = start + offset
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        """
+        Embeds texts, sending only the uncached ones to the model in one call.
+
+        Args:
+            texts (list[str]): The texts to embed.
+
+        Returns:
+            list[list[float]]: One vector per text, in input order.
+        """
+        keys = [self._key(text) for text in texts]
+        with self._lock:
+            missing = {key: text for key, text in zip(keys, texts) if key not in self._row_of}
+            self.hits += len(texts) - len(missing)
+            self.misses += len(missing)
+        if missing:
+            vectors = self.embedding_function.embed_documents(list(missing.values()))
+            with self._lock:
+                new_keys = [key for key in missing if key not in self._row_of]
+                new_vectors = [vector for key, vector in zip(missing, vectors) if key not in self._row_of]
+                if new_keys:
+                    self._append(new_keys, new_vectors)
+        with self._lock:
+            rows = np.fromiter((self._row_of[key] for key in keys), dtype=np.int64, count=len(keys))
+            return self._matrix[rows].astype(np.float32).tolist()
+
+    def embed_query(self, text: str) -> list[float]:
+        """
+        Embeds a single query through the same cache.
+
+        Args:
+            text (str): The query text.
+
+        Returns:
+            list[float]: The query vector.
+        """
+        return self.embed_documents([text])[0]
+
+    def stats(self) -> dict[str, float]:
+        """
+        Reports the cache counters.
+
+        Returns:
+            dict[str, float]: Hits, misses, hit rate and number of cached vectors.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self._row_of),
+        }
@@ -0,0 +1,212 @@
+"""
+Deterministic stand-ins for the external services, for benchmarks and offline runs.
+
+    with FakeSemanticScholar(payloads, latency=0.05, throttle_rate=0.1) as server:
+        set_base_url(server.base_url)
+        generator = QuestionGenerator(llm_model=FakeKeywordLLM(latency=0.5))
+        db = ZillizVectorDatabase(embedding_function=HashEmbeddings(), backend=NumpyBackend())
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+from langchain.llms.base import LLM
+from langchain.schema.embeddings import Embeddings
+
+from lexical_index import tokenize
+
+FAKE_KEYWORD_VOCABULARY = (
+    "augmented reality", "virtual reality", "mixed reality", "extended reality", "metaverse",
+    "immersive retail", "virtual try-on", "consumer engagement", "brand experience", "purchase intention",
+    "experiential marketing", "digital twin", "haptic feedback", "avatar marketing", "virtual showroom",
+    "telepresence", "gamification", "spatial computing", "customer journey", "presence",
+)
+
+
+class FakeKeywordLLM(LLM):
+    """
+    An LLM answering every prompt with keyword lines derived from a hash of the prompt.
+
+    The same prompt always gets the same answer after `latency` seconds, like one model round trip.
+    """
+
+    latency: float = 0.0
+    keyword_count: int = 12
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-keyword"
+
+    def _call(self, prompt: str, stop: list[str] | None = None, run_manager: Any = None, **kwargs: Any) -> str:
+        self.calls += 1
+        time.sleep(self.latency)
+        rng = random.Random(zlib.crc32(prompt.encode("utf-8")))
+        keywords = rng.sample(FAKE_KEYWORD_VOCABULARY, min(self.keyword_count, len(FAKE_KEYWORD_VOCABULARY)))
+        return "\n".join(f"{index}. {keyword} in marketing" for index, keyword in enumerate(keywords, start=1))
+
+
+class HashEmbeddings(Embeddings):
+    """
+    A deterministic bag-of-words embedding: each token adds a fixed random direction.
+
+    Texts sharing words point in similar directions, which is enough for the semantic cache,
+    keyword clustering and retrieval to behave realistically. Each call sleeps `latency` seconds.
+    """
+
+    def __init__(self, dim: int = 256, latency: float = 0.0):
+        self.dim = dim
+        self.latency = latency
+        self.calls = 0
+        self._token_vectors: dict[str, np.ndarray] = {}
+        self._lock = threading.Lock()
+
+    def _token_vector(self, token: str) -> np.ndarray:
+        with self._lock:
+            vector = self._token_vectors.get(token)
+            if vector is None:
+                seed = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "big")
+                vector = self._token_vectors[token] = np.random.default_rng(seed).normal(size=self.dim)
+            return vector
+
+    def _embed(self, text: str) -> list[float]:
+        vector = np.zeros(self.dim)
+        for token in tokenize(text):
+            vector += self._token_vector(token)
+        return (vector / max(float(np.linalg.norm(vector)), 1e-12)).tolist()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        self.calls += 1
+        time.sleep(self.latency)
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_documents([text])[0]
+
+
+class FakeSemanticScholar:
+    """
+    A local HTTP server answering /paper/search and /paper/batch from recorded responses.
+
+    A query is mapped to one recorded response by a hash of its text, and paged with its
+    `offset` and `limit`. Each request waits `latency` seconds first, and a share `throttle_rate`
+    of them is refused with a 429 and a Retry-After header, like the real API past its quota.
+
+    Args:
+        payloads (list[dict]): Recorded search responses, with their papers under "data".
+        latency (float): Seconds every request takes.
+        throttle_rate (float): Share of requests answered with a 429.
+        retry_after (float): The Retry-After of a 429, in seconds.
+        seed (int): Seed of the throttling draws.
+    """
+
+    def __init__(self, payloads: list[dict], latency: float = 0.0, throttle_rate: float = 0.0, retry_after: float = 1.0, seed: int = 0):
+        self.payloads = payloads
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.requests = 0
+        self.throttled = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._papers = {paper["paperId"]: paper for payload in payloads for paper in payload["data"]}
+        self._server: ThreadingHTTPServer | None = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _throttle(self) -> bool:
+        with self._lock:
+            self.requests += 1
+            throttled = self._rng.random() < self.throttle_rate
+            self.throttled += throttled
+            return throttled
+
+    def search(self, query: str, offset: int, limit: int) -> dict:
+        """The page of the recorded response of `query`, shaped like the search endpoint's."""
+        papers = self.payloads[zlib.crc32(query.encode("utf-8")) % len(self.payloads)]["data"]
+        page = {"total": len(papers), "offset": offset, "data": papers[offset : offset + limit]}
+        if offset + limit < len(papers):
+            page["next"] = offset + limit
+        return page
+
+    def batch(self, ids: list[str]) -> list[dict | None]:
+        """The recorded papers of `ids`, None for unknown ones, like the batch endpoint."""
+        return [self._papers.get(paper_id) for paper_id in ids]
+
+    def start(self) -> FakeSemanticScholar:
+        """Starts serving on a free local port from a daemon thread."""
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _reply(self, status: int, body: Any, headers: dict | None = None) -> None:
+                payload = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _throttled(self) -> bool:
+                time.sleep(fake.latency)
+                if fake._throttle():
+                    self._reply(429, {"message": "Too Many Requests"}, {"Retry-After": f"{fake.retry_after:g}"})
+                    return True
+                return False
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                if not url.path.endswith("/paper/search"):
+                    self._reply(404, {"error": "Not found"})
+                    return
+                if self._throttled():
+                    return
+                params = parse_qs(url.query)
+                offset = int(params.get("offset", ["0"])[0])
+                limit = int(params.get("limit", ["10"])[0])
+                self._reply(200, fake.search(params.get("query", [""])[0], offset, limit))
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if not urlparse(self.path).path.endswith("/paper/batch"):
+                    self._reply(404, {"error": "Not found"})
+                    return
+                if self._throttled():
+                    return
+                self._reply(200, fake.batch(json.loads(body or b"{}").get("ids", [])))
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="fake-semantic-scholar", daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        """Stops the server."""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> FakeSemanticScholar:
+        return self.start()
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        self.stop()
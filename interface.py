@@ -1,81 +1,48 @@
 import streamlit as st
 import pandas as pd
-from question_generator import QuestionGenerator
-from web_searcher import search_paper
-from langchain.chains import LLMChain
-#from constant import LLM_MODEL_4_SUMMARIZE
-#from summarizer import SUMMARIZE_PROMPT
+from question_generator import clear_keyword_cache, get_question_generator
+from web_searcher import LIGHT_PAPER_FIELDS, PAPER_FIELDS, hydrate_in_background
+from result_accumulator import PaperAccumulator
+from citation_graph import CitationGraph
+from bibliometrics import compute_bibliometrics
+from paper_parser import format_for_display
+from research_engine import DEFAULT_FIELDS_OF_STUDY, merge_hydrations, rank_by_influence, stream_crawl
+from run_store import get_run_store
+from summarizer import SummarizationStage
+from keyword_processing import prepare_keywords
+from constant import get_embedding_func
+from scheduler import scheduler_session
+from telemetry import span
 import asyncio
+import time
+import uuid
 
 
 st.title("Personal Research Assistant :male-scientist:")
 st.text("Hi, mình là Huy Mo 👨 - trợ lý ảo của bạn.")
 st.text("Mình sẽ giúp bạn tìm kiếm các bài báo liên quan đến chủ đề mà bạn quan tâm.")
 
-question_generator = QuestionGenerator()
-#SUMMARIZE_CHAIN = LLMChain(llm = LLM_MODEL_4_SUMMARIZE, prompt = SUMMARIZE_PROMPT)
 status = None
 
 def generate_question(topic: str, description: str):
-    output = question_generator.generate_question(topic, description)
-    #final_response = question_generator.filter_result(topic, description, output)
-    return output.lines
-
-#async def summarize_abstract_async(abstract: str, title: str, study_field: str):
-#        response = await SUMMARIZE_CHAIN.acall({"abstract": abstract, "title": title, "study_field": study_field})
-#        return response["text"]
-
-#async def process_summarize_abstract(list_of_result):
-#    tasks = []
-#    for i in list_of_result:
-#        task = summarize_abstract_async(i["abstract"], i["title"], i["fieldsOfStudy"])
-#        tasks.append(task)
-#    return await asyncio.gather(*tasks)
-
-def parsing_api_result(response_json):
-    list_of_result = response_json["data"]
-    #print(len(list_of_result))
-
-    list_of_paper_id = [i["paperId"] for i in list_of_result]
-    list_of_year = [str(i["year"]) for i in list_of_result]
-    list_of_title = [i["title"] for i in list_of_result]
-    list_of_abstract = [i["abstract"] for i in list_of_result]
-    list_of_url = [i["url"] for i in list_of_result]
-
-    #list_of_field_study = [i["fieldsOfStudy"] for i in list_of_result]
-    list_of_field_study = [[field["category"] for field in i["s2FieldsOfStudy"]] for i in list_of_result]
-
-    list_of_publication_date = [i["publicationDate"] for i in list_of_result]
-    list_of_authors = [[author["name"] for author in i["authors"]] for i in list_of_result]
-    list_of_count_authors = [len(i) for i in list_of_authors]
-        
-    list_of_references = [" || ".join([paper["title"] for paper in i["references"]]) for i in list_of_result]
-    list_of_citation = [" || ".join([cite["title"] for cite in i["citations"]]) for i in list_of_result]
-    list_of_references_count = [i["referenceCount"] for i in list_of_result]
-    list_of_citation_count = [i["citationCount"] for i in list_of_result]
-    
-    list_of_bibtext_paper_citation = [i["citationStyles"]["bibtex"] for i in list_of_result]
-    
-
-    #list_of_summarize = asyncio.run(process_summarize_abstract(list_of_result))
-
-    return {
-        "paper_id": list_of_paper_id,
-        "title": list_of_title,
-        "abstract": list_of_abstract,
-        "url": list_of_url,
-        "field_study": list_of_field_study,
-        "citation_count": list_of_citation_count,
-        "references_count": list_of_references_count,
-        "publication_date": list_of_publication_date,
-        "authors": list_of_authors,
-        "authors_count": list_of_count_authors,
-        "year": list_of_year,
-        "references": list_of_references,
-        "citation": list_of_citation,
-        "bibtext_paper_citation": list_of_bibtext_paper_citation,
-        "raw_result": list_of_result
-    }
+    # memoized: resubmitting the same topic and description skips the GPT-4 call
+    return get_question_generator().generate_keywords(topic, description)
+
+async def stream_summaries(stage: SummarizationStage, result_df: pd.DataFrame, table, column_config: dict, refresh_seconds: float = 1.0):
+    summaries = {}
+    total = int(result_df["abstract"].notna().sum())
+    progress_text = "Đi summarize document 🏃‍♂️"
+    gen_bar = st.progress(0, text=progress_text)
+    last_render = 0.0
+    async for paper_id, summary in stage.stream(result_df.to_dict("records")):
+        summaries[paper_id] = summary
+        gen_bar.progress(len(summaries) / total, text=f"{progress_text} ({len(summaries)}/{total})")
+        # re-render at most once per refresh_seconds, the whole table changes with every summary
+        if time.monotonic() - last_render >= refresh_seconds:
+            table.dataframe(format_for_display(result_df.assign(summary=result_df["paper_id"].map(summaries))), use_container_width=True, column_config=column_config, hide_index=True)
+            last_render = time.monotonic()
+    gen_bar.empty()
+    return result_df.assign(summary=result_df["paper_id"].map(summaries)), stage.failed
 
 def make_clickable(link, title):
     # target _blank to open new window
@@ -93,79 +60,151 @@ def convert_to_hyperlink(dataframe):
     dataframe["url"] = clean_url
     return dataframe
 
-import contextlib
 with st.sidebar:
     form = st.form("Topic and Description Info Form")
     topic = form.text_area("Topic", value="XR in Marketing and Business", key="topic")
     description = form.text_area("Description", value="Unleashing the Metaverse: Extended Reality (XR) in Marketing", key="description")
-    related_field = form.multiselect(label = "Field of study", options = ["Business","Economics","Education","Linguistics","Engineering","Political Science","Sociology","Computer Science","Psychology"], key="related_field", default = ["Business","Economics","Education","Linguistics","Engineering","Political Science","Sociology","Computer Science","Psychology"])
+    related_field = form.multiselect(label = "Field of study", options = list(DEFAULT_FIELDS_OF_STUDY), key="related_field", default = list(DEFAULT_FIELDS_OF_STUDY))
+    papers_per_keyword = form.number_input("Papers per keyword", min_value=10, max_value=200, value=20, step=10, key="papers_per_keyword")
+    min_year = form.number_input("Published since (0 for any year)", min_value=0, max_value=2100, value=0, key="min_year")
+    summarize = form.checkbox("Summarize abstracts", value=False, key="summarize")
+    search_library = form.checkbox("Also search the saved paper library", value=False, key="search_library")
+    two_phase = form.checkbox("Two-phase fetch", value=True, key="two_phase", help="Search with titles only, then fetch the details of the unique papers")
     submmited = form.form_submit_button(label = 'Start finding related papers 🔎')
+    if st.button("Regenerate keywords", help="Forget the cached keyword lists and ask the model again"):
+        clear_keyword_cache()
+    if get_question_generator.cache_info().currsize and (semantic_cache := get_question_generator().semantic_cache) is not None:
+        semantic_stats = semantic_cache.stats()
+        st.caption(f"Keyword cache: {semantic_stats['hit_rate']:.0%} semantic hits, {semantic_stats['seconds_saved']:.0f}s of GPT-4 saved")
+    with st.expander("Past runs"):
+        # the index only, no run file is opened until one is picked
+        past_runs = get_run_store().runs()
+        run_labels = {row.run_id: f"{row.topic} · {row.created:%Y-%m-%d %H:%M} · {row.papers} papers" for row in past_runs.itertuples()}
+        reopened_run = st.selectbox("Run", list(run_labels), format_func=run_labels.get, key="past_run")
+        compared_run = st.selectbox("Compare with", [None, *run_labels], format_func=lambda run_id: "-" if run_id is None else run_labels[run_id], key="compared_run")
+        open_run = st.button("Open run", disabled=not run_labels)
+
+if open_run and not submmited:
+    column_config = {"url": st.column_config.LinkColumn("URL to website")}
+    # no crawl: the file is memory-mapped, though showing every column still reads and copies it into pandas
+    with span("open_run"):
+        past_df = get_run_store().load(reopened_run)
+    st.markdown(f"__{run_labels[reopened_run]}__")
+    if compared_run is not None and compared_run != reopened_run:
+        changes = get_run_store().diff(compared_run, reopened_run, columns=["paper_id", "title", "citation_count"])
+        st.caption(f"{changes['added'].num_rows} papers added, {changes['removed'].num_rows} removed, {changes['changed'].num_rows} with new citation counts since the compared run")
+        with st.expander("Added papers", expanded=False):
+            st.dataframe(changes["added"].to_pandas(), use_container_width=True, hide_index=True)
+    st.dataframe(format_for_display(past_df), use_container_width=True, column_config=column_config, hide_index=True)
 
 if submmited:
-    current_total = 0
-    result = {"paper_id": [], "title": [],
-              "abstract": [], "url": [],
-              "field_study": [], "publication_date": [], 
-              "citation_count": [], "references_count": [], 
-              "authors": [],  "authors_count": [], "year": [], 
-              "references": [], "citation": [],
-              "bibtext_paper_citation": []}
+    result = PaperAccumulator()
+    graph = CitationGraph()
 
 
     status = st.status("Finding related papers...", expanded=True)
 
     status.write("Generating list of keywords...")
-    keyword_list = generate_question(topic, description)
+    with span("keywords", topic=topic):
+        keyword_plan = prepare_keywords(generate_question(topic, description), get_embedding_func())
+    keyword_list = keyword_plan["keywords"]
     st.markdown("""List of keyword that has been used to find the papers: """)
     for i in keyword_list:
-        st.markdown("- " + i)
+        merged = keyword_plan["clusters"][i][1:]
+        st.markdown("- " + i + (f" _(also covers: {'; '.join(merged)})_" if merged else ""))
+    if keyword_plan["queries_saved"]:
+        st.caption(f"Merged duplicate or near-synonym keywords, saving {keyword_plan['queries_saved']} Semantic Scholar queries")
+
+    if search_library:
+        status.write("Searching the saved paper library...")
+        # imported here, the vector store client is only needed when the library is searched
+        from vector_storage import get_vector_db
+
+        # every keyword in one embedding call and one vector search
+        with span("library_search", keywords=len(keyword_list)):
+            library_hits = get_vector_db().search_many(keyword_list, limit=5, dedupe=True)
+        with st.expander("From your paper library", expanded=False):
+            for keyword, hits in zip(keyword_list, library_hits):
+                titles = [((metadata or {}).get("metadata", metadata) or {}).get("title", "Untitled") for metadata in hits["metadata"]]
+                if titles:
+                    st.markdown(f"__{keyword}__\n" + "\n".join(f"- {title}" for title in titles))
 
 
     status.write("Crawling related papers...")
     progress_text = "Đợi xíu đi kiếm tài liệu cho bạn nè 🏃‍♂️"
     api_bar = st.progress(0, text=progress_text)
-    current_progress = 0
-    raw_result = []
-    for index in range(len(keyword_list)):
-        search_result = search_paper(keyword_list[index], ",".join(related_field))
-        with contextlib.suppress(KeyError):
-            parse_dict = parsing_api_result(search_result)
-            current_total += search_result['total']
-            result["paper_id"].extend(parse_dict["paper_id"])
-            result["title"].extend(parse_dict["title"])
-            result["abstract"].extend(parse_dict["abstract"])
-            result["url"].extend(parse_dict["url"])
-            result["field_study"].extend(parse_dict["field_study"])
-            result["publication_date"].extend(parse_dict["publication_date"])
-            result["authors"].extend(parse_dict["authors"])
-            result["authors_count"].extend(parse_dict["authors_count"])
-            result["year"].extend(parse_dict["year"])
-            result["references"].extend(parse_dict["references"])
-            result["references_count"].extend(parse_dict["references_count"])
-            result["citation"].extend(parse_dict["citation"])
-            result["citation_count"].extend(parse_dict["citation_count"])
-            result["bibtext_paper_citation"].extend(parse_dict["bibtext_paper_citation"])
-            raw_result.append(parse_dict["raw_result"])
-        api_bar.progress(current_progress + 60, text=progress_text)
-
-    st.markdown(f"Found __{current_total}__ papers related to the topic __{topic}__")
+    summary = st.empty()
+    table = st.empty()
+    column_config = {"url": st.column_config.LinkColumn("URL to website")}
+    # rows are appended as each keyword comes back instead of re-rendering the whole table
+    live_table = table.dataframe(format_for_display(result.to_dataframe()), use_container_width=True, column_config=column_config, hide_index=True)
+    hydrations = []
+    failed_keywords = {}
+    crawl_fields = LIGHT_PAPER_FIELDS if two_phase else PAPER_FIELDS
+    # this browser session's requests take turns with the other sessions' in the shared scheduler
+    session_id = st.session_state.setdefault("scheduler_session", uuid.uuid4().hex)
+    with scheduler_session(session_id), span("crawl", keywords=len(keyword_list), two_phase=two_phase):
+        for index, (keyword, new_rows) in enumerate(stream_crawl(keyword_list, ",".join(related_field), result, int(papers_per_keyword), int(min_year) or None, crawl_fields, graph, failures=failed_keywords), start=1):
+            if len(new_rows):
+                with span("render_rows", rows=len(new_rows)):
+                    live_table.add_rows(format_for_display(new_rows))
+                if two_phase:
+                    # only papers new to the accumulator are hydrated, while the other keywords are still crawling
+                    hydrations.append(hydrate_in_background(new_rows["paper_id"].tolist()))
+            api_bar.progress(index / len(keyword_list), text=f"{progress_text} ({index}/{len(keyword_list)} keywords, {len(result)} papers)")
+
+    if failed_keywords:
+        st.warning(f"Semantic Scholar kept failing for {len(failed_keywords)} keywords, their papers are missing: " + "; ".join(f"{keyword} ({type(error).__name__})" for keyword, error in failed_keywords.items()))
+    summary.markdown(f"Found __{result.reported_total}__ papers related to the topic __{topic}__, __{len(result)}__ unique papers kept ({result.duplicate_ratio:.0%} duplicates across keywords)")
     api_bar.empty()
     status.write("Polishing the result...")
-
-
-
-    #progress_text = "Đi summarize document 🏃‍♂️"
-    #gen_bar = st.progress(0, text=progress_text)
-    #for i in raw_result:
-    #    result["summary_paper"].extend(asyncio.run(process_summarize_abstract(i)))
-    #    gen_bar.progress(current_progress + 60, text=progress_text)
-    #gen_bar.empty()
+    if failed_hydrations := merge_hydrations(hydrations, result, graph):
+        st.warning(f"Could not fetch the details of {failed_hydrations} batches of papers, they only show their title, year and citations")
+
+
+    with span("to_dataframe", papers=len(result)):
+        result_df = result.to_dataframe()
+    # most influential first, by PageRank within the crawled citation graph
+    result_df = rank_by_influence(result_df, graph)
+    if summarize:
+        status.write("Summarizing abstracts...")
+        # a resubmit must not keep paying for the summaries of the previous search
+        if (previous_stage := st.session_state.get("summarization_stage")) is not None:
+            previous_stage.cancel()
+        stage = st.session_state["summarization_stage"] = SummarizationStage()
+        with span("summarize", papers=len(result_df)):
+            result_df, failed_summaries = asyncio.run(stream_summaries(stage, result_df, table, column_config))
+        if failed_summaries:
+            st.warning(f"Could not summarize {failed_summaries} papers, they are shown without a summary")
 
 
     status.update(label="Kiếm xong ùi check thử xem ạ 👏", state="complete", expanded=True)
-    result_df = pd.DataFrame(result)
     #st.dataframe(result_df, use_container_width=True, column_config={"url": st.column_config.LinkColumn("URL to website")})
-    st.data_editor(result_df, use_container_width=True, num_rows="dynamic", column_config={"url": st.column_config.LinkColumn("URL to website")}, hide_index=True)
+    with span("render_table", rows=len(result_df)):
+        table.data_editor(format_for_display(result_df), use_container_width=True, num_rows="dynamic", column_config=column_config, hide_index=True)
+    with span("save_run", papers=len(result_df)):
+        # the store deletes the oldest runs past MAX_RUNS, so resubmitting does not grow .cache/runs forever
+        get_run_store().save(result_df, topic, description, keyword_list)
+
+    with st.expander("Bibliometrics", expanded=False):
+        # cached per result set, so rerunning the script for the same papers is free
+        with span("bibliometrics"):
+            bibliometrics = compute_bibliometrics(result_df)
+        citation_stats = bibliometrics["citations"]
+        papers_col, citations_col, h_col, g_col = st.columns(4)
+        papers_col.metric("Papers", citation_stats["papers"])
+        citations_col.metric("Citations", citation_stats["total_citations"])
+        h_col.metric("h-index", citation_stats["h_index"])
+        g_col.metric("g-index", citation_stats["g_index"])
+        st.markdown("Publications per year")
+        st.bar_chart(bibliometrics["publications_per_year"])
+        st.markdown("Fields of study")
+        st.bar_chart(bibliometrics["fields"])
+        st.markdown("Top authors")
+        st.dataframe(bibliometrics["top_authors"], use_container_width=True, hide_index=True)
+        st.markdown("Most frequent co-authors")
+        st.dataframe(bibliometrics["coauthorship"], use_container_width=True, hide_index=True)
+        st.caption(", ".join(f"{name.removesuffix('_citations')}: {value:.0f}" for name, value in citation_stats.items() if name.startswith("p") and name.endswith("_citations")) + " citations")
     
     
     
@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import re
+
+import numpy as np
+from langchain.schema.embeddings import Embeddings
+
+DEFAULT_CLUSTER_THRESHOLD = 0.93
+
+# "1.", "2)", "-", "*" or "•" list markers the LLM puts in front of keywords; a number is only a
+# marker when whitespace follows, so "360-degree video" or "3.5D displays" keep their number
+_LIST_MARKER = re.compile(r"^\s*(?:\d+\s*[.)](?=\s)|[-*•])\s*")
+_QUOTES = "\"'`“”‘’"
+
+
+def normalize_keyword(keyword: str) -> str:
+    """
+    Strips list markers, quotes, trailing punctuation and repeated whitespace from a keyword.
+
+    Args:
+        keyword (str): One line of the LLM output.
+
+    Returns:
+        str: The cleaned keyword, empty when nothing is left.
+    """
+    keyword = _LIST_MARKER.sub("", keyword)
+    keyword = keyword.strip().strip(_QUOTES + "*_").strip().rstrip(".,;:")
+    return " ".join(keyword.split())
+
+
+def deduplicate_keywords(keyword_list: list[str]) -> list[str]:
+    """
+    Normalizes keywords and drops empty ones and case-insensitive duplicates, keeping the first occurrence.
+
+    Args:
+        keyword_list (list[str]): The raw keywords.
+
+    Returns:
+        list[str]: The normalized, unique keywords in their original order.
+    """
+    unique = {}
+    for keyword in map(normalize_keyword, keyword_list):
+        if keyword and keyword.casefold() not in unique:
+            unique[keyword.casefold()] = keyword
+    return list(unique.values())
+
+
+def cluster_keywords(
+    keyword_list: list[str],
+    embedding_function: Embeddings,
+    threshold: float = DEFAULT_CLUSTER_THRESHOLD,
+) -> dict[str, list[str]]:
+    """
+    Groups semantically redundant keywords.
+
+    All keywords are embedded in one batch and compared through a single cosine similarity
+    matrix. Walking the keywords in order, each one not yet clustered becomes a representative
+    and absorbs every remaining keyword at least `threshold` similar to it.
+
+    Args:
+        keyword_list (list[str]): Normalized, unique keywords.
+        embedding_function (Embeddings): Embeds the keywords.
+        threshold (float, optional): Minimum cosine similarity to merge. Defaults to DEFAULT_CLUSTER_THRESHOLD.
+
+    Returns:
+        dict[str, list[str]]: Each representative mapped to the keywords of its cluster, itself first.
+    """
+    if len(keyword_list) < 2:
+        return {keyword: [keyword] for keyword in keyword_list}
+    vectors = np.asarray(embedding_function.embed_documents(keyword_list), dtype=np.float32)
+    vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    similar = (vectors @ vectors.T) >= threshold
+
+    clusters = {}
+    unassigned = np.ones(len(keyword_list), dtype=bool)
+    for index, keyword in enumerate(keyword_list):
+        if not unassigned[index]:
+            continue
+        members = np.flatnonzero(similar[index] & unassigned)
+        unassigned[members] = False
+        clusters[keyword] = [keyword] + [keyword_list[member] for member in members if member != index]
+    return clusters
+
+
+def prepare_keywords(
+    keyword_list: list[str],
+    embedding_function: Embeddings | None = None,
+    threshold: float = DEFAULT_CLUSTER_THRESHOLD,
+) -> dict:
+    """
+    Turns the raw LLM keyword lines into the queries to crawl.
+
+    Args:
+        keyword_list (list[str]): The raw keywords.
+        embedding_function (Embeddings | None, optional): Embeds keywords for clustering; clustering is skipped when None. Defaults to None.
+        threshold (float, optional): Minimum cosine similarity to merge. Defaults to DEFAULT_CLUSTER_THRESHOLD.
+
+    Returns:
+        dict: "keywords" to crawl, "clusters" of merged keywords per representative and the number of "queries_saved".
+    """
+    unique = deduplicate_keywords(keyword_list)
+    if embedding_function is None:
+        clusters = {keyword: [keyword] for keyword in unique}
+    else:
+        clusters = cluster_keywords(unique, embedding_function, threshold)
+    return {
+        "keywords": list(clusters),
+        "clusters": clusters,
+        "queries_saved": len(keyword_list) - len(clusters),
+    }
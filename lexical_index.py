@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+import json
+import math
+import os
+import re
+import threading
+from array import array
+from collections import Counter
+
+import numpy as np
+
+DEFAULT_K1 = 1.5
+DEFAULT_B = 0.75
+DEFAULT_RRF_K = 60
+
+# acronyms like "AR", "VR" or "MR" are kept, they are what dense search misses
+_TOKEN = re.compile(r"[0-9a-z]+")
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercases `text` and splits it into alphanumeric tokens."""
+    return _TOKEN.findall(text.lower())
+
+
+def reciprocal_rank_fusion(rankings: list[list[int]], k: int = DEFAULT_RRF_K) -> list[tuple[int, float]]:
+    """
+    Fuses ranked id lists with reciprocal-rank fusion: each id scores the sum of 1 / (k + rank) over the lists.
+
+    Args:
+        rankings (list[list[int]]): The ids of each retriever, best first.
+        k (int, optional): Dampens the weight of the top ranks. Defaults to DEFAULT_RRF_K.
+
+    Returns:
+        list[tuple[int, float]]: Every id with its fused score, best first.
+    """
+    scores: dict[int, float] = {}
+    for ranking in rankings:
+        for rank, pk in enumerate(ranking, start=1):
+            scores[pk] = scores.get(pk, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+class BM25Index:
+    """
+    An incremental Okapi BM25 inverted index over the stored titles and abstracts.
+
+    Every posting list is a pair of typed arrays (document rows and term frequencies), so a
+    query term is scored over its whole posting list with NumPy. Re-adding an id tombstones its
+    previous row. With a `directory`, added texts are appended to a JSON-lines file that is
+    replayed on start.
+
+    Examples:
+        >>> index = BM25Index()
+        >>> index.add([1, 2], ["Mixed reality (MR) in retail", "Virtual try-on and purchase intention"])
+        >>> index.search("MR retail", limit=1)
+        [(1, 1.445...)]
+    """
+
+    def __init__(self, directory: str | None = None, k1: float = DEFAULT_K1, b: float = DEFAULT_B):
+        """
+        Initializes a BM25Index object.
+
+        Args:
+            directory (str | None, optional): Where to persist the indexed texts, or None to keep them in memory. Defaults to None.
+            k1 (float, optional): Term frequency saturation. Defaults to DEFAULT_K1.
+            b (float, optional): Document length normalization. Defaults to DEFAULT_B.
+        """
+        self.directory = directory
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self._row_of: dict[int, int] = {}
+        self._ids = array("q")
+        self._lengths = array("q")
+        self._alive = array("b")
+        self._live_length = 0
+        self._postings: dict[str, tuple[array, array]] = {}
+
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+            path = self._path()
+            if os.path.exists(path):
+                with open(path) as file:
+                    rows = [json.loads(line) for line in file]
+                self._add([row["id"] for row in rows], [row["text"] for row in rows])
+
+    def __len__(self) -> int:
+        return len(self._row_of)
+
+    def _path(self) -> str:
+        return os.path.join(self.directory, "bm25.jsonl")
+
+    def _add(self, ids: list[int], texts: list[str]) -> None:
+        for pk, text in zip(ids, texts):
+            previous = self._row_of.get(pk)
+            if previous is not None:
+                self._alive[previous] = 0
+                self._live_length -= self._lengths[previous]
+            row = len(self._ids)
+            self._row_of[pk] = row
+            tokens = tokenize(text)
+            self._ids.append(pk)
+            self._lengths.append(len(tokens))
+            self._alive.append(1)
+            self._live_length += len(tokens)
+            for term, frequency in Counter(tokens).items():
+                rows, frequencies = self._postings.setdefault(term, (array("q"), array("q")))
+                rows.append(row)
+                frequencies.append(frequency)
+
+    def add(self, ids: list[int], texts: list[str]) -> None:
+        """
+        Indexes texts, replacing the text of ids that are already indexed.
+
+        Args:
+            ids (list[int]): The primary keys, the same as in the vector store.
+            texts (list[str]): The text of each id, e.g. title and abstract.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            self._add(ids, texts)
+            if self.directory is not None:
+                with open(self._path(), "a") as file:
+                    for pk, text in zip(ids, texts):
+                        file.write(json.dumps({"id": pk, "text": text}) + "\n")
+
+    def search(self, query: str, limit: int = 10) -> list[tuple[int, float]]:
+        """
+        Ranks the indexed texts against `query` with BM25.
+
+        Args:
+            query (str): The query text.
+            limit (int, optional): Number of hits. Defaults to 10.
+
+        Returns:
+            list[tuple[int, float]]: ids and BM25 scores, best first; texts sharing no term with the query are left out.
+        """
+        with self._lock:
+            if not self._row_of:
+                return []
+            alive = np.frombuffer(self._alive, dtype=np.int8).astype(bool)
+            lengths = np.frombuffer(self._lengths, dtype=np.int64)
+            document_count = len(self._row_of)
+            normalizer = self.k1 * (1 - self.b + self.b * lengths / max(self._live_length / document_count, 1.0))
+            scores = np.zeros(len(self._ids), dtype=np.float64)
+            for term in set(tokenize(query)):
+                if term not in self._postings:
+                    continue
+                rows, frequencies = (np.frombuffer(column, dtype=np.int64) for column in self._postings[term])
+                live = alive[rows]
+                rows, frequencies = rows[live], frequencies[live]
+                if not len(rows):
+                    continue
+                idf = math.log(1 + (document_count - len(rows) + 0.5) / (len(rows) + 0.5))
+                scores[rows] += idf * frequencies * (self.k1 + 1) / (frequencies + normalizer[rows])
+
+            matched = np.flatnonzero(scores)
+            if len(matched) > limit:
+                matched = matched[np.argpartition(-scores[matched], limit - 1)[:limit]]
+            matched = matched[np.argsort(-scores[matched], kind="stable")]
+            ids = np.frombuffer(self._ids, dtype=np.int64)
+            return [(int(ids[row]), float(scores[row])) for row in matched]
@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import pandas as pd
+
+# nested columns kept as lists of titles and only joined when rendered
+JOINED_COLUMNS = ("references", "citation")
+DISPLAY_SEPARATOR = " || "
+
+
+def parsing_api_result(response_json: dict) -> dict[str, list]:
+    """
+    Parses a Semantic Scholar search response into columns in a single pass over the papers.
+
+    Authors, fields of study, references and citations stay as lists; use format_for_display
+    to join references and citations into strings for the table.
+
+    Args:
+        response_json (dict): The decoded response of the paper search endpoint.
+
+    Returns:
+        dict[str, list]: One list per output column, plus the untouched papers under "raw_result".
+    """
+    list_of_result = response_json["data"]
+
+    paper_id, title, abstract, url, field_study = [], [], [], [], []
+    citation_count, references_count, publication_date = [], [], []
+    authors, authors_count, year, references, citation, bibtext = [], [], [], [], [], []
+
+    for paper in list_of_result:
+        # .get with defaults, so the lightweight search projection parses into the same columns
+        paper_authors = [author["name"] for author in paper.get("authors") or []]
+        citation_styles = paper.get("citationStyles") or {}
+
+        paper_id.append(paper["paperId"])
+        title.append(paper.get("title"))
+        abstract.append(paper.get("abstract"))
+        url.append(paper.get("url"))
+        field_study.append([field["category"] for field in paper.get("s2FieldsOfStudy") or []])
+        citation_count.append(paper.get("citationCount"))
+        references_count.append(paper.get("referenceCount"))
+        publication_date.append(paper.get("publicationDate"))
+        authors.append(paper_authors)
+        authors_count.append(len(paper_authors))
+        year.append(str(paper.get("year")))
+        references.append([reference["title"] for reference in paper.get("references") or []])
+        citation.append([cite["title"] for cite in paper.get("citations") or []])
+        bibtext.append(citation_styles.get("bibtex"))
+
+    return {
+        "paper_id": paper_id,
+        "title": title,
+        "abstract": abstract,
+        "url": url,
+        "field_study": field_study,
+        "citation_count": citation_count,
+        "references_count": references_count,
+        "publication_date": publication_date,
+        "authors": authors,
+        "authors_count": authors_count,
+        "year": year,
+        "references": references,
+        "citation": citation,
+        "bibtext_paper_citation": bibtext,
+        "raw_result": list_of_result,
+    }
+
+
+def format_for_display(dataframe: pd.DataFrame) -> pd.DataFrame:
+    """
+    Joins the reference and citation title lists into the strings shown in the results table.
+
+    Args:
+        dataframe (pd.DataFrame): The results table with list columns.
+
+    Returns:
+        pd.DataFrame: A copy with JOINED_COLUMNS turned into DISPLAY_SEPARATOR-joined strings.
+    """
+    dataframe = dataframe.copy()
+    for column in JOINED_COLUMNS:
+        if column in dataframe:
+            dataframe[column] = [DISPLAY_SEPARATOR.join(t for t in titles if t) for titles in dataframe[column]]
+    return dataframe
@@ -1,6 +1,12 @@
 import re
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
 from pydantic import BaseModel, Field
-from constant import LLM_MODEL_4_GENERATE, EMBEDDING_FUNC
+from constant import get_embedding_func, get_generate_llm
+from semantic_cache import SemanticQueryCache
+from telemetry import count, get_telemetry, span
 from langchain.output_parsers import PydanticOutputParser
 from langchain.prompts import PromptTemplate
 from langchain.chains import LLMChain
@@ -14,11 +20,26 @@ class LineListOutputParser(PydanticOutputParser):
         super().__init__(pydantic_object=LineList)
 
     def parse(self, text: str) -> LineList:
-        lines = text.strip().split("\n")
+        lines = [line for line in text.strip().split("\n") if line.strip()]
         return LineList(lines=lines)
 
 output_parser = LineListOutputParser()
 
+# bump whenever a keyword prompt changes, so cached keyword lists from the old prompt are not reused
+PROMPT_VERSION = 1
+KEYWORD_CACHE_SIZE = 256
+
+_keyword_cache: OrderedDict[tuple, list[str]] = OrderedDict()
+_keyword_cache_lock = threading.Lock()
+
+
+def clear_keyword_cache() -> None:
+    """Forgets every memoized keyword list, including the semantic cache of the shared generator."""
+    with _keyword_cache_lock:
+        _keyword_cache.clear()
+    if get_question_generator.cache_info().currsize and get_question_generator().semantic_cache is not None:
+        get_question_generator().semantic_cache.clear()
+
 FIRST_ROUND_KEYWORD_PROMPT = PromptTemplate(
     input_variables=["topic", "description"],
     template="""
@@ -68,11 +89,15 @@ FILTER_ROUND_KEYWORD_PROMPT = PromptTemplate(
 class QuestionGenerator:
     def __init__(
         self,
-        llm_model: ChatOpenAI = LLM_MODEL_4_GENERATE,
+        llm_model: ChatOpenAI | None = None,
         first_round_template: PromptTemplate = FIRST_ROUND_KEYWORD_PROMPT,
         second_round_template: PromptTemplate = FILTER_ROUND_KEYWORD_PROMPT,
         output_parser: PydanticOutputParser = output_parser,
+        semantic_cache: SemanticQueryCache | None = None,
     ):
+        llm_model = llm_model or get_generate_llm()
+        self.semantic_cache = semantic_cache
+        self.model_name = getattr(llm_model, "model_name", type(llm_model).__name__)
         self.llm_chain_first_round = LLMChain(llm = llm_model,
                                   prompt = first_round_template,
                                   output_parser = output_parser)
@@ -84,6 +109,44 @@ class QuestionGenerator:
         response = self.llm_chain_first_round.invoke({"topic": topic, "description": description})
         
         return response["text"]
+
+    def generate_keywords(self, topic: str, description: str) -> list[str]:
+        """
+        Generates the keyword list, memoized on (topic, description, PROMPT_VERSION, model name).
+
+        On an exact miss, the semantic cache (when set) can still answer with the keywords of
+        a reworded earlier request.
+
+        Args:
+            topic (str): The research topic.
+            description (str): The description of the project.
+
+        Returns:
+            list[str]: The keywords, a fresh copy on every call.
+        """
+        key = (topic, description, PROMPT_VERSION, self.model_name)
+        with _keyword_cache_lock:
+            if key in _keyword_cache:
+                _keyword_cache.move_to_end(key)
+                count("cache_lookups", cache="keywords", result="hit")
+                return list(_keyword_cache[key])
+
+        namespace = f"{PROMPT_VERSION}:{self.model_name}"
+        keywords = None
+        if self.semantic_cache is not None:
+            keywords = self.semantic_cache.lookup(topic, description, namespace)
+        count("cache_lookups", cache="keywords", result="miss" if keywords is None else "semantic_hit")
+        if keywords is None:
+            start = time.perf_counter()
+            with span("generate_keywords", model=self.model_name):
+                keywords = self.generate_question(topic, description).lines
+            if self.semantic_cache is not None:
+                self.semantic_cache.add(topic, description, keywords, time.perf_counter() - start, namespace)
+        with _keyword_cache_lock:
+            _keyword_cache[key] = list(keywords)
+            while len(_keyword_cache) > KEYWORD_CACHE_SIZE:
+                _keyword_cache.popitem(last=False)
+        return keywords
     
     def filter_result(self, topic: str, description: str, keyword_list: list[str]):
         response = self.llm_chain_second_round.invoke({"topic": topic, "description": description, "keyword_list": keyword_list})
@@ -103,6 +166,14 @@ class QuestionGenerator:
     def customize_prompt(self, customize_prompting):
         raise NotImplementedError
 
+
+@lru_cache(maxsize=None)
+def get_question_generator() -> QuestionGenerator:
+    """The process-wide QuestionGenerator, so Streamlit reruns reuse its chains and caches."""
+    semantic_cache = SemanticQueryCache(get_embedding_func())
+    get_telemetry().register_collector("semantic_keyword_cache", semantic_cache.stats)
+    return QuestionGenerator(semantic_cache=semantic_cache)
+
 #query = "Unleashing the Metaverse: Extended Reality (XR) in Marketing"
 #description = """
 #Embark on a captivating exploration of Extended Reality (XR) in marketing through this 10-week project. In the first three weeks, you will concentrate on a guided deep dive into the literature of XR, which encompasses Augmented Reality (AR), Virtual Reality (VR), and Mixed Reality (MR). 
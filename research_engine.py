@@ -0,0 +1,405 @@
+"""
+The research pipeline without the UI: generate keywords, crawl, parse, deduplicate and rank.
+
+interface.py drives it one topic at a time; the command line runs a whole file of topics
+concurrently and writes one Parquet file per topic:
+
+    python research_engine.py jobs.jsonl --output-dir reading_lists --jobs 4
+
+Every job shares the process-wide keyword generator, embedding, response caches and the
+Semantic Scholar request budget of web_searcher, so running more jobs at once speeds things
+up until that budget is the bottleneck, never past it.
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import logging
+import os
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
+from typing import Iterator
+
+import pandas as pd
+import pyarrow.parquet as pq
+import requests
+from langchain.schema.embeddings import Embeddings
+
+import web_searcher
+from citation_graph import CitationGraph
+from keyword_processing import prepare_keywords
+from paper_parser import parsing_api_result
+from question_generator import QuestionGenerator
+from result_accumulator import PaperAccumulator
+from run_store import RunStore, get_run_store, to_arrow
+from scheduler import scheduler_session
+from telemetry import count, span
+from web_searcher import LIGHT_PAPER_FIELDS, PAPER_FIELDS, hydrate_in_background, search_paper_pages, search_papers_concurrently
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FIELDS_OF_STUDY = (
+    "Business", "Economics", "Education", "Linguistics", "Engineering",
+    "Political Science", "Sociology", "Computer Science", "Psychology",
+)
+DEFAULT_PAPERS_PER_KEYWORD = 20
+DEFAULT_CONCURRENT_JOBS = 4
+# keywords of one job crawled at once; the request budget is shared with the other jobs anyway
+KEYWORD_WORKERS = 4
+# what a keyword or hydration batch may fail with once the scheduler gave up, without failing the whole run
+CRAWL_ERRORS = (requests.RequestException, TimeoutError, ValueError)
+
+
+class ResearchJob:
+    """
+    One topic to research.
+
+    Examples:
+        >>> job = ResearchJob("XR in Marketing", "Unleashing the Metaverse", fields=["Business"])
+        >>> job.name
+        'xr-in-marketing'
+    """
+
+    def __init__(
+        self,
+        topic: str,
+        description: str = "",
+        fields: list[str] | str | None = None,
+        papers_per_keyword: int = DEFAULT_PAPERS_PER_KEYWORD,
+        min_year: int | None = None,
+        two_phase: bool = True,
+        name: str | None = None,
+    ):
+        """
+        Initializes a ResearchJob object.
+
+        Args:
+            topic (str): The research topic.
+            description (str, optional): The description of the project. Defaults to "".
+            fields (list[str] | str | None, optional): Fields of study, as a list or comma separated. Defaults to DEFAULT_FIELDS_OF_STUDY.
+            papers_per_keyword (int, optional): Papers collected per keyword. Defaults to DEFAULT_PAPERS_PER_KEYWORD.
+            min_year (int | None, optional): Oldest publication year to keep. Defaults to None.
+            two_phase (bool, optional): Search with LIGHT_PAPER_FIELDS, then hydrate the unique papers. Defaults to True.
+            name (str | None, optional): Names the output file. Defaults to a slug of the topic.
+        """
+        if isinstance(fields, str):
+            fields = [field.strip() for field in fields.split(",") if field.strip()]
+        self.topic = topic
+        self.description = description
+        self.fields = list(fields) if fields is not None else list(DEFAULT_FIELDS_OF_STUDY)
+        self.papers_per_keyword = papers_per_keyword
+        self.min_year = min_year or None
+        self.two_phase = two_phase
+        self.name = name or re.sub(r"[^0-9a-z]+", "-", topic.lower()).strip("-") or "job"
+
+    @classmethod
+    def from_dict(cls, row: dict) -> ResearchJob:
+        """Builds a job from a row of a jobs file, ignoring empty values."""
+        row = {key: value for key, value in row.items() if value not in (None, "")}
+        for key in ("papers_per_keyword", "min_year"):
+            if key in row:
+                row[key] = int(row[key])
+        if isinstance(row.get("two_phase"), str):
+            row["two_phase"] = row["two_phase"].strip().lower() not in ("0", "false", "no")
+        return cls(**row)
+
+    def __repr__(self) -> str:
+        return f"ResearchJob(name={self.name!r}, topic={self.topic!r})"
+
+
+def load_jobs(path: str) -> list[ResearchJob]:
+    """
+    Reads a jobs file: JSON lines, a JSON list, or a CSV with a header row.
+
+    Every row has a "topic" and optionally "description", "fields", "papers_per_keyword",
+    "min_year", "two_phase" and "name". A job whose name is already taken gets the first free numeric suffix.
+
+    Args:
+        path (str): The jobs file, its format told by its extension.
+
+    Returns:
+        list[ResearchJob]: The jobs in file order.
+    """
+    with open(path, newline="") as file:
+        if path.endswith(".csv"):
+            rows = list(csv.DictReader(file))
+        elif path.endswith(".json"):
+            rows = json.load(file)
+        else:
+            rows = [json.loads(line) for line in file if line.strip()]
+
+    jobs = [ResearchJob.from_dict(row) for row in rows]
+    taken = set()
+    for job in jobs:
+        name, suffix = job.name, 2
+        # "a", "a" and "a 2" must not end up writing the same a-2.parquet
+        while name in taken:
+            name, suffix = f"{job.name}-{suffix}", suffix + 1
+        job.name = name
+        taken.add(name)
+    return jobs
+
+
+def stream_crawl(
+    keyword_list: list[str],
+    field_of_study: str,
+    accumulator: PaperAccumulator,
+    papers_per_keyword: int = DEFAULT_PAPERS_PER_KEYWORD,
+    min_year: int | None = None,
+    fields: str = PAPER_FIELDS,
+    graph: CitationGraph | None = None,
+    max_workers: int = web_searcher.MAX_CONCURRENT_REQUESTS,
+    failures: dict[str, Exception] | None = None,
+) -> Iterator[tuple[str, pd.DataFrame]]:
+    """
+    Crawls every keyword and yields after each response, as soon as it arrives.
+    Each keyword is paged until `papers_per_keyword` papers published since `min_year` are found.
+    With `fields=LIGHT_PAPER_FIELDS` only the first phase of a two-phase fetch is done, see hydrate_papers.
+    The references and citations of every response are added to `graph` when given.
+    A keyword whose search still fails after the scheduler's retries adds no rows and is
+    recorded in `failures`; without `failures` its error is raised.
+
+    Yields:
+        tuple[str, pd.DataFrame]: The keyword and the rows it added to the accumulator.
+    """
+    search = partial(search_paper_pages, max_papers=papers_per_keyword, min_year=min_year, fields=fields)
+
+    def search_func(keyword: str, field_of_study: str) -> dict | Exception:
+        try:
+            return search(keyword, field_of_study)
+        except CRAWL_ERRORS as error:
+            if failures is None:
+                raise
+            return error
+
+    for keyword, search_result in search_papers_concurrently(keyword_list, field_of_study, max_workers, search_func=search_func):
+        start = len(accumulator)
+        if isinstance(search_result, Exception):
+            count("crawl_failures", error=type(search_result).__name__)
+            failures[keyword] = search_result
+            yield keyword, accumulator.to_dataframe(start)
+            continue
+        with span("keyword", keyword=keyword):
+            with span("parse", keyword=keyword):
+                parse_dict = parsing_api_result(search_result)
+            accumulator.add(keyword, parse_dict, search_result["total"])
+            if graph is not None:
+                graph.add_papers(search_result["data"])
+        yield keyword, accumulator.to_dataframe(start)
+
+
+def merge_hydrations(hydrations: list, accumulator: PaperAccumulator, graph: CitationGraph | None = None) -> int:
+    """
+    Waits for the futures of hydrate_in_background and overwrites the light rows with the full papers.
+
+    Returns:
+        int: The number of batches that failed, whose papers keep their light rows.
+    """
+    failed = 0
+    with span("hydrate", batches=len(hydrations)):
+        for hydration in hydrations:
+            try:
+                hydrated = list(hydration.result().values())
+            except CRAWL_ERRORS as error:
+                count("hydration_failures", error=type(error).__name__)
+                failed += 1
+                continue
+            accumulator.update(parsing_api_result({"data": hydrated}))
+            if graph is not None:
+                graph.add_papers(hydrated)
+    return failed
+
+
+def rank_by_influence(result_df: pd.DataFrame, graph: CitationGraph) -> pd.DataFrame:
+    """Adds the PageRank "influence" and "local_citations" columns, most influential first."""
+    with span("rank", papers=len(result_df)):
+        return result_df.assign(
+            influence=graph.pagerank_of(result_df["paper_id"]),
+            local_citations=graph.local_citation_count(result_df["paper_id"]),
+        ).sort_values("influence", ascending=False, ignore_index=True)
+
+
+class ResearchEngine:
+    """
+    Runs research jobs end to end, one or many at a time.
+
+    Examples:
+        >>> engine = ResearchEngine()
+        >>> result_df = engine.run(ResearchJob("XR in Marketing", "Unleashing the Metaverse"))
+        >>> for job, path, failures, error in engine.run_many(load_jobs("jobs.jsonl"), "reading_lists"):
+        ...     print(job.name, path or error)
+    """
+
+    def __init__(
+        self,
+        question_generator: QuestionGenerator | None = None,
+        embedding_function: Embeddings | None = None,
+        keyword_workers: int = KEYWORD_WORKERS,
+    ):
+        """
+        Initializes a ResearchEngine object.
+
+        Args:
+            question_generator (QuestionGenerator | None, optional): Generates the keywords. Defaults to the process-wide generator.
+            embedding_function (Embeddings | None, optional): Embeds keywords to merge near-synonyms. Defaults to the process-wide embedding.
+            keyword_workers (int, optional): Keywords of one job crawled at once. Defaults to KEYWORD_WORKERS.
+        """
+        self._question_generator = question_generator
+        self._embedding_function = embedding_function
+        self.keyword_workers = keyword_workers
+
+    @property
+    def question_generator(self) -> QuestionGenerator:
+        if self._question_generator is None:
+            from question_generator import get_question_generator
+
+            self._question_generator = get_question_generator()
+        return self._question_generator
+
+    @property
+    def embedding_function(self) -> Embeddings:
+        if self._embedding_function is None:
+            from constant import get_embedding_func
+
+            self._embedding_function = get_embedding_func()
+        return self._embedding_function
+
+    def plan_keywords(self, job: ResearchJob) -> dict:
+        """The keyword plan of a job, as returned by prepare_keywords."""
+        with span("keywords", topic=job.topic):
+            return prepare_keywords(self.question_generator.generate_keywords(job.topic, job.description), self.embedding_function)
+
+    def run(self, job: ResearchJob) -> pd.DataFrame:
+        """
+        Researches one topic.
+
+        The job's requests are queued under its own scheduler session, so concurrent jobs and
+        app users get their turns round-robin. Keywords and hydration batches that kept failing
+        are left out and listed in the "failed_keywords" and "failed_hydrations" attrs of the result.
+
+        Args:
+            job (ResearchJob): The topic and crawl settings.
+
+        Returns:
+            pd.DataFrame: One row per unique paper, most influential first, as shown in the app.
+
+        Raises:
+            requests.RequestException: When every keyword failed.
+        """
+        accumulator = PaperAccumulator()
+        graph = CitationGraph()
+        keyword_list = self.plan_keywords(job)["keywords"]
+        crawl_fields = LIGHT_PAPER_FIELDS if job.two_phase else PAPER_FIELDS
+        hydrations = []
+        failures = {}
+        with scheduler_session(f"job:{job.name}"), span("crawl", keywords=len(keyword_list), two_phase=job.two_phase):
+            crawl = stream_crawl(keyword_list, ",".join(job.fields), accumulator, job.papers_per_keyword, job.min_year, crawl_fields, graph, self.keyword_workers, failures)
+            for _, new_rows in crawl:
+                if job.two_phase and len(new_rows):
+                    hydrations.append(hydrate_in_background(new_rows["paper_id"].tolist()))
+        if keyword_list and len(failures) == len(keyword_list):
+            raise next(iter(failures.values()))
+        failed_hydrations = merge_hydrations(hydrations, accumulator, graph)
+        with span("to_dataframe", papers=len(accumulator)):
+            result_df = accumulator.to_dataframe()
+        result_df = rank_by_influence(result_df, graph)
+        result_df.attrs.update(failed_keywords=sorted(failures), failed_hydrations=failed_hydrations)
+        if failures or failed_hydrations:
+            logger.info("%s: %d keywords and %d hydration batches failed and were left out", job.name, len(failures), failed_hydrations)
+        return result_df
+
+    def run_to_parquet(self, job: ResearchJob, output_dir: str, store: RunStore | None = None) -> tuple[str, dict]:
+        """
+        Runs a job and writes its results to <output_dir>/<job name>.parquet.
+
+        Args:
+            job (ResearchJob): The topic and crawl settings.
+            output_dir (str): Where the Parquet file is written.
+            store (RunStore | None, optional): Also records the run there, to reopen it in the app. Defaults to None.
+
+        Returns:
+            tuple[str, dict]: The path of the Parquet file, and the "failed_keywords" and "failed_hydrations" left out of it.
+        """
+        result_df = self.run(job)
+        os.makedirs(output_dir, exist_ok=True)
+        path = os.path.join(output_dir, f"{job.name}.parquet")
+        with span("write_parquet", rows=len(result_df)):
+            table = to_arrow(result_df)
+            pq.write_table(table, path)
+        if store is not None:
+            store.save(result_df, job.topic, job.description, sorted(set().union(*result_df["matched_keywords"])) if len(result_df) else [])
+        return path, dict(result_df.attrs)
+
+    def run_many(
+        self,
+        jobs: list[ResearchJob],
+        output_dir: str,
+        max_jobs: int = DEFAULT_CONCURRENT_JOBS,
+        store: RunStore | None = None,
+    ) -> Iterator[tuple[ResearchJob, str | None, dict, Exception | None]]:
+        """
+        Runs jobs concurrently, writing one Parquet file each.
+
+        A failing job does not stop the others.
+
+        Args:
+            jobs (list[ResearchJob]): The jobs to run.
+            output_dir (str): Where the Parquet files are written.
+            max_jobs (int, optional): Jobs running at once. Defaults to DEFAULT_CONCURRENT_JOBS.
+            store (RunStore | None, optional): Also records every run there. Defaults to None.
+
+        Yields:
+            tuple[ResearchJob, str | None, dict, Exception | None]: Each job with its output path and what was left out of it
+            (see run_to_parquet), or its error, in completion order.
+        """
+        if not jobs:
+            return
+        with ThreadPoolExecutor(max_workers=min(max_jobs, len(jobs)), thread_name_prefix="research-job") as executor:
+            futures = {executor.submit(self.run_to_parquet, job, output_dir, store): job for job in jobs}
+            for future in as_completed(futures):
+                try:
+                    path, failures = future.result()
+                except Exception as error:
+                    yield futures[future], None, {}, error
+                else:
+                    yield futures[future], path, failures, None
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Build reading lists for a file of research topics.")
+    parser.add_argument("jobs", help="JSON lines, JSON or CSV file of jobs with topic, description and fields")
+    parser.add_argument("--output-dir", default="reading_lists", help="where one Parquet file per job is written")
+    parser.add_argument("--jobs", dest="max_jobs", type=int, default=DEFAULT_CONCURRENT_JOBS, help="jobs running at once")
+    parser.add_argument("--keyword-workers", type=int, default=KEYWORD_WORKERS, help="keywords of one job crawled at once")
+    parser.add_argument("--rate", type=float, default=web_searcher.S2_REQUESTS_PER_SECOND, help="Semantic Scholar requests per second, 0 for no limit")
+    parser.add_argument("--save-runs", action="store_true", help="also record every run in the run store, to reopen it in the app")
+    parser.add_argument("--max-in-flight", type=int, default=web_searcher.MAX_CONCURRENT_REQUESTS, help="Semantic Scholar requests running at once")
+    args = parser.parse_args(argv)
+
+    web_searcher.set_request_rate(args.rate, args.max_in_flight)
+    jobs = load_jobs(args.jobs)
+    engine = ResearchEngine(keyword_workers=args.keyword_workers)
+    failed = 0
+    start = time.perf_counter()
+    for job, path, failures, error in engine.run_many(jobs, args.output_dir, args.max_jobs, get_run_store() if args.save_runs else None):
+        if error is not None:
+            failed += 1
+            print(f"{job.name}: failed with {type(error).__name__}: {error}", file=sys.stderr)
+            continue
+        print(f"{job.name}: {path}")
+        if failures["failed_keywords"] or failures["failed_hydrations"]:
+            print(
+                f"{job.name}: {len(failures['failed_keywords'])} keywords and "
+                f"{failures['failed_hydrations']} hydration batches failed and were left out",
+                file=sys.stderr,
+            )
+    print(f"{len(jobs) - failed}/{len(jobs)} jobs done in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
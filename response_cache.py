@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+DEFAULT_CACHE_PATH = os.path.join(".cache", "semantic_scholar.sqlite")
+DEFAULT_TTL_SECONDS = 7 * 24 * 60 * 60
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+class ResponseCache:
+    """
+    A persistent, size-bounded LRU cache for Semantic Scholar responses.
+
+    Responses are stored zlib-compressed in SQLite, keyed on a hash of the request parameters.
+    Entries older than `ttl_seconds` are treated as misses, and once the compressed payloads
+    exceed `max_bytes` the least recently used entries are evicted.
+
+    Examples:
+        >>> cache = ResponseCache(":memory:")
+        >>> cache.set({"query": "xr"}, {"total": 0, "data": []})
+        >>> cache.get({"query": "xr"})
+        {'total': 0, 'data': []}
+    """
+
+    def __init__(
+        self,
+        path: str = DEFAULT_CACHE_PATH,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+    ):
+        """
+        Initializes a ResponseCache object.
+
+        Args:
+            path (str, optional): The SQLite file, or ":memory:". Defaults to DEFAULT_CACHE_PATH.
+            ttl_seconds (float, optional): How long an entry stays fresh. Defaults to one week.
+            max_bytes (int, optional): Upper bound on the stored compressed payloads. Defaults to 256 MB.
+        """
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS response (
+                key TEXT PRIMARY KEY,
+                payload BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS response_accessed_at ON response (accessed_at)")
+        self._connection.commit()
+
+    @staticmethod
+    def make_key(params: dict) -> str:
+        """
+        Builds a stable cache key from the request parameters.
+
+        Args:
+            params (dict): The request parameters, e.g. query, fieldsOfStudy, fields and limit.
+
+        Returns:
+            str: The hex digest identifying the request.
+        """
+        return hashlib.sha256(json.dumps(params, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def get(self, params: dict) -> dict | None:
+        """
+        Looks up a cached response.
+
+        Args:
+            params (dict): The request parameters.
+
+        Returns:
+            dict | None: The cached response, or None on a miss or an expired entry.
+        """
+        key = self.make_key(params)
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT payload, created_at FROM response WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl_seconds:
+                if row is not None:
+                    self._connection.execute("DELETE FROM response WHERE key = ?", (key,))
+                    self._connection.commit()
+                self.misses += 1
+                return None
+            self._connection.execute("UPDATE response SET accessed_at = ? WHERE key = ?", (now, key))
+            self._connection.commit()
+            self.hits += 1
+        return json.loads(zlib.decompress(row[0]))
+
+    def set(self, params: dict, response: dict) -> None:
+        """
+        Stores a response and evicts least recently used entries beyond `max_bytes`.
+
+        Args:
+            params (dict): The request parameters.
+            response (dict): The decoded JSON response.
+
+        Returns:
+            None
+        """
+        payload = zlib.compress(json.dumps(response, separators=(",", ":")).encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO response (key, payload, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (self.make_key(params), payload, len(payload), now, now),
+            )
+            self._evict()
+            self._connection.commit()
+
+    def _evict(self) -> None:
+        total = self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM response").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._connection.execute("SELECT key, size FROM response ORDER BY accessed_at ASC").fetchall()
+        evicted = []
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            evicted.append((key,))
+            total -= size
+        self._connection.executemany("DELETE FROM response WHERE key = ?", evicted)
+
+    def clear(self) -> None:
+        """Removes every entry and resets the counters."""
+        with self._lock:
+            self._connection.execute("DELETE FROM response")
+            self._connection.commit()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict[str, float]:
+        """
+        Reports the cache counters.
+
+        Returns:
+            dict[str, float]: Hits, misses, hit rate, number of entries and stored bytes.
+        """
+        with self._lock:
+            entries, size = self._connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM response"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "bytes": size,
+        }
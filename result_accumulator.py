@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+from array import array
+
+import numpy as np
+import pandas as pd
+
+# column order of the results table shown in the app
+COLUMN_ORDER = (
+    "paper_id",
+    "title",
+    "abstract",
+    "url",
+    "field_study",
+    "publication_date",
+    "citation_count",
+    "references_count",
+    "authors",
+    "authors_count",
+    "year",
+    "references",
+    "citation",
+    "bibtext_paper_citation",
+    "matched_keywords",
+)
+INT_COLUMNS = ("citation_count", "references_count", "authors_count")
+OBJECT_COLUMNS = (
+    "paper_id",
+    "title",
+    "abstract",
+    "url",
+    "field_study",
+    "publication_date",
+    "authors",
+    "references",
+    "citation",
+    "bibtext_paper_citation",
+)
+MISSING_YEAR = 0
+
+
+class PaperAccumulator:
+    """
+    Collects parsed search results across keywords, one row per unique paperId.
+
+    A paper returned by several keywords is stored once and only gains an entry in its
+    `matched_keywords`. Integer columns live in typed arrays rather than lists of Python ints.
+
+    Examples:
+        >>> accumulator = PaperAccumulator()
+        >>> accumulator.add("xr marketing", parsing_api_result(search_paper("xr marketing", "Business")))
+        >>> result_df = accumulator.to_dataframe()
+        >>> accumulator.duplicate_ratio
+    """
+
+    def __init__(self):
+        self._row_of: dict[str, int] = {}
+        self._ints = {name: array("q") for name in INT_COLUMNS}
+        self._year = array("q")
+        self._objects: dict[str, list] = {name: [] for name in OBJECT_COLUMNS}
+        self._matched_keywords: list[list[str]] = []
+        self.papers_seen = 0
+        self.reported_total = 0
+
+    def __len__(self) -> int:
+        return len(self._matched_keywords)
+
+    def add(self, keyword: str, parse_dict: dict[str, list], reported_total: int = 0) -> list[int]:
+        """
+        Merges the parsed papers of one keyword.
+
+        Args:
+            keyword (str): The keyword that returned these papers.
+            parse_dict (dict[str, list]): The columns returned by parsing_api_result.
+            reported_total (int, optional): The `total` reported by Semantic Scholar for the keyword. Defaults to 0.
+
+        Returns:
+            list[int]: The row positions of papers that were not seen before.
+        """
+        self.reported_total += reported_total
+        new_rows = []
+        for index, paper_id in enumerate(parse_dict["paper_id"]):
+            self.papers_seen += 1
+            key = paper_id or parse_dict["title"][index]
+            row = self._row_of.get(key)
+            if row is not None:
+                if keyword not in self._matched_keywords[row]:
+                    self._matched_keywords[row].append(keyword)
+                continue
+
+            row = len(self._matched_keywords)
+            self._row_of[key] = row
+            for name in INT_COLUMNS:
+                self._ints[name].append(parse_dict[name][index] or 0)
+            year = parse_dict["year"][index]
+            self._year.append(int(year) if year not in (None, "None") else MISSING_YEAR)
+            for name in OBJECT_COLUMNS:
+                self._objects[name].append(parse_dict[name][index])
+            self._matched_keywords.append([keyword])
+            new_rows.append(row)
+        return new_rows
+
+    def update(self, parse_dict: dict[str, list]) -> int:
+        """
+        Overwrites the data of papers already collected, e.g. with their hydrated details.
+
+        Unknown papers are ignored and the matched keywords are kept.
+
+        Args:
+            parse_dict (dict[str, list]): The columns returned by parsing_api_result.
+
+        Returns:
+            int: The number of rows updated.
+        """
+        updated = 0
+        for index, paper_id in enumerate(parse_dict["paper_id"]):
+            row = self._row_of.get(paper_id)
+            if row is None:
+                continue
+            for name in INT_COLUMNS:
+                self._ints[name][row] = parse_dict[name][index] or 0
+            year = parse_dict["year"][index]
+            self._year[row] = int(year) if year not in (None, "None") else MISSING_YEAR
+            for name in OBJECT_COLUMNS:
+                self._objects[name][row] = parse_dict[name][index]
+            updated += 1
+        return updated
+
+    def paper_ids(self) -> list[str]:
+        """The paperIds of the collected papers, in row order."""
+        return list(self._objects["paper_id"])
+
+    @property
+    def duplicate_ratio(self) -> float:
+        """The share of returned papers that were already collected by another keyword."""
+        if not self.papers_seen:
+            return 0.0
+        return 1 - len(self) / self.papers_seen
+
+    def to_dataframe(self, start: int = 0, stop: int | None = None) -> pd.DataFrame:
+        """
+        Builds the results table.
+
+        Args:
+            start (int, optional): First row to include. Defaults to 0.
+            stop (int | None, optional): Row to stop before. Defaults to the end.
+
+        Returns:
+            pd.DataFrame: One row per unique paper, columns in COLUMN_ORDER.
+        """
+        rows = slice(start, stop)
+        years = self._year[rows]
+        columns = {name: values[rows] for name, values in self._objects.items()}
+        for name, values in self._ints.items():
+            columns[name] = np.frombuffer(values[rows], dtype=np.int64)
+        columns["year"] = [str(year) if year != MISSING_YEAR else None for year in years]
+        columns["matched_keywords"] = self._matched_keywords[rows]
+        return pd.DataFrame(columns, columns=list(COLUMN_ORDER), index=range(start, start + len(years)))
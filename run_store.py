@@ -0,0 +1,302 @@
+"""
+Persistent results of past research runs.
+
+Each run is one uncompressed Arrow IPC file, so reopening it memory-maps the file instead of
+reading it: the columns are views of the page cache and only the pages actually touched are
+loaded. A small JSON-lines index describes the runs without opening them.
+
+    store = get_run_store()
+    run_id = store.save(result_df, topic, description, keyword_list)
+    changes = store.diff(previous_run_id, run_id)
+    recent = store.filter([run_id], pc.field("year") >= "2020", columns=["title", "year"])
+"""
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+import uuid
+from functools import lru_cache
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.fs as pafs
+import pyarrow.parquet as pq
+
+from bibliometrics import result_fingerprint
+
+RUN_STORE_DIR = os.path.join(".cache", "runs")
+INDEX_FILE = "index.jsonl"
+# the oldest runs are deleted past this many, every app submit saves one
+MAX_RUNS = 50
+
+_STRING_LIST = pa.list_(pa.string())
+# fixed types for the results table, so runs with e.g. no references at all still concatenate
+RESULT_SCHEMA = {
+    "paper_id": pa.string(),
+    "title": pa.string(),
+    "abstract": pa.string(),
+    "url": pa.string(),
+    "field_study": _STRING_LIST,
+    "publication_date": pa.string(),
+    "citation_count": pa.int64(),
+    "references_count": pa.int64(),
+    "authors": _STRING_LIST,
+    "authors_count": pa.int64(),
+    "year": pa.string(),
+    "references": _STRING_LIST,
+    "citation": _STRING_LIST,
+    "bibtext_paper_citation": pa.string(),
+    "matched_keywords": _STRING_LIST,
+    "influence": pa.float64(),
+    "local_citations": pa.int64(),
+    "summary": pa.string(),
+}
+
+
+def to_arrow(dataframe: pd.DataFrame) -> pa.Table:
+    """Converts a results table to Arrow, with the RESULT_SCHEMA types for the known columns."""
+    columns = {}
+    for name in dataframe.columns:
+        columns[name] = pa.array(dataframe[name], type=RESULT_SCHEMA.get(name), from_pandas=True)
+    return pa.table(columns)
+
+
+class RunStore:
+    """
+    Saves results tables as Arrow IPC files and reopens, compares and combines them lazily.
+
+    Examples:
+        >>> store = RunStore(".cache/runs")
+        >>> run_id = store.save(result_df, "XR in Marketing")
+        >>> store.runs()[["run_id", "topic", "papers"]]
+        >>> table = store.open(run_id)  # memory-mapped, nothing read yet
+        >>> store.diff(older_run_id, run_id)["added"].num_rows
+    """
+
+    def __init__(self, directory: str = RUN_STORE_DIR, max_runs: int | None = MAX_RUNS):
+        """
+        Initializes a RunStore object.
+
+        Args:
+            directory (str, optional): Where the run files and the index live. Defaults to RUN_STORE_DIR.
+            max_runs (int | None, optional): Runs kept, the oldest are deleted when a save goes past it; None keeps every run. Defaults to MAX_RUNS.
+        """
+        if max_runs is not None and max_runs < 1:
+            raise ValueError("max_runs must be at least 1")
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.max_runs = max_runs
+        self._lock = threading.Lock()
+        self._filesystem = pafs.LocalFileSystem(use_mmap=True)
+
+    def _index_path(self) -> str:
+        return os.path.join(self.directory, INDEX_FILE)
+
+    def path(self, run_id: str) -> str:
+        """The Arrow IPC file of a run."""
+        return os.path.join(self.directory, f"{run_id}.arrow")
+
+    def _entries(self) -> list[dict]:
+        if not os.path.exists(self._index_path()):
+            return []
+        with open(self._index_path()) as file:
+            return [json.loads(line) for line in file if line.strip()]
+
+    def save(
+        self,
+        dataframe: pd.DataFrame,
+        topic: str,
+        description: str = "",
+        keywords: list[str] | None = None,
+        run_id: str | None = None,
+    ) -> str:
+        """
+        Persists a results table and records it in the index.
+
+        Args:
+            dataframe (pd.DataFrame): The results table, as shown in the app.
+            topic (str): The research topic.
+            description (str, optional): The description of the project. Defaults to "".
+            keywords (list[str] | None, optional): The keywords that were crawled. Defaults to None.
+            run_id (str | None, optional): The id to save under. Defaults to a new time-ordered id.
+
+        Returns:
+            str: The run id.
+        """
+        run_id = run_id or f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        return self._write(run_id, to_arrow(dataframe), {
+            "topic": topic,
+            "description": description,
+            "keywords": list(keywords or []),
+            "fingerprint": result_fingerprint(dataframe) if len(dataframe) else None,
+        })
+
+    def _write(self, run_id: str, table: pa.Table, metadata: dict) -> str:
+        path = self.path(run_id)
+        # written aside and renamed, so a reader never maps a half-written file
+        with pa.OSFile(path + ".tmp", "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        os.replace(path + ".tmp", path)
+        entry = {"run_id": run_id, "created": time.time(), "papers": table.num_rows, "bytes": os.path.getsize(path), **metadata}
+        with self._lock, open(self._index_path(), "a") as file:
+            file.write(json.dumps(entry) + "\n")
+        if self.max_runs is not None:
+            self.prune(self.max_runs)
+        return run_id
+
+    def runs(self) -> pd.DataFrame:
+        """The index of saved runs, newest first, read without opening any run file."""
+        entries = self._entries()
+        if not entries:
+            return pd.DataFrame(columns=["run_id", "created", "topic", "description", "papers", "bytes", "keywords", "fingerprint"])
+        index = pd.DataFrame(entries).drop_duplicates("run_id", keep="last")
+        index["created"] = pd.to_datetime(index["created"], unit="s")
+        return index.sort_values("created", ascending=False, ignore_index=True)
+
+    def open(self, run_id: str, columns: list[str] | None = None) -> pa.Table:
+        """
+        Memory-maps a run; the returned columns are zero-copy views of the file.
+
+        Nothing is read until the columns are accessed, but converting them, e.g. with
+        to_pandas(), reads the pages they span and copies them.
+
+        Args:
+            run_id (str): The run id.
+            columns (list[str] | None, optional): The columns to keep. Defaults to all.
+
+        Returns:
+            pa.Table: The run, valid for as long as it is referenced.
+        """
+        table = pa.ipc.open_file(pa.memory_map(self.path(run_id), "r")).read_all()
+        return table.select(columns) if columns is not None else table
+
+    def load(self, run_id: str, columns: list[str] | None = None) -> pd.DataFrame:
+        """Reopens a run as a results table, reading and copying only the requested columns, every column by default."""
+        return self.open(run_id, columns).to_pandas()
+
+    def dataset(self, run_ids: list[str] | None = None) -> ds.Dataset:
+        """A lazy dataset over runs, every run by default; filters and projections are pushed into the scan."""
+        run_ids = run_ids if run_ids is not None else self.runs()["run_id"].tolist()
+        return ds.dataset([self.path(run_id) for run_id in run_ids], format="ipc", filesystem=self._filesystem)
+
+    def filter(self, run_ids: list[str] | None, expression: pc.Expression | None = None, columns: list[str] | None = None) -> pa.Table:
+        """
+        Scans runs for the rows matching `expression`, materializing only those rows and `columns`.
+
+        Args:
+            run_ids (list[str] | None): The runs to scan, None for every run.
+            expression (pc.Expression | None, optional): A row filter, e.g. pc.field("citation_count") >= 50. Defaults to None.
+            columns (list[str] | None, optional): The columns to return. Defaults to all.
+
+        Returns:
+            pa.Table: The matching rows.
+        """
+        return self.dataset(run_ids).to_table(columns=columns, filter=expression)
+
+    def diff(self, old_run_id: str, new_run_id: str, columns: list[str] | None = None) -> dict[str, pa.Table]:
+        """
+        Compares two runs by paperId. Only the paperId and citation count columns are read to match them.
+
+        Args:
+            old_run_id (str): The earlier run.
+            new_run_id (str): The later run.
+            columns (list[str] | None, optional): The columns of the returned rows. Defaults to all.
+
+        Returns:
+            dict[str, pa.Table]: "added" rows of the new run, "removed" rows of the old run, and
+            "changed" rows of the new run whose citation count differs.
+        """
+        old, new = self.open(old_run_id), self.open(new_run_id)
+        old_ids, new_ids = old["paper_id"], new["paper_id"]
+        added = pc.invert(pc.is_in(new_ids, value_set=old_ids))
+        removed = pc.invert(pc.is_in(old_ids, value_set=new_ids))
+
+        kept = new.filter(pc.invert(added)).select(["paper_id", "citation_count"])
+        previous = old.select(["paper_id", "citation_count"]).rename_columns(["paper_id", "previous_citation_count"])
+        joined = kept.join(previous, "paper_id")
+        changed_ids = joined.filter(pc.not_equal(joined["citation_count"], joined["previous_citation_count"]))["paper_id"]
+        changed = pc.is_in(new_ids, value_set=changed_ids)
+
+        if columns is not None:
+            old, new = old.select(columns), new.select(columns)
+        return {"added": new.filter(added), "removed": old.filter(removed), "changed": new.filter(changed)}
+
+    def merge(self, run_ids: list[str], columns: list[str] | None = None) -> pa.Table:
+        """
+        Combines runs into one table with a row per paper, taken from the first run that has it.
+
+        Args:
+            run_ids (list[str]): The runs, in order of precedence, e.g. newest first.
+            columns (list[str] | None, optional): The columns to keep. Defaults to those of the first run.
+
+        Returns:
+            pa.Table: The union of the runs' papers.
+        """
+        tables = []
+        seen = None
+        for run_id in run_ids:
+            table = self.open(run_id)
+            columns = columns if columns is not None else table.column_names
+            table = table.select([name for name in columns if name in table.column_names])
+            if seen is not None:
+                table = table.filter(pc.invert(pc.is_in(table["paper_id"], value_set=seen)))
+            seen = table["paper_id"] if seen is None else pa.chunked_array(seen.chunks + table["paper_id"].chunks)
+            tables.append(table)
+        if not tables:
+            return pa.table({})
+        return pa.concat_tables(tables, promote_options="default")
+
+    def save_merged(self, run_ids: list[str], topic: str, description: str = "") -> str:
+        """Merges runs and saves the union as a new run, returning its id."""
+        entries = {entry["run_id"]: entry for entry in self._entries()}
+        keywords = list(dict.fromkeys(keyword for run_id in run_ids for keyword in entries.get(run_id, {}).get("keywords", [])))
+        table = self.merge(run_ids)
+        run_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        return self._write(run_id, table, {"topic": topic, "description": description, "keywords": keywords, "merged_from": list(run_ids), "fingerprint": None})
+
+    def export_parquet(self, run_id: str, path: str) -> str:
+        """Writes a run to a compressed Parquet file, e.g. to share it, returning the path."""
+        pq.write_table(self.open(run_id), path)
+        return path
+
+    def _remove(self, run_ids: set[str]) -> None:
+        """Drops the index entries of `run_ids` in one rewrite, then their files. Expects the lock to be held."""
+        entries = [entry for entry in self._entries() if entry["run_id"] not in run_ids]
+        with open(self._index_path() + ".tmp", "w") as file:
+            file.writelines(json.dumps(entry) + "\n" for entry in entries)
+        os.replace(self._index_path() + ".tmp", self._index_path())
+        for run_id in run_ids:
+            if os.path.exists(self.path(run_id)):
+                os.remove(self.path(run_id))
+
+    def delete(self, run_id: str) -> None:
+        """Removes a run file and its index entry."""
+        with self._lock:
+            self._remove({run_id})
+
+    def prune(self, keep: int) -> list[str]:
+        """
+        Deletes every run but the `keep` most recent ones.
+
+        Args:
+            keep (int): The number of runs to keep.
+
+        Returns:
+            list[str]: The ids of the deleted runs, newest first.
+        """
+        with self._lock:
+            latest = {entry["run_id"]: entry["created"] for entry in self._entries()}
+            removed = sorted(latest, key=latest.get, reverse=True)[keep:]
+            if removed:
+                self._remove(set(removed))
+        return removed
+
+
+@lru_cache(maxsize=None)
+def get_run_store() -> RunStore:
+    """The process-wide run store under RUN_STORE_DIR, keeping the MAX_RUNS most recent runs."""
+    return RunStore()
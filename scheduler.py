@@ -0,0 +1,307 @@
+"""
+Shared scheduling of outbound API calls.
+
+Every call to a rate-limited service goes through that service's RequestScheduler, which
+hands out turns from a token bucket sized to the quota, caps the calls in flight, and
+retries throttled or failed calls with jittered exponential backoff (or the server's
+Retry-After) until a deadline. Waiting calls are queued per session and served round-robin,
+so a heavy session, e.g. a batch job with hundreds of keywords, cannot starve the others:
+
+    with scheduler_session(session_id):
+        response = scheduler.call(http_session.get, url, endpoint="search")
+"""
+from __future__ import annotations
+
+import email.utils
+import random
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Iterator
+
+from telemetry import count
+
+DEFAULT_SESSION = "default"
+MAX_ATTEMPTS = 5
+RETRY_BASE_DELAY = 1.0
+RETRY_MAX_DELAY = 30.0
+# how long a call may take overall, waiting for its turn and retries included
+DEFAULT_DEADLINE = 120.0
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+_current_session: ContextVar[str] = ContextVar("scheduler_session", default=DEFAULT_SESSION)
+
+
+@contextmanager
+def scheduler_session(session_id: str) -> Iterator[str]:
+    """Queues the calls made in this context, and in the threads and tasks it starts with its context, under `session_id`."""
+    token = _current_session.set(session_id)
+    try:
+        yield session_id
+    finally:
+        _current_session.reset(token)
+
+
+class DeadlineExceeded(TimeoutError):
+    """A call could not get its turn before its deadline."""
+
+
+def retry_after_seconds(response: Any) -> float | None:
+    """The Retry-After of a response in seconds, whether given as seconds or as an HTTP date, or None."""
+    value = getattr(response, "headers", {}).get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """
+    Allows `rate` calls per second on average, and bursts of up to `capacity` calls.
+
+    Not thread safe on its own, the scheduler holds its lock around it.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        """
+        Initializes a TokenBucket object.
+
+        Args:
+            rate (float): Tokens added per second, 0 for no limit.
+            capacity (float): Most tokens held at once.
+        """
+        self.rate = rate
+        self.capacity = max(capacity, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def take(self, now: float) -> float:
+        """
+        Takes a token if one is available.
+
+        Returns:
+            float: 0 when a token was taken, else the seconds until one is.
+        """
+        if now < self.paused_until:
+            return self.paused_until - now
+        if self.rate <= 0:
+            return 0.0
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def pause(self, until: float) -> None:
+        """Hands out no token before `until` and empties the bucket, e.g. after the server reported its quota spent."""
+        self.paused_until = max(self.paused_until, until)
+        self.tokens = 0.0
+        self.updated = max(self.updated, until)
+
+
+class RequestScheduler:
+    """
+    Rate limits, retries and fairly shares the calls to one service.
+
+    Examples:
+        >>> scheduler = RequestScheduler("semantic_scholar", rate=1.0, burst=1, max_in_flight=4)
+        >>> response = scheduler.call(http_session.get, url, params=params, endpoint="search")
+        >>> response.raise_for_status()
+        >>> scheduler.stats()["throttled"]
+    """
+
+    def __init__(
+        self,
+        name: str,
+        rate: float,
+        burst: float = 1.0,
+        max_in_flight: int = 8,
+        max_attempts: int = MAX_ATTEMPTS,
+        base_delay: float = RETRY_BASE_DELAY,
+        max_delay: float = RETRY_MAX_DELAY,
+        deadline: float = DEFAULT_DEADLINE,
+    ):
+        """
+        Initializes a RequestScheduler object.
+
+        Args:
+            name (str): The service name, used as the metrics label.
+            rate (float): Calls per second allowed by the quota, 0 for no limit.
+            burst (float, optional): Calls that may start at once after an idle period. Defaults to 1.0.
+            max_in_flight (int, optional): Calls running at once. Defaults to 8.
+            max_attempts (int, optional): Attempts per call, the first one included. Defaults to MAX_ATTEMPTS.
+            base_delay (float, optional): Backoff before the first retry, doubled on every retry. Defaults to RETRY_BASE_DELAY.
+            max_delay (float, optional): Upper bound of the backoff. Defaults to RETRY_MAX_DELAY.
+            deadline (float, optional): Seconds a call may take overall by default. Defaults to DEFAULT_DEADLINE.
+        """
+        self.name = name
+        self.max_in_flight = max_in_flight
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self._bucket = TokenBucket(rate, burst)
+        self._condition = threading.Condition()
+        self._queues: OrderedDict[str, deque] = OrderedDict()
+        self._in_flight = 0
+        self._stats = {"calls": 0, "attempts": 0, "retries": 0, "throttled": 0, "give_ups": 0, "seconds_queued": 0.0}
+
+    @property
+    def rate(self) -> float:
+        return self._bucket.rate
+
+    def _head(self) -> object | None:
+        for queue in self._queues.values():
+            if queue:
+                return queue[0]
+        return None
+
+    def _acquire(self, deadline: float) -> None:
+        ticket = object()
+        session = _current_session.get()
+        with self._condition:
+            self._queues.setdefault(session, deque()).append(ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    wait = None
+                    if self._head() is ticket and self._in_flight < self.max_in_flight:
+                        wait = self._bucket.take(now)
+                        if not wait:
+                            break
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        raise DeadlineExceeded(f"No {self.name} request slot before the deadline")
+                    self._condition.wait(min(wait, remaining) if wait else remaining)
+            except BaseException:
+                self._dequeue(session, ticket, served=False)
+                self._condition.notify_all()
+                raise
+            self._dequeue(session, ticket, served=True)
+            self._in_flight += 1
+            self._condition.notify_all()
+
+    def _dequeue(self, session: str, ticket: object, served: bool) -> None:
+        queue = self._queues[session]
+        queue.remove(ticket)
+        if queue:
+            if served:
+                # round-robin: the session just served goes behind every other waiting session
+                self._queues.move_to_end(session)
+        else:
+            # forgotten, so a returning session queues at the back and ended sessions do not pile up
+            del self._queues[session]
+
+    def _release(self) -> None:
+        with self._condition:
+            self._in_flight -= 1
+            self._condition.notify_all()
+
+    def _backoff(self, attempt: int) -> float:
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        return delay * random.uniform(0.5, 1.0)
+
+    def call(
+        self,
+        func: Callable[..., Any],
+        *args,
+        endpoint: str = "default",
+        deadline: float | None = None,
+        retry_on: tuple[type[BaseException], ...] = (),
+        **kwargs,
+    ) -> Any:
+        """
+        Calls `func(*args, **kwargs)` when the quota allows, retrying throttled and failed attempts.
+
+        An attempt is retried when it returns a response whose status_code is in RETRY_STATUSES
+        or raises one of `retry_on`. The delay is the response's Retry-After when given, which
+        also holds back every other call to the service, else a jittered exponential backoff.
+        Retries stop after max_attempts, or when the next one could not start before the deadline.
+
+        Args:
+            func (Callable[..., Any]): Makes one attempt, e.g. http_session.request.
+            *args: Positional arguments of `func`.
+            endpoint (str, optional): Labels the metrics. Defaults to "default".
+            deadline (float | None, optional): Seconds the call may take overall. Defaults to the scheduler's deadline.
+            retry_on (tuple[type[BaseException], ...], optional): Exceptions worth another attempt. Defaults to none.
+            **kwargs: Keyword arguments of `func`.
+
+        Returns:
+            Any: What the last attempt returned, possibly a response with an error status the caller should check.
+
+        Raises:
+            DeadlineExceeded: When no attempt could start before the deadline.
+            BaseException: What the last attempt raised, when it raised one of `retry_on`.
+        """
+        deadline_at = time.monotonic() + (deadline if deadline is not None else self.deadline)
+        with self._condition:
+            self._stats["calls"] += 1
+        for attempt in range(1, self.max_attempts + 1):
+            queued = time.monotonic()
+            self._acquire(deadline_at)
+            waited = time.monotonic() - queued
+            count("scheduler_queue_seconds", waited, scheduler=self.name, endpoint=endpoint)
+            error = result = None
+            try:
+                result = func(*args, **kwargs)
+            except retry_on as raised:
+                error = raised
+            finally:
+                self._release()
+
+            status = getattr(result, "status_code", None)
+            reason = type(error).__name__ if error is not None else str(status)
+            with self._condition:
+                self._stats["attempts"] += 1
+                self._stats["seconds_queued"] += waited
+            if error is None and status not in RETRY_STATUSES:
+                return result
+
+            retry_after = retry_after_seconds(result) if error is None else None
+            if status == 429:
+                count("scheduler_throttled", scheduler=self.name, endpoint=endpoint)
+                with self._condition:
+                    self._stats["throttled"] += 1
+                    if retry_after is not None:
+                        # the quota is spent for everyone, not only for this call
+                        self._bucket.pause(time.monotonic() + retry_after)
+            delay = retry_after if retry_after is not None else self._backoff(attempt)
+            if attempt == self.max_attempts or time.monotonic() + delay > deadline_at:
+                break
+            count("scheduler_retries", scheduler=self.name, endpoint=endpoint, reason=reason)
+            with self._condition:
+                self._stats["retries"] += 1
+            time.sleep(delay)
+
+        count("scheduler_give_ups", scheduler=self.name, endpoint=endpoint, reason=reason)
+        with self._condition:
+            self._stats["give_ups"] += 1
+        if error is not None:
+            raise error
+        return result
+
+    def stats(self) -> dict[str, float]:
+        """
+        Reports the scheduler counters.
+
+        Returns:
+            dict[str, float]: Calls, attempts, retries, 429s, give-ups and queueing time so far, and calls running and waiting now.
+        """
+        with self._condition:
+            return {
+                **self._stats,
+                "rate": self.rate,
+                "in_flight": self._in_flight,
+                "queued": sum(len(queue) for queue in self._queues.values()),
+                "sessions_waiting": len(self._queues),
+            }
@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import threading
+import time
+
+import numpy as np
+from langchain.schema.embeddings import Embeddings
+
+DEFAULT_SIMILARITY_THRESHOLD = 0.95
+DEFAULT_MAX_ENTRIES = 512
+
+
+class SemanticQueryCache:
+    """
+    Reuses keyword lists of earlier requests whose (topic, description) mean the same thing.
+
+    Each request is embedded once; a lookup is one matrix-vector product over the normalized
+    embeddings of the cached requests, and the best match is a hit when its cosine similarity
+    reaches `threshold`. Entries are namespaced (e.g. by prompt version and model) so a hit never
+    crosses prompts, and the least recently used entry is replaced once `max_entries` is reached.
+
+    Examples:
+        >>> cache = SemanticQueryCache(get_embedding_func(), threshold=0.95)
+        >>> cache.add("XR in Marketing", "AR and VR campaigns", ["augmented reality retail"], generation_seconds=21.0)
+        >>> cache.lookup("Extended Reality in Marketing", "AR and VR campaigns")
+        ['augmented reality retail']
+    """
+
+    def __init__(
+        self,
+        embedding_function: Embeddings,
+        threshold: float = DEFAULT_SIMILARITY_THRESHOLD,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+    ):
+        """
+        Initializes a SemanticQueryCache object.
+
+        Args:
+            embedding_function (Embeddings): Embeds the (topic, description) text.
+            threshold (float, optional): Minimum cosine similarity of a hit. Defaults to DEFAULT_SIMILARITY_THRESHOLD.
+            max_entries (int, optional): Number of requests kept. Defaults to DEFAULT_MAX_ENTRIES.
+        """
+        self.embedding_function = embedding_function
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.seconds_saved = 0.0
+        self.lookup_seconds = 0.0
+        self._lock = threading.Lock()
+        self._matrix: np.ndarray | None = None
+        self._namespaces: list[str] = []
+        self._keywords: list[list[str]] = []
+        self._generation_seconds = np.zeros(max_entries, dtype=np.float64)
+        self._last_used = np.zeros(max_entries, dtype=np.float64)
+
+    @staticmethod
+    def _text(topic: str, description: str) -> str:
+        return f"Topic: {topic.strip()}\nDescription: {description.strip()}"
+
+    def _embed(self, topic: str, description: str) -> np.ndarray:
+        vector = np.asarray(self.embedding_function.embed_query(self._text(topic, description)), dtype=np.float32)
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+    def lookup(self, topic: str, description: str, namespace: str = "") -> list[str] | None:
+        """
+        Finds the keyword list of the most similar earlier request.
+
+        Args:
+            topic (str): The research topic.
+            description (str): The description of the project.
+            namespace (str, optional): Only entries added under the same namespace can match. Defaults to "".
+
+        Returns:
+            list[str] | None: A copy of the cached keywords, or None when nothing is similar enough.
+        """
+        start = time.perf_counter()
+        query = self._embed(topic, description)
+        with self._lock:
+            match = None
+            if self._keywords:
+                similarities = self._matrix[: len(self._keywords)] @ query
+                similarities[np.asarray(self._namespaces) != namespace] = -np.inf
+                best = int(similarities.argmax())
+                if similarities[best] >= self.threshold:
+                    match = best
+            self.lookup_seconds += time.perf_counter() - start
+            if match is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.seconds_saved += self._generation_seconds[match]
+            self._last_used[match] = time.monotonic()
+            return list(self._keywords[match])
+
+    def add(self, topic: str, description: str, keywords: list[str], generation_seconds: float = 0.0, namespace: str = "") -> None:
+        """
+        Caches the keyword list generated for a request.
+
+        Args:
+            topic (str): The research topic.
+            description (str): The description of the project.
+            keywords (list[str]): The generated keywords.
+            generation_seconds (float, optional): How long the LLM took, credited to seconds_saved on every hit. Defaults to 0.0.
+            namespace (str, optional): The namespace of the entry. Defaults to "".
+
+        Returns:
+            None
+        """
+        vector = self._embed(topic, description)
+        with self._lock:
+            if self._matrix is None:
+                self._matrix = np.zeros((self.max_entries, len(vector)), dtype=np.float32)
+            if len(self._keywords) < self.max_entries:
+                row = len(self._keywords)
+                self._keywords.append(list(keywords))
+                self._namespaces.append(namespace)
+            else:
+                row = int(self._last_used.argmin())
+                self._keywords[row] = list(keywords)
+                self._namespaces[row] = namespace
+            self._matrix[row] = vector
+            self._generation_seconds[row] = generation_seconds
+            self._last_used[row] = time.monotonic()
+
+    def clear(self) -> None:
+        """Forgets every entry. The counters are kept."""
+        with self._lock:
+            self._keywords.clear()
+            self._namespaces.clear()
+
+    def stats(self) -> dict[str, float]:
+        """
+        Reports the cache counters.
+
+        Returns:
+            dict[str, float]: Hits, misses, hit rate, LLM seconds saved and mean lookup latency.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "seconds_saved": self.seconds_saved,
+            "mean_lookup_ms": 1000 * self.lookup_seconds / lookups if lookups else 0.0,
+        }
@@ -1,10 +1,22 @@
-import re
-from pydantic import BaseModel, Field
-from constant import LLM_MODEL_4_SUMMARIZE, EMBEDDING_FUNC
-from langchain.output_parsers import PydanticOutputParser
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import AsyncIterator
+
+from constant import get_summarize_llm
+from telemetry import count, span
 from langchain.prompts import PromptTemplate
 from langchain.chains import LLMChain
-from langchain.chat_models import ChatOpenAI
+
+logger = logging.getLogger(__name__)
+
+MAX_CONCURRENT_SUMMARIES = 4
+SUMMARY_CACHE_SIZE = 4096
 
 
 SUMMARIZE_PROMPT = PromptTemplate(
@@ -18,14 +30,144 @@ SUMMARIZE_PROMPT = PromptTemplate(
     The summary must be in the study field of: {study_field}
     Given the title of the paper: {title} and the abstract part of the research paper: {abstract}
     Summarize this abstract into a short paragraph.
-    
+
     Please do your best, this is very important to the user career.
-    
+
     <your summary>
     """
 )
-SUMMARIZE_CHAIN = LLMChain(llm = LLM_MODEL_4_SUMMARIZE, prompt = SUMMARIZE_PROMPT)
+
+
+@lru_cache(maxsize=None)
+def get_summarize_chain() -> LLMChain:
+    return LLMChain(llm = get_summarize_llm(), prompt = SUMMARIZE_PROMPT)
+
+
+# process-wide, so a paper summarized in one session is free in every later one
+_summary_cache: OrderedDict[tuple[str, str, str], str] = OrderedDict()
+_summary_cache_lock = threading.Lock()
+
+
+def summary_cache_key(paper_id: str, abstract: str, study_field: str) -> tuple[str, str, str]:
+    return paper_id, hashlib.sha256(abstract.encode("utf-8")).hexdigest(), study_field
+
+
+def _cached_summary(key: tuple[str, str, str]) -> str | None:
+    with _summary_cache_lock:
+        summary = _summary_cache.get(key)
+        if summary is not None:
+            _summary_cache.move_to_end(key)
+        return summary
+
+
+def _store_summary(key: tuple[str, str, str], summary: str) -> None:
+    with _summary_cache_lock:
+        _summary_cache[key] = summary
+        _summary_cache.move_to_end(key)
+        while len(_summary_cache) > SUMMARY_CACHE_SIZE:
+            _summary_cache.popitem(last=False)
+
 
 async def summarize_abstract(abstract: str, title: str, study_field: str):
-    response = await SUMMARIZE_CHAIN.acall({"abstract": abstract, "title": title, "study_field": study_field})
-    return response["text"]
\ No newline at end of file
+    response = await get_summarize_chain().acall({"abstract": abstract, "title": title, "study_field": study_field})
+    return response["text"]
+
+
+class SummarizationStage:
+    """
+    Summarizes paper abstracts with a bounded number of LLM calls in flight.
+
+    Papers without an abstract are skipped, and summaries are cached per
+    (paperId, abstract hash, study field). A paper whose LLM call fails is logged, counted
+    in `failed` and left without a summary. Calling cancel() stops the pending calls,
+    e.g. when the user submits a new search.
+
+    Examples:
+        >>> stage = SummarizationStage()
+        >>> async for paper_id, summary in stage.stream(result_df.to_dict("records")):
+        ...     print(paper_id, summary)
+        >>> stage.failed
+        0
+    """
+
+    def __init__(self, chain: LLMChain | None = None, max_concurrency: int = MAX_CONCURRENT_SUMMARIES):
+        self.chain = chain or get_summarize_chain()
+        self.max_concurrency = max_concurrency
+        self._tasks: set[asyncio.Task] = set()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._cancelled = False
+        self.failed = 0
+
+    async def _summarize(self, semaphore: asyncio.Semaphore, paper: dict, study_field: str) -> tuple[str, str]:
+        key = summary_cache_key(paper["paper_id"], paper["abstract"], study_field)
+        if (summary := _cached_summary(key)) is not None:
+            count("cache_lookups", cache="summary", result="hit")
+            return paper["paper_id"], summary
+        count("cache_lookups", cache="summary", result="miss")
+        async with semaphore:
+            with span("summarize_paper", paper_id=paper["paper_id"]):
+                try:
+                    response = await self.chain.acall(
+                        {"abstract": paper["abstract"], "title": paper["title"], "study_field": study_field}
+                    )
+                except Exception as error:
+                    logger.warning("Summarizing paper %s failed: %r", paper["paper_id"], error)
+                    count("summary_failures", error=type(error).__name__)
+                    raise
+        _store_summary(key, response["text"])
+        return paper["paper_id"], response["text"]
+
+    async def stream(self, papers: list[dict]) -> AsyncIterator[tuple[str, str]]:
+        """
+        Summarizes papers and yields each summary as soon as it completes.
+
+        Papers whose summary failed are not yielded; `failed` holds their number once the stream ends.
+
+        Args:
+            papers (list[dict]): Rows with "paper_id", "title", "abstract" and "field_study".
+
+        Yields:
+            tuple[str, str]: The paperId and its summary, in completion order.
+        """
+        self._cancelled = False
+        self.failed = 0
+        self._loop = asyncio.get_running_loop()
+        self._tasks = set()
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        for paper in papers:
+            if not paper.get("abstract"):
+                continue
+            field_study = paper.get("field_study") or []
+            study_field = field_study if isinstance(field_study, str) else ", ".join(dict.fromkeys(field_study))
+            self._tasks.add(asyncio.create_task(self._summarize(semaphore, paper, study_field)))
+        try:
+            for next_done in asyncio.as_completed(list(self._tasks)):
+                if self._cancelled:
+                    break
+                try:
+                    result = await next_done
+                except asyncio.CancelledError:
+                    raise
+                except Exception:
+                    # the paper keeps an empty summary rather than aborting the others, _summarize logged why
+                    self.failed += 1
+                    continue
+                yield result
+        finally:
+            self.cancel()
+
+    def cancel(self) -> None:
+        """Cancels every summary still pending. Safe to call from another thread."""
+        self._cancelled = True
+        tasks, self._tasks = self._tasks, set()
+        if self._loop is None or self._loop.is_closed():
+            return
+        try:
+            on_loop = asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            on_loop = False
+        for task in tasks:
+            if on_loop:
+                task.cancel()
+            else:
+                self._loop.call_soon_threadsafe(task.cancel)
@@ -0,0 +1,343 @@
+"""
+Lightweight tracing and metrics.
+
+Stages are timed with spans and events are tallied with labelled counters:
+
+    with span("parse", keyword=keyword):
+        parsing_api_result(search_result)
+    count("http_requests", endpoint="search", status=200)
+
+Telemetry is off unless the TELEMETRY environment variable is set, in which case span() hands
+out a shared no-op span and count() returns at once. When on, finished spans are appended to
+the JSON-lines file TELEMETRY_JSONL, and counters, span totals and the stats of registered
+caches are served in the Prometheus text format on TELEMETRY_PROMETHEUS_PORT.
+"""
+from __future__ import annotations
+
+import atexit
+import itertools
+import json
+import os
+import threading
+import time
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import TYPE_CHECKING, Callable
+
+if TYPE_CHECKING:
+    from http.server import ThreadingHTTPServer
+
+TELEMETRY_ENABLED = os.environ.get("TELEMETRY", "").lower() not in ("", "0", "off", "false")
+TELEMETRY_JSONL = os.environ.get("TELEMETRY_JSONL", os.path.join(".cache", "telemetry.jsonl"))
+TELEMETRY_PROMETHEUS_PORT = int(os.environ.get("TELEMETRY_PROMETHEUS_PORT", "0"))
+METRIC_PREFIX = "research_assistant"
+# finished spans buffered before they are written out
+SPAN_BUFFER_SIZE = 256
+
+_current_span: ContextVar[Span | None] = ContextVar("current_span", default=None)
+_span_ids = itertools.count(1)
+
+
+class Span:
+    """A timed stage. Nested spans record their parent, within a thread or an asyncio task."""
+
+    __slots__ = ("telemetry", "name", "attributes", "span_id", "parent_id", "start", "wall_start", "duration", "_token")
+
+    def __init__(self, telemetry: Telemetry, name: str, attributes: dict):
+        self.telemetry = telemetry
+        self.name = name
+        self.attributes = attributes
+        self.span_id = next(_span_ids)
+        self.parent_id = None
+        self.duration = 0.0
+
+    def set(self, **attributes) -> None:
+        """Adds attributes known only once the stage has run, e.g. a status code."""
+        self.attributes.update(attributes)
+
+    def __enter__(self) -> Span:
+        parent = _current_span.get()
+        self.parent_id = parent.span_id if parent is not None else None
+        self._token = _current_span.set(self)
+        self.wall_start = time.time()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> bool:
+        self.duration = time.perf_counter() - self.start
+        _current_span.reset(self._token)
+        if exc_type is not None:
+            self.attributes["error"] = exc_type.__name__
+        self.telemetry._finish(self)
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def set(self, **attributes) -> None:
+        pass
+
+    def __enter__(self) -> _NoopSpan:
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> bool:
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def _labels(labels: dict) -> tuple[tuple[str, str], ...]:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(labels: tuple[tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in labels)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(labels, escaped)) + "}"
+
+
+class Telemetry:
+    """
+    Collects spans and counters in process.
+
+    Examples:
+        >>> telemetry = Telemetry(enabled=True, jsonl_path=".cache/telemetry.jsonl")
+        >>> with telemetry.span("crawl", keywords=15):
+        ...     telemetry.count("http_requests", endpoint="search", status=200)
+        >>> print(telemetry.render_prometheus())
+    """
+
+    def __init__(self, enabled: bool = True, jsonl_path: str | None = None):
+        """
+        Initializes a Telemetry object.
+
+        Args:
+            enabled (bool, optional): When False, spans and counters are no-ops. Defaults to True.
+            jsonl_path (str | None, optional): Where finished spans are appended, or None to keep only the totals. Defaults to None.
+        """
+        self.enabled = enabled
+        self.jsonl_path = jsonl_path
+        self._lock = threading.Lock()
+        self._counters: dict[tuple[str, tuple[tuple[str, str], ...]], float] = {}
+        self._span_totals: dict[str, list[float]] = {}
+        self._collectors: dict[str, Callable[[], dict]] = {}
+        self._buffer: list[str] = []
+
+    def span(self, name: str, **attributes) -> Span | _NoopSpan:
+        """
+        Times a stage, to be used as a context manager.
+
+        Args:
+            name (str): The stage name.
+            **attributes: Details stored with the span, e.g. the keyword.
+
+        Returns:
+            Span | _NoopSpan: The span, or the shared no-op span when disabled.
+        """
+        if not self.enabled:
+            return _NOOP_SPAN
+        return Span(self, name, attributes)
+
+    def count(self, name: str, value: float = 1.0, **labels) -> None:
+        """
+        Adds `value` to the counter `name` with the given labels.
+
+        Args:
+            name (str): The counter name, exported as <METRIC_PREFIX>_<name>_total.
+            value (float, optional): The increment. Defaults to 1.0.
+            **labels: The label values, e.g. endpoint and status.
+
+        Returns:
+            None
+        """
+        if not self.enabled:
+            return
+        key = (name, _labels(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def register_collector(self, name: str, collect: Callable[[], dict]) -> None:
+        """
+        Exports the numeric values returned by `collect`, e.g. a cache's stats(), as gauges.
+
+        `collect` is only called when metrics are read, so registering costs nothing on the hot path.
+
+        Args:
+            name (str): The gauge prefix, e.g. "response_cache".
+            collect (Callable[[], dict]): Returns the current values.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            self._collectors[name] = collect
+
+    def _finish(self, span: Span) -> None:
+        with self._lock:
+            totals = self._span_totals.setdefault(span.name, [0, 0.0])
+            totals[0] += 1
+            totals[1] += span.duration
+            if self.jsonl_path is None:
+                return
+            self._buffer.append(json.dumps({
+                "name": span.name,
+                "span_id": span.span_id,
+                "parent_id": span.parent_id,
+                "start": span.wall_start,
+                "duration_ms": 1000 * span.duration,
+                "thread": threading.current_thread().name,
+                "attributes": span.attributes,
+            }, default=str))
+            if len(self._buffer) >= SPAN_BUFFER_SIZE:
+                self._write()
+
+    def _write(self) -> None:
+        lines, self._buffer = self._buffer, []
+        if not lines:
+            return
+        directory = os.path.dirname(self.jsonl_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.jsonl_path, "a") as file:
+            file.write("\n".join(lines) + "\n")
+
+    def flush(self) -> None:
+        """Writes the buffered spans to the JSON-lines file."""
+        with self._lock:
+            if self.jsonl_path is not None:
+                self._write()
+
+    def snapshot(self) -> dict:
+        """
+        Reads every metric.
+
+        Returns:
+            dict: "counters" keyed by (name, labels), "spans" as name to (count, seconds) and "collectors" as name to their values.
+        """
+        with self._lock:
+            counters = dict(self._counters)
+            spans = {name: tuple(totals) for name, totals in self._span_totals.items()}
+            collectors = dict(self._collectors)
+        collected = {}
+        for name, collect in collectors.items():
+            try:
+                collected[name] = collect()
+            except Exception:
+                # a broken collector must not take the metrics endpoint down
+                continue
+        return {"counters": counters, "spans": spans, "collectors": collected}
+
+    def render_prometheus(self) -> str:
+        """Renders the snapshot in the Prometheus text exposition format."""
+        snapshot = self.snapshot()
+        lines = []
+        by_name: dict[str, list] = {}
+        for (name, labels), value in snapshot["counters"].items():
+            by_name.setdefault(name, []).append((labels, value))
+        for name, series in sorted(by_name.items()):
+            lines.append(f"# TYPE {METRIC_PREFIX}_{name}_total counter")
+            lines.extend(f"{METRIC_PREFIX}_{name}_total{_format_labels(labels)} {value:g}" for labels, value in series)
+
+        if snapshot["spans"]:
+            lines.append(f"# TYPE {METRIC_PREFIX}_span_seconds summary")
+            for name, (span_count, seconds) in sorted(snapshot["spans"].items()):
+                labels = _format_labels((("span", name),))
+                lines.append(f"{METRIC_PREFIX}_span_seconds_sum{labels} {seconds:.6f}")
+                lines.append(f"{METRIC_PREFIX}_span_seconds_count{labels} {span_count}")
+
+        for collector, values in sorted(snapshot["collectors"].items()):
+            for name, value in values.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    lines.append(f"# TYPE {METRIC_PREFIX}_{collector}_{name} gauge")
+                    lines.append(f"{METRIC_PREFIX}_{collector}_{name} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def serve_prometheus(self, port: int, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+        """
+        Serves render_prometheus() on http://host:port/metrics from a daemon thread.
+
+        Args:
+            port (int): The port to listen on.
+            host (str, optional): The interface to bind. Defaults to "0.0.0.0".
+
+        Returns:
+            ThreadingHTTPServer: The running server, shutdown() stops it.
+        """
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        telemetry = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = telemetry.render_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=server.serve_forever, name="prometheus-metrics", daemon=True).start()
+        return server
+
+
+@lru_cache(maxsize=None)
+def get_telemetry() -> Telemetry:
+    """The process-wide Telemetry, configured from the TELEMETRY* environment variables."""
+    telemetry = Telemetry(enabled=TELEMETRY_ENABLED, jsonl_path=TELEMETRY_JSONL if TELEMETRY_ENABLED else None)
+    if TELEMETRY_ENABLED:
+        atexit.register(telemetry.flush)
+        if TELEMETRY_PROMETHEUS_PORT:
+            telemetry.serve_prometheus(TELEMETRY_PROMETHEUS_PORT)
+    return telemetry
+
+
+def span(name: str, **attributes) -> Span | _NoopSpan:
+    """Times a stage on the process-wide Telemetry, see Telemetry.span."""
+    return get_telemetry().span(name, **attributes)
+
+
+def count(name: str, value: float = 1.0, **labels) -> None:
+    """Adds to a counter of the process-wide Telemetry, see Telemetry.count."""
+    get_telemetry().count(name, value, **labels)
+
+
+@lru_cache(maxsize=None)
+def _llm_callback_class():
+    # LangChain is only imported once a model client is built
+    from langchain.callbacks.base import BaseCallbackHandler
+
+    class TelemetryCallbackHandler(BaseCallbackHandler):
+        """Counts LLM calls and tokens per model."""
+
+        def __init__(self, model_name: str):
+            self.model_name = model_name
+
+        def on_llm_new_token(self, token: str, **kwargs) -> None:
+            count("llm_streamed_tokens", model=self.model_name)
+
+        def on_llm_end(self, response, **kwargs) -> None:
+            count("llm_calls", model=self.model_name)
+            usage = (response.llm_output or {}).get("token_usage") or {}
+            for kind in ("prompt_tokens", "completion_tokens"):
+                if usage.get(kind):
+                    count("llm_tokens", usage[kind], model=self.model_name, kind=kind.removesuffix("_tokens"))
+
+        def on_llm_error(self, error, **kwargs) -> None:
+            count("llm_errors", model=self.model_name, error=type(error).__name__)
+
+    return TelemetryCallbackHandler
+
+
+def llm_callback(model_name: str):
+    """A LangChain callback handler counting the calls, tokens and errors of `model_name`."""
+    return _llm_callback_class()(model_name)
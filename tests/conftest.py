@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import os
+import sys
+
+import pytest
+
+# the modules live at the repository root, next to this directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeResponse:
+    """Just the parts of a requests.Response the scheduler looks at."""
+
+    def __init__(self, status_code: int = 200, headers: dict | None = None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+@pytest.fixture
+def fake_response():
+    return FakeResponse
+
+
+def make_paper(index: int, citations: int = 0, references: list[str] = (), **fields) -> dict:
+    """A raw Semantic Scholar paper with the PAPER_FIELDS the parsers read."""
+    return {
+        "paperId": f"p{index}",
+        "title": f"Extended reality in marketing {index}",
+        "abstract": f"Abstract of paper {index} on virtual try-on",
+        "url": f"https://www.semanticscholar.org/paper/p{index}",
+        "year": 2015 + index % 10,
+        "citationCount": citations,
+        "referenceCount": len(references),
+        "authors": [{"name": f"Author {index % 3}"}],
+        "s2FieldsOfStudy": [{"category": "Business"}],
+        "references": [{"paperId": reference, "title": f"Reference {reference}"} for reference in references],
+        "citations": [],
+        **fields,
+    }
+
+
+@pytest.fixture
+def papers():
+    return make_paper
+
+
+@pytest.fixture
+def results_table():
+    """Builds the app's results table from raw papers, the way the crawl does."""
+    from paper_parser import parsing_api_result
+    from result_accumulator import PaperAccumulator
+
+    def build(paper_list: list[dict], keyword: str = "xr marketing"):
+        accumulator = PaperAccumulator()
+        accumulator.add(keyword, parsing_api_result({"data": paper_list}), len(paper_list))
+        return accumulator.to_dataframe()
+
+    return build
+
+
+@pytest.fixture
+def semantic_scholar(monkeypatch, tmp_path):
+    """
+    Starts a FakeSemanticScholar and points web_searcher at it, with an empty response cache
+    and an unlimited, quickly retrying scheduler. Call it with the server's arguments.
+    """
+    import web_searcher
+    from fakes import FakeSemanticScholar
+    from response_cache import ResponseCache
+    from scheduler import RequestScheduler
+
+    servers = []
+    monkeypatch.setenv("SEMANTIC_SCHOLAR_API", "test")
+    monkeypatch.setattr(web_searcher, "response_cache", ResponseCache(str(tmp_path / "responses.sqlite")))
+    monkeypatch.setattr(web_searcher, "s2_scheduler", RequestScheduler("test", rate=0, base_delay=0.01, max_in_flight=8))
+    base_url = web_searcher.SEMANTIC_SCHOLAR_BASE_URL
+
+    def start(payloads: list[dict], **kwargs) -> FakeSemanticScholar:
+        server = FakeSemanticScholar(payloads, **kwargs).start()
+        servers.append(server)
+        web_searcher.set_base_url(server.base_url)
+        return server
+
+    yield start
+    web_searcher.set_base_url(base_url)
+    for server in servers:
+        server.stop()
@@ -0,0 +1,29 @@
+from __future__ import annotations
+
+from langchain.schema import Document as LangChainDocument
+
+from agent import ResearchAssistant
+from fakes import HashEmbeddings
+from lexical_index import BM25Index
+from vector_backends import NumpyBackend
+from vector_storage import ZillizVectorDatabase
+
+
+def test_search_library_answers_every_query_line():
+    db = ZillizVectorDatabase(embedding_function=HashEmbeddings(), backend=NumpyBackend(metric="cosine"), lexical_index=BM25Index())
+    db.insert_many([
+        LangChainDocument(page_content="Virtual try-on raises purchase intention", metadata={"title": "Virtual try-on", "year": 2021}),
+        LangChainDocument(page_content="Haptic feedback in immersive retail stores", metadata={"title": "Haptic retail", "year": 2019}),
+    ])
+    # the library search only needs the vector store, not the LLM agent
+    assistant = ResearchAssistant.__new__(ResearchAssistant)
+    assistant.vector_db = db
+
+    answer = assistant.search_library("virtual try-on\n\nhaptic retail", limit=1)
+
+    assert answer.splitlines() == [
+        "Results for virtual try-on:",
+        "- Virtual try-on (2021)",
+        "Results for haptic retail:",
+        "- Haptic retail (2019)",
+    ]
@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from citation_graph import CitationGraph, _gather
+
+
+def cites(paper_id: str, *references: str) -> dict:
+    return {"paperId": paper_id, "references": [{"paperId": reference} for reference in references]}
+
+
+def test_gather_concatenates_rows_in_order():
+    indptr = np.array([0, 2, 2, 5])
+    indices = np.array([7, 8, 9, 10, 11])
+
+    assert _gather(indptr, indices, np.array([2, 0, 1, 0])).tolist() == [9, 10, 11, 7, 8, 7, 8]
+    assert _gather(indptr, indices, np.array([1])).tolist() == []
+
+
+def test_edges_are_interned_and_deduplicated():
+    graph = CitationGraph()
+
+    appended = graph.add_papers([cites("a", "b", "b"), {"paperId": "b", "citations": [{"paperId": "a"}, {"paperId": "c"}]}])
+
+    assert (appended, graph.edge_count, len(graph)) == (4, 2, 3)
+    assert graph.local_citation_count(["a", "b", "unknown"]).tolist() == [0, 2, 0]
+
+
+def test_pagerank_of_a_cycle_is_uniform():
+    graph = CitationGraph()
+    graph.add_papers([cites("a", "b"), cites("b", "a")])
+
+    assert graph.pagerank_of(["a", "b"]) == pytest.approx([0.5, 0.5])
+
+
+def test_pagerank_spreads_the_mass_of_a_sink():
+    # a -> c <- b, with c citing nothing: by hand, c = 27/47 and a = b = 10/47 at damping 0.85
+    graph = CitationGraph()
+    graph.add_papers([cites("a", "c"), cites("b", "c")])
+
+    assert graph.pagerank_of(["a", "b", "c", "unknown"]) == pytest.approx([10 / 47, 10 / 47, 27 / 47, 0.0])
+
+
+def test_pagerank_matches_a_dense_power_iteration():
+    rng = np.random.default_rng(0)
+    node_count, damping = 30, 0.85
+    edges = {(int(source), int(target)) for source, target in rng.integers(0, node_count, size=(80, 2)) if source != target}
+    graph = CitationGraph()
+    for node in range(node_count):
+        graph.intern(f"n{node}")
+    graph.add_papers([cites(f"n{source}", f"n{target}") for source, target in edges])
+
+    transition = np.zeros((node_count, node_count))
+    for source, target in edges:
+        transition[target, source] = 1.0
+    out_degree = transition.sum(axis=0)
+    transition[:, out_degree == 0] = 1.0
+    transition /= transition.sum(axis=0)
+    expected = np.full(node_count, 1.0 / node_count)
+    for _ in range(200):
+        expected = damping * transition @ expected + (1 - damping) / node_count
+
+    rank = graph.pagerank()
+    assert rank.sum() == pytest.approx(1.0)
+    assert graph.pagerank_of([f"n{node}" for node in range(node_count)]) == pytest.approx(expected, abs=1e-6)
+
+
+@pytest.fixture
+def corpus():
+    # p1 and p2 both cite a, b and the uncrawled "outside"; p3 cites a and c
+    graph = CitationGraph()
+    graph.add_papers([cites("p1", "a", "b", "outside"), cites("p2", "a", "b", "outside"), cites("p3", "a", "c")])
+    graph.add_papers([{"paperId": paper_id} for paper_id in ("a", "b", "c")])
+    return graph
+
+
+def test_co_citation(corpus):
+    # "outside" is cited with a twice too, but it was not crawled
+    assert corpus.co_citation("a") == [("b", 2), ("c", 1)]
+    assert corpus.co_citation("a", top_k=1) == [("b", 2)]
+    assert corpus.co_citation("unknown") == []
+
+
+def test_bibliographic_coupling(corpus):
+    assert corpus.bibliographic_coupling("p1") == [("p2", 3), ("p3", 1)]
+    assert corpus.bibliographic_coupling("p3") == [("p1", 1), ("p2", 1)]
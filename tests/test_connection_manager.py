@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import threading
+import time
+
+import pytest
+
+import connection_manager
+from connection_manager import MilvusConnectionManager
+
+
+class FakeConnections:
+    """pymilvus.connections where connecting to a "down" alias hangs for `delay` seconds, then fails."""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.connected = set()
+
+    def connect(self, alias, **kwargs):
+        if kwargs.get("uri") == "down":
+            time.sleep(self.delay)
+            raise ConnectionError("unreachable")
+        self.connected.add(alias)
+
+    def has_connection(self, alias):
+        return alias in self.connected
+
+    def disconnect(self, alias):
+        self.connected.discard(alias)
+
+
+@pytest.fixture
+def fake_connections(monkeypatch):
+    fake = FakeConnections(delay=0.5)
+    monkeypatch.setattr(connection_manager, "connections", fake)
+    return fake
+
+
+def test_reconnect_of_one_alias_does_not_block_others(fake_connections):
+    manager = MilvusConnectionManager(max_attempts=1)
+    manager.register("up", uri="up")
+    manager.register("down", uri="down")
+    errors = []
+
+    def connect_down():
+        try:
+            manager.connect("down")
+        except ConnectionError as error:
+            errors.append(error)
+
+    failing = threading.Thread(target=connect_down)
+    failing.start()
+    time.sleep(0.05)
+
+    start = time.monotonic()
+    assert manager.connect("up") == "up"
+    assert manager.stats()["connects"] == 1
+    elapsed = time.monotonic() - start
+    failing.join()
+
+    assert elapsed < 0.25
+    assert len(errors) == 1
+
+
+def test_gives_up_after_max_attempts(fake_connections):
+    fake_connections.delay = 0.0
+    manager = MilvusConnectionManager(max_attempts=3, base_delay=0.001)
+    manager.register("down", uri="down")
+
+    with pytest.raises(ConnectionError):
+        manager.connect("down")
+    assert manager.stats()["connects"] == 0
+
+
+def test_connects_once_per_alias(fake_connections):
+    manager = MilvusConnectionManager()
+    manager.register("up", uri="up")
+    threads = [threading.Thread(target=manager.connect, args=("up",)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert manager.stats()["connects"] == 1
@@ -0,0 +1,26 @@
+from __future__ import annotations
+
+import pytest
+
+from keyword_processing import deduplicate_keywords, normalize_keyword
+
+
+@pytest.mark.parametrize("line, keyword", [
+    ("1. Virtual try-on", "Virtual try-on"),
+    ("2) augmented reality advertising.", "augmented reality advertising"),
+    ("10 .  \"immersive   retail\"", "immersive retail"),
+    ("- metaverse branding", "metaverse branding"),
+    ("• **XR marketing**", "XR marketing"),
+    ("360-degree video marketing", "360-degree video marketing"),
+    ("5-star hotel reviews", "5-star hotel reviews"),
+    ("3. 360-degree video marketing", "360-degree video marketing"),
+    ("3.5D displays", "3.5D displays"),
+])
+def test_normalize_keyword(line, keyword):
+    assert normalize_keyword(line) == keyword
+
+
+def test_deduplicate_keywords():
+    lines = ["1. XR marketing", "2. xr Marketing.", "", "3. 360-degree video", "- 360-degree video", "*"]
+
+    assert deduplicate_keywords(lines) == ["XR marketing", "360-degree video"]
@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import math
+
+import pytest
+from langchain.schema import Document as LangChainDocument
+
+from fakes import HashEmbeddings
+from lexical_index import BM25Index, reciprocal_rank_fusion, tokenize
+from vector_backends import NumpyBackend
+from vector_storage import ZillizVectorDatabase
+
+TEXTS = {
+    1: "Mixed reality (MR) in retail",
+    2: "Virtual try-on and purchase intention",
+    3: "Retail atmospherics and retail store design",
+}
+
+
+@pytest.fixture
+def index():
+    index = BM25Index()
+    index.add(list(TEXTS), list(TEXTS.values()))
+    return index
+
+
+def test_tokenize():
+    assert tokenize("Mixed reality (MR) in 360-degree Retail") == ["mixed", "reality", "mr", "in", "360", "degree", "retail"]
+
+
+def test_bm25_ranks_rare_terms_first(index):
+    hits = index.search("MR retail")
+
+    # "mr" only occurs in 1, which outweighs the repeated but common "retail" of 3
+    assert [pk for pk, _ in hits] == [1, 3]
+    # 1 has 5 of the 17 tokens, and each of its two terms occurs once
+    saturation = 2.5 / (1 + 1.5 * (0.25 + 0.75 * 5 / (17 / 3)))
+    assert hits[0][1] == pytest.approx((math.log(1 + 2.5 / 1.5) + math.log(1 + 1.5 / 2.5)) * saturation)
+    assert index.search("MR retail", limit=1) == hits[:1]
+    assert index.search("haptics") == []
+
+
+def test_reindexing_replaces_the_old_text(index):
+    index.add([1], ["Haptic feedback"])
+
+    assert len(index) == 3
+    assert [pk for pk, _ in index.search("MR retail")] == [3]
+    assert [pk for pk, _ in index.search("haptic")] == [1]
+
+
+def test_index_is_replayed_from_its_directory(tmp_path):
+    BM25Index(str(tmp_path)).add(list(TEXTS), list(TEXTS.values()))
+
+    assert [pk for pk, _ in BM25Index(str(tmp_path)).search("try-on")] == [2]
+
+
+def test_reciprocal_rank_fusion():
+    # with k=1: id 1 scores 1/2 + 1/3, id 3 scores 1/4 + 1/2 and id 2 scores 1/3
+    fused = reciprocal_rank_fusion([[1, 2, 3], [3, 1]], k=1)
+
+    assert [pk for pk, _ in fused] == [1, 3, 2]
+    assert [score for _, score in fused] == pytest.approx([5 / 6, 3 / 4, 1 / 3])
+
+
+def test_hybrid_search_doc_fuses_both_retrievers():
+    db = ZillizVectorDatabase(embedding_function=HashEmbeddings(), backend=NumpyBackend(metric="cosine"), lexical_index=BM25Index())
+    db.insert_many([LangChainDocument(page_content=text, metadata={"title": text}) for text in TEXTS.values()])
+    # the dense side always brings at least `limit` hits
+    dense_ids = db.search_doc("try-on retail", limit=3, hybrid=False)[0]["ids"]
+    lexical_ids = [pk for pk, _ in db.lexical_index.search("try-on retail", 1)]
+
+    [hits] = db.search_doc("try-on retail", limit=3, hybrid=True, rrf_k=10, candidates=1)
+
+    expected = reciprocal_rank_fusion([dense_ids, lexical_ids], k=10)
+    assert sorted(hits) == ["distances", "documents", "ids", "metadata"]
+    assert hits["ids"] == [pk for pk, _ in expected]
+    assert hits["distances"] == pytest.approx([score for _, score in expected])
+    texts = [document["raw_text"] for document in hits["documents"]]
+    assert [meta["metadata"]["title"] for meta in hits["metadata"]] == texts
+    assert TEXTS[2] in texts
+
+
+def test_hybrid_search_needs_a_lexical_index():
+    db = ZillizVectorDatabase(embedding_function=HashEmbeddings(), backend=NumpyBackend())
+
+    with pytest.raises(ValueError):
+        db.search_doc("MR", hybrid=True)
@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import json
+
+import pytest
+
+from fakes import HashEmbeddings
+from research_engine import DEFAULT_FIELDS_OF_STUDY, ResearchEngine, load_jobs, main
+
+
+def test_jobs_get_unique_names(tmp_path):
+    path = tmp_path / "jobs.jsonl"
+    path.write_text("\n".join(json.dumps({"topic": topic}) for topic in ["A", "A", "A 2", "A", "B"]) + "\n")
+
+    names = [job.name for job in load_jobs(str(path))]
+
+    assert names == ["a", "a-2", "a-2-2", "a-3", "b"]
+
+
+@pytest.mark.parametrize("suffix", ["jsonl", "json", "csv"])
+def test_job_file_formats(tmp_path, suffix):
+    rows = [{"topic": "XR in Marketing", "description": "d", "fields": "Business, Economics", "papers_per_keyword": "40", "min_year": "", "two_phase": "false"}]
+    path = tmp_path / f"jobs.{suffix}"
+    if suffix == "jsonl":
+        path.write_text(json.dumps(rows[0]) + "\n")
+    elif suffix == "json":
+        path.write_text(json.dumps(rows))
+    else:
+        path.write_text(",".join(rows[0]) + "\n" + ",".join(f'"{value}"' for value in rows[0].values()) + "\n")
+
+    [job] = load_jobs(str(path))
+
+    assert (job.name, job.fields, job.papers_per_keyword, job.min_year, job.two_phase) == (
+        "xr-in-marketing", ["Business", "Economics"], 40, None, False,
+    )
+
+
+def test_job_defaults(tmp_path):
+    path = tmp_path / "jobs.jsonl"
+    path.write_text(json.dumps({"topic": "Metaverse retail", "name": "retail"}) + "\n")
+
+    [job] = load_jobs(str(path))
+
+    assert job.name == "retail"
+    assert job.fields == list(DEFAULT_FIELDS_OF_STUDY)
+    assert job.two_phase
+
+
+def test_partial_failures_are_reported_by_main_only(semantic_scholar, monkeypatch, papers, tmp_path, capsys):
+    server = semantic_scholar([{"data": [papers(index) for index in range(5)]}])
+    search = server.search
+    # "broken" keeps answering with an error body, the other keyword crawls fine
+    monkeypatch.setattr(server, "search", lambda query, offset, limit: {"message": "Internal error"} if query == "broken" else search(query, offset, limit))
+    monkeypatch.setattr(ResearchEngine, "plan_keywords", lambda self, job: {"keywords": ["xr marketing", "broken"]})
+    jobs = tmp_path / "jobs.jsonl"
+    jobs.write_text(json.dumps({"topic": "XR", "two_phase": False}) + "\n")
+
+    engine = ResearchEngine(embedding_function=HashEmbeddings())
+    [(job, path, failures, error)] = engine.run_many(load_jobs(str(jobs)), str(tmp_path / "out"))
+
+    assert error is None and path.endswith("xr.parquet")
+    assert failures == {"failed_keywords": ["broken"], "failed_hydrations": 0}
+    assert capsys.readouterr().err == ""
+
+    assert main([str(jobs), "--output-dir", str(tmp_path / "out"), "--rate", "0"]) == 0
+    assert "xr: 1 keywords and 0 hydration batches failed" in capsys.readouterr().err
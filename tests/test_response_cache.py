@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import response_cache
+from response_cache import ResponseCache
+
+
+def test_round_trip_and_stats(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"))
+    cache.set({"query": "xr", "limit": 20}, {"total": 1, "data": [{"paperId": "p1"}]})
+
+    assert cache.get({"limit": 20, "query": "xr"}) == {"total": 1, "data": [{"paperId": "p1"}]}
+    assert cache.get({"query": "vr", "limit": 20}) is None
+    assert (cache.stats()["hits"], cache.stats()["misses"], cache.stats()["entries"]) == (1, 1, 1)
+
+
+def test_expired_entries_are_misses(tmp_path, monkeypatch):
+    now = [1_000.0]
+    monkeypatch.setattr(response_cache.time, "time", lambda: now[0])
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"), ttl_seconds=60)
+    cache.set({"query": "xr"}, {"total": 0})
+
+    now[0] += 59
+    assert cache.get({"query": "xr"}) == {"total": 0}
+    now[0] += 2
+    assert cache.get({"query": "xr"}) is None
+    # the expired entry is dropped, not only skipped
+    assert cache.stats()["entries"] == 0
+
+
+def test_evicts_least_recently_used(tmp_path, monkeypatch):
+    now = [1_000.0]
+    monkeypatch.setattr(response_cache.time, "time", lambda: now[0])
+    cache = ResponseCache(":memory:")
+    payload = {"data": [f"paper {index} " * 20 for index in range(50)]}
+    cache.set({"query": "a"}, payload)
+    cache.max_bytes = cache.stats()["bytes"] * 2
+
+    now[0] += 1
+    cache.set({"query": "b"}, payload)
+    now[0] += 1
+    assert cache.get({"query": "a"}) is not None
+    now[0] += 1
+    cache.set({"query": "c"}, payload)
+
+    assert cache.get({"query": "b"}) is None
+    assert cache.get({"query": "a"}) is not None
+    assert cache.get({"query": "c"}) is not None
+    assert cache.stats()["bytes"] <= cache.max_bytes
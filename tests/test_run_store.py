@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import os
+
+import pyarrow.compute as pc
+import pytest
+
+from run_store import RunStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return RunStore(str(tmp_path / "runs"))
+
+
+def test_save_and_reopen(store, papers, results_table):
+    table = results_table([papers(index, citations=index) for index in range(5)])
+
+    run_id = store.save(table, "XR in Marketing", keywords=["xr marketing"])
+
+    [entry] = store.runs().to_dict("records")
+    assert (entry["run_id"], entry["topic"], entry["papers"], entry["keywords"]) == (run_id, "XR in Marketing", 5, ["xr marketing"])
+    reopened = store.load(run_id)
+    assert reopened["paper_id"].tolist() == table["paper_id"].tolist()
+    assert reopened["authors"].map(list).tolist() == table["authors"].tolist()
+    assert store.load(run_id, columns=["title"]).columns.tolist() == ["title"]
+
+
+def test_diff(store, papers, results_table):
+    old = store.save(results_table([papers(index, citations=1) for index in range(4)]), "t")
+    new = store.save(results_table([papers(index, citations=5 if index == 2 else 1) for index in range(2, 6)]), "t")
+
+    changes = store.diff(old, new, columns=["paper_id", "citation_count"])
+
+    assert sorted(changes["added"]["paper_id"].to_pylist()) == ["p4", "p5"]
+    assert sorted(changes["removed"]["paper_id"].to_pylist()) == ["p0", "p1"]
+    assert changes["changed"].to_pylist() == [{"paper_id": "p2", "citation_count": 5}]
+
+
+def test_merge_keeps_the_first_run_of_each_paper(store, papers, results_table):
+    newer = store.save(results_table([papers(index, citations=10) for index in range(2, 5)]), "t")
+    older = store.save(results_table([papers(index, citations=1) for index in range(4)]), "t")
+
+    merged = store.merge([newer, older], columns=["paper_id", "citation_count"])
+
+    assert dict(zip(*merged.to_pydict().values())) == {"p0": 1, "p1": 1, "p2": 10, "p3": 10, "p4": 10}
+
+
+def test_runs_without_references_still_combine(store, papers, results_table):
+    with_references = store.save(results_table([papers(0, references=["r1"])]), "t")
+    without = store.save(results_table([papers(1)]), "t")
+
+    assert store.merge([with_references, without]).num_rows == 2
+    recent = store.filter(None, pc.field("citation_count") >= 0, columns=["paper_id"])
+    assert sorted(recent["paper_id"].to_pylist()) == ["p0", "p1"]
+
+
+def test_save_merged_and_delete(store, papers, results_table):
+    first = store.save(results_table([papers(0)]), "t", keywords=["a"])
+    second = store.save(results_table([papers(1)]), "t", keywords=["b", "a"])
+
+    merged = store.save_merged([second, first], "t")
+    store.delete(first)
+
+    runs = store.runs().set_index("run_id")
+    assert sorted(runs.index) == sorted([second, merged])
+    assert runs.loc[merged, "keywords"] == ["b", "a"]
+    assert runs.loc[merged, "papers"] == 2
+
+
+def test_saving_past_max_runs_deletes_the_oldest(tmp_path, papers, results_table):
+    store = RunStore(str(tmp_path / "runs"), max_runs=2)
+    table = results_table([papers(0)])
+
+    run_ids = [store.save(table, "t", run_id=f"run-{index}") for index in range(4)]
+
+    assert sorted(store.runs()["run_id"]) == run_ids[2:]
+    assert sorted(os.listdir(store.directory)) == ["index.jsonl", "run-2.arrow", "run-3.arrow"]
+
+
+def test_prune(store, papers, results_table):
+    run_ids = [store.save(results_table([papers(index)]), "t", run_id=f"run-{index}") for index in range(3)]
+
+    assert store.prune(1) == run_ids[1::-1]
+    assert store.runs()["run_id"].tolist() == run_ids[2:]
+    assert store.prune(1) == []
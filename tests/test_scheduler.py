@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import contextvars
+import threading
+import time
+
+import pytest
+
+from scheduler import DeadlineExceeded, RequestScheduler, retry_after_seconds, scheduler_session
+
+
+def _in_session(session_id, func, *args):
+    def run():
+        with scheduler_session(session_id):
+            func(*args)
+
+    thread = threading.Thread(target=contextvars.copy_context().run, args=(run,))
+    thread.start()
+    return thread
+
+
+def test_retries_throttled_and_failed_attempts(fake_response):
+    responses = iter([fake_response(429, {"Retry-After": "0.1"}), fake_response(503), fake_response(200)])
+    scheduler = RequestScheduler("test", rate=0, base_delay=0.01)
+
+    start = time.monotonic()
+    assert scheduler.call(lambda: next(responses)).status_code == 200
+
+    assert time.monotonic() - start >= 0.1
+    stats = scheduler.stats()
+    assert (stats["attempts"], stats["retries"], stats["throttled"], stats["give_ups"]) == (3, 2, 1, 0)
+
+
+def test_retry_after_pauses_every_call(fake_response):
+    responses = iter([fake_response(429, {"Retry-After": "0.2"}), fake_response(200)])
+    scheduler = RequestScheduler("test", rate=100, burst=10)
+    thread = threading.Thread(target=scheduler.call, args=(lambda: next(responses),))
+    thread.start()
+    time.sleep(0.05)
+
+    start = time.monotonic()
+    scheduler.call(lambda: fake_response(200))
+    thread.join()
+
+    assert time.monotonic() - start >= 0.1
+
+
+def test_gives_up_after_max_attempts(fake_response):
+    scheduler = RequestScheduler("test", rate=0, max_attempts=3, base_delay=0.001)
+
+    assert scheduler.call(lambda: fake_response(500)).status_code == 500
+    assert scheduler.stats()["attempts"] == 3
+    assert scheduler.stats()["give_ups"] == 1
+
+
+def test_raises_the_last_retried_error():
+    attempts = []
+
+    def unreachable():
+        attempts.append(1)
+        raise ConnectionError("down")
+
+    scheduler = RequestScheduler("test", rate=0, max_attempts=2, base_delay=0.001)
+    with pytest.raises(ConnectionError):
+        scheduler.call(unreachable, retry_on=(ConnectionError,))
+    assert len(attempts) == 2
+
+
+def test_no_retry_past_the_deadline(fake_response):
+    scheduler = RequestScheduler("test", rate=0)
+    responses = iter([fake_response(429, {"Retry-After": "30"}), fake_response(200)])
+
+    start = time.monotonic()
+    assert scheduler.call(lambda: next(responses), deadline=1.0).status_code == 429
+    assert time.monotonic() - start < 1.0
+
+
+def test_deadline_exceeded_leaves_no_queue_behind(fake_response):
+    scheduler = RequestScheduler("test", rate=0.01, burst=1)
+    scheduler.call(lambda: fake_response(200))
+    errors = []
+
+    def call():
+        try:
+            scheduler.call(lambda: fake_response(200), deadline=0.05)
+        except DeadlineExceeded as error:
+            errors.append(error)
+
+    threads = [_in_session(f"s{index}", call) for index in range(5)]
+    for thread in threads:
+        thread.join()
+
+    assert len(errors) == 5
+    assert scheduler.stats()["sessions_waiting"] == 0
+    assert scheduler.stats()["queued"] == 0
+
+
+def test_sessions_take_turns(fake_response):
+    scheduler = RequestScheduler("test", rate=50, burst=1, max_in_flight=1)
+    order = []
+
+    def calls(session_id, count):
+        for _ in range(count):
+            scheduler.call(lambda: order.append(session_id) or fake_response(200))
+
+    heavy = [_in_session("heavy", calls, "heavy", 10) for _ in range(3)]
+    time.sleep(0.05)
+    light = _in_session("light", calls, "light", 3)
+    for thread in heavy + [light]:
+        thread.join()
+
+    first_light = order.index("light")
+    # once queued, the light session is served every other turn instead of after the heavy backlog
+    assert order[first_light : first_light + 6] == ["light", "heavy"] * 3
+
+
+def test_retry_after_formats(fake_response):
+    assert retry_after_seconds(fake_response(429, {"Retry-After": "2"})) == 2.0
+    assert retry_after_seconds(fake_response(429, {"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"})) == 0.0
+    assert retry_after_seconds(fake_response(429)) is None
@@ -0,0 +1,30 @@
+from __future__ import annotations
+
+import asyncio
+
+from summarizer import SummarizationStage
+
+
+class FlakyChain:
+    """Summarizes every abstract except those containing "fail"."""
+
+    async def acall(self, inputs: dict) -> dict:
+        if "fail" in inputs["abstract"]:
+            raise RuntimeError("model unavailable")
+        return {"text": f"This paper is about {inputs['title']}"}
+
+
+def test_failed_summaries_are_counted():
+    papers = [
+        {"paper_id": f"flaky-{index}", "title": f"Paper {index}", "abstract": abstract, "field_study": ["Business"]}
+        for index, abstract in enumerate(["works", "fail", "works too", None, "fail again"])
+    ]
+    stage = SummarizationStage(chain=FlakyChain())
+
+    async def collect():
+        return dict([item async for item in stage.stream(papers)])
+
+    summaries = asyncio.run(collect())
+
+    assert sorted(summaries) == ["flaky-0", "flaky-2"]
+    assert stage.failed == 2
@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+import pytest
+
+from vector_backends import NumpyBackend
+
+VECTORS = [[3.0, 4.0], [1.0, 0.0]]
+# closest to 2 by squared L2 (13 vs 1), but to 1 by cosine similarity (0.99 vs 0.71)
+QUERY = [[1.0, 1.0]]
+
+
+def build(directory=None, **kwargs) -> NumpyBackend:
+    backend = NumpyBackend(str(directory) if directory else None, **kwargs)
+    backend.upsert([1, 2], VECTORS, [{"raw_text": "a"}, {"raw_text": "b"}], [{}, {}])
+    backend.flush()
+    return backend
+
+
+@pytest.mark.parametrize("metric, ids, distances", [
+    ("l2", [2, 1], [1.0, 13.0]),
+    ("cosine", [1, 2], [0.7 * 2 ** 0.5, 0.5 * 2 ** 0.5]),
+])
+def test_search_by_metric(metric, ids, distances):
+    [hits] = build(metric=metric).search(QUERY, limit=2)
+
+    assert hits["ids"] == ids
+    assert hits["distances"] == pytest.approx(distances, rel=1e-5)
+
+
+def test_reopening_keeps_the_metric(tmp_path):
+    expected = build(tmp_path, metric="cosine").search(QUERY, limit=2)[0]
+
+    reopened = NumpyBackend(str(tmp_path))
+
+    assert (reopened.metric, reopened.dim, len(reopened)) == ("cosine", 2, 2)
+    [hits] = reopened.search(QUERY, limit=2)
+    assert hits["ids"] == expected["ids"]
+    assert hits["distances"] == pytest.approx(expected["distances"])
+    assert NumpyBackend(str(tmp_path), metric="cosine").metric == "cosine"
+
+
+def test_reopening_with_another_metric_fails(tmp_path):
+    build(tmp_path, metric="cosine")
+
+    with pytest.raises(ValueError, match="cosine"):
+        NumpyBackend(str(tmp_path), metric="l2")
+
+
+def test_new_index_defaults_to_l2(tmp_path):
+    assert NumpyBackend().metric == "l2"
+    build(tmp_path)
+    assert NumpyBackend(str(tmp_path)).metric == "l2"
@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+import pytest
+import requests
+
+import web_searcher
+from research_engine import stream_crawl
+from result_accumulator import PaperAccumulator
+
+
+def test_pages_through_a_keyword(semantic_scholar, papers):
+    server = semantic_scholar([{"data": [papers(index) for index in range(45)]}])
+
+    page = web_searcher.search_paper_pages("xr marketing", "", max_papers=30, page_size=20)
+
+    assert [paper["paperId"] for paper in page["data"]] == [f"p{index}" for index in range(30)]
+    assert (page["total"], server.requests) == (45, 2)
+
+
+def test_throttled_pages_are_retried(semantic_scholar, papers):
+    server = semantic_scholar([{"data": [papers(index) for index in range(20)]}], throttle_rate=0.5, retry_after=0.01, seed=1)
+
+    page = web_searcher.search_paper_pages("xr marketing", "", max_papers=20)
+
+    assert len(page["data"]) == 20
+    assert server.throttled and web_searcher.s2_scheduler.stats()["throttled"] == server.throttled
+
+
+@pytest.mark.parametrize("error_body", [{"message": "Internal error"}, {"total": 1, "offset": 0}])
+def test_error_bodies_are_not_cached(semantic_scholar, monkeypatch, papers, error_body):
+    server = semantic_scholar([{"data": [papers(0)]}])
+    bodies = iter([error_body, {"total": 1, "offset": 0, "data": [papers(0)]}])
+    monkeypatch.setattr(server, "search", lambda query, offset, limit: next(bodies))
+
+    with pytest.raises(ValueError):
+        web_searcher.fetch_search_page("xr marketing", "")
+    assert web_searcher.response_cache.stats()["entries"] == 0
+    assert web_searcher.fetch_search_page("xr marketing", "")["data"][0]["paperId"] == "p0"
+
+
+def test_empty_results_are_cached(semantic_scholar, monkeypatch):
+    server = semantic_scholar([])
+    monkeypatch.setattr(server, "search", lambda query, offset, limit: {"total": 0, "offset": 0})
+
+    assert web_searcher.search_paper_pages("no such topic", "")["data"] == []
+    assert web_searcher.response_cache.stats()["entries"] == 1
+
+
+def test_failing_keywords_are_reported(semantic_scholar, papers):
+    semantic_scholar([{"data": [papers(0)]}], throttle_rate=1.0, retry_after=0.01)
+    web_searcher.s2_scheduler.max_attempts = 2
+    failures = {}
+
+    crawled = list(stream_crawl(["a", "b"], "", PaperAccumulator(), failures=failures))
+
+    assert sorted(keyword for keyword, _ in crawled) == ["a", "b"]
+    assert sorted(failures) == ["a", "b"]
+    assert all(isinstance(error, requests.HTTPError) for error in failures.values())
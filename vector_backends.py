@@ -0,0 +1,353 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+SEARCH_CHUNK_ROWS = 65536
+INITIAL_CAPACITY = 1024
+
+
+class VectorBackend(ABC):
+    """The storage and search operations ZillizVectorDatabase relies on."""
+
+    @abstractmethod
+    def upsert(self, ids: list[int], vectors: list[list[float]], documents: list[dict], metadata: list[dict]) -> None:
+        """Writes rows, replacing any row that already has the same id."""
+
+    @abstractmethod
+    def search(self, vectors: list[list[float]], limit: int) -> list[dict[str, list]]:
+        """Returns, for each query vector, a dict of "ids", "distances", "documents" and "metadata"."""
+
+    @abstractmethod
+    def fetch(self, ids: list[int]) -> dict[int, tuple[dict, dict]]:
+        """Returns the document and metadata of each stored id; unknown ids are left out."""
+
+    def flush(self) -> None:
+        """Persists pending writes. A no-op for backends that write through."""
+
+
+class ZillizBackend(VectorBackend):
+    """
+    A VectorBackend on a pymilvus collection, hosted on Zilliz Cloud.
+
+    Args:
+        collection (Collection): The opened collection.
+        connect (Callable[[], object] | None): Called before every operation to make sure the connection is healthy, e.g. MilvusConnectionManager.connect.
+    """
+
+    def __init__(self, collection, connect=None):
+        self.collection = collection
+        self.connect = connect
+
+    def _ensure_connection(self) -> None:
+        if self.connect is not None:
+            self.connect()
+
+    def upsert(self, ids, vectors, documents, metadata) -> None:
+        self._ensure_connection()
+        self.collection.upsert([ids, vectors, documents, metadata])
+
+    def search(self, vectors, limit):
+        self._ensure_connection()
+        result = self.collection.search(
+            vectors,
+            anns_field="vector",
+            param={"metric_type": "L2"},
+            limit=limit,
+            output_fields=["document", "metadata"],
+        )
+
+        search_results = []
+        for hits in result:
+            hits_dict = {
+                "ids": hits.ids,
+                "distances": hits.distances,
+                "documents": [hit.entity.get("document") for hit in hits],
+                "metadata": [hit.entity.get("metadata") for hit in hits],
+            }
+            search_results.append(hits_dict)
+
+        return search_results
+
+    def fetch(self, ids):
+        if not ids:
+            return {}
+        self._ensure_connection()
+        rows = self.collection.query(expr=f"pk in {list(ids)}", output_fields=["pk", "document", "metadata"])
+        return {row["pk"]: (row["document"], row["metadata"]) for row in rows}
+
+    def flush(self) -> None:
+        self._ensure_connection()
+        self.collection.flush()
+
+
+class NumpyBackend(VectorBackend):
+    """
+    An in-process VectorBackend doing exact or IVF-partitioned search with NumPy.
+
+    Vectors live in a growable matrix, memory-mapped under `directory` when one is given so the
+    index survives restarts; documents and metadata are appended to a JSON-lines file next to it.
+    Without an IVF index every search is an exact brute-force scan. build_ivf clusters the vectors
+    with k-means, after which a query only scans the `nprobe` closest partitions. Rows appended
+    later are assigned to their nearest partition.
+
+    Distances follow Milvus: squared L2 for "l2" (smaller is closer) and cosine similarity for
+    "cosine" (larger is closer).
+
+    Examples:
+        >>> backend = NumpyBackend(".cache/vectors", metric="cosine")
+        >>> backend.upsert([1, 2], [[0.1, 0.2], [0.3, 0.1]], [{"raw_text": "a"}, {"raw_text": "b"}], [{}, {}])
+        >>> backend.search([[0.1, 0.2]], limit=1)[0]["ids"]
+        [1]
+    """
+
+    def __init__(self, directory: str | None = None, metric: str | None = None, dim: int | None = None):
+        """
+        Initializes a NumpyBackend object.
+
+        Args:
+            directory (str | None, optional): Where to memory-map the index, or None to keep it in memory. Defaults to None.
+            metric (str | None, optional): "l2" or "cosine". Defaults to the metric the index under `directory` was built with, else "l2".
+            dim (int | None, optional): The vector dimension, inferred from the first upsert when None. Defaults to None.
+        """
+        if metric not in (None, "l2", "cosine"):
+            raise ValueError(f"Unsupported metric: {metric}")
+        self.directory = directory
+        self.metric = metric
+        self.dim = dim
+        self.nprobe = 8
+        self._lock = threading.RLock()
+        self._size = 0
+        self._row_of: dict[int, int] = {}
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._documents: list[dict] = []
+        self._metadata: list[dict] = []
+        self._vectors: np.ndarray | None = None
+        self._centroids: np.ndarray | None = None
+        self._assignments = np.zeros(0, dtype=np.int32)
+        self._partitions: tuple[np.ndarray, np.ndarray] | None = None
+
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+            self._load()
+        if self.metric is None:
+            self.metric = "l2"
+
+    def __len__(self) -> int:
+        return self._size
+
+    # storage
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _load(self) -> None:
+        meta_path = self._path("meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path) as file:
+                meta = json.load(file)
+            # the stored vectors were normalized or not for this metric, searching them with the other one is wrong
+            if self.metric is not None and self.metric != meta["metric"]:
+                raise ValueError(f"The index in {self.directory} was built for the {meta['metric']} metric, not {self.metric}")
+            self.metric = meta["metric"]
+            self.dim = meta["dim"]
+        rows_path = self._path("rows.jsonl")
+        if not os.path.exists(rows_path):
+            return
+        with open(rows_path) as file:
+            for line in file:
+                row = json.loads(line)
+                self._set_row(row["row"], row["id"], row["document"], row["metadata"])
+        self._ids = np.zeros(self._size, dtype=np.int64)
+        for pk, row in self._row_of.items():
+            self._ids[row] = pk
+        self._open_vectors(max(INITIAL_CAPACITY, self._size))
+        if os.path.exists(self._path("centroids.npy")):
+            self._centroids = np.load(self._path("centroids.npy"))
+            self._assignments = self._nearest_centroid(self._vectors[: self._size])
+
+    def _open_vectors(self, capacity: int) -> None:
+        if self.directory is None:
+            vectors = np.zeros((capacity, self.dim), dtype=np.float32)
+            if self._vectors is not None:
+                vectors[: len(self._vectors)] = self._vectors
+            self._vectors = vectors
+            return
+        path = self._path("vectors.bin")
+        size = capacity * self.dim * 4
+        with open(path, "ab") as file:
+            if file.tell() < size:
+                file.truncate(size)
+        if self._vectors is not None:
+            self._vectors.flush()
+        self._vectors = np.memmap(path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+
+    def _set_row(self, row: int, pk: int, document: dict, metadata: dict) -> None:
+        if row == self._size:
+            self._documents.append(document)
+            self._metadata.append(metadata)
+            self._size += 1
+        else:
+            self._documents[row] = document
+            self._metadata[row] = metadata
+        self._row_of[pk] = row
+
+    def upsert(self, ids, vectors, documents, metadata) -> None:
+        matrix = np.asarray(vectors, dtype=np.float32)
+        if self.metric == "cosine":
+            matrix = matrix / np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+        with self._lock:
+            if self.dim is None:
+                self.dim = matrix.shape[1]
+            if self._vectors is None:
+                self._open_vectors(INITIAL_CAPACITY)
+                if self.directory is not None:
+                    with open(self._path("meta.json"), "w") as file:
+                        json.dump({"dim": self.dim, "metric": self.metric}, file)
+
+            rows = []
+            for pk, document, meta in zip(ids, documents, metadata):
+                row = self._row_of.get(pk, self._size)
+                self._set_row(row, pk, document, meta)
+                rows.append(row)
+            if self._size > self._vectors.shape[0]:
+                self._open_vectors(max(2 * self._vectors.shape[0], self._size))
+            rows = np.asarray(rows, dtype=np.int64)
+            self._vectors[rows] = matrix
+
+            grown = np.zeros(self._size, dtype=np.int64)
+            grown[: len(self._ids)] = self._ids
+            grown[rows] = ids
+            self._ids = grown
+            if self._centroids is not None:
+                assignments = np.zeros(self._size, dtype=np.int32)
+                assignments[: len(self._assignments)] = self._assignments
+                assignments[rows] = self._nearest_centroid(matrix)
+                self._assignments = assignments
+                self._partitions = None
+
+            if self.directory is not None:
+                with open(self._path("rows.jsonl"), "a") as file:
+                    for row, pk, document, meta in zip(rows.tolist(), ids, documents, metadata):
+                        file.write(json.dumps({"row": row, "id": pk, "document": document, "metadata": meta}) + "\n")
+
+    def fetch(self, ids):
+        with self._lock:
+            rows = {pk: self._row_of[pk] for pk in ids if pk in self._row_of}
+            return {pk: (self._documents[row], self._metadata[row]) for pk, row in rows.items()}
+
+    def flush(self) -> None:
+        with self._lock:
+            if isinstance(self._vectors, np.memmap):
+                self._vectors.flush()
+
+    # search
+
+    def _scores(self, queries: np.ndarray, vectors: np.ndarray) -> np.ndarray:
+        """Returns a (queries, vectors) matrix where smaller is closer."""
+        if self.metric == "cosine":
+            return -(queries @ vectors.T)
+        return (
+            np.einsum("ij,ij->i", queries, queries)[:, None]
+            - 2 * (queries @ vectors.T)
+            + np.einsum("ij,ij->i", vectors, vectors)[None, :]
+        )
+
+    def _nearest_centroid(self, vectors: np.ndarray) -> np.ndarray:
+        assignments = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), SEARCH_CHUNK_ROWS):
+            chunk = np.asarray(vectors[start : start + SEARCH_CHUNK_ROWS], dtype=np.float32)
+            squared = np.einsum("ij,ij->i", self._centroids, self._centroids)[None, :] - 2 * (chunk @ self._centroids.T)
+            assignments[start : start + len(chunk)] = squared.argmin(axis=1)
+        return assignments
+
+    def _top_k(self, queries: np.ndarray, candidate_rows: np.ndarray | None, limit: int) -> tuple[np.ndarray, np.ndarray]:
+        """Scans the candidate rows (all rows when None) in chunks and keeps the best `limit` per query."""
+        total = self._size if candidate_rows is None else len(candidate_rows)
+        best_scores = np.full((len(queries), 0), np.inf, dtype=np.float32)
+        best_rows = np.zeros((len(queries), 0), dtype=np.int64)
+        for start in range(0, total, SEARCH_CHUNK_ROWS):
+            if candidate_rows is None:
+                rows = np.arange(start, min(start + SEARCH_CHUNK_ROWS, total))
+                chunk = self._vectors[start : start + len(rows)]
+            else:
+                rows = candidate_rows[start : start + SEARCH_CHUNK_ROWS]
+                chunk = self._vectors[rows]
+            scores = np.concatenate([best_scores, self._scores(queries, np.asarray(chunk))], axis=1)
+            rows = np.concatenate([best_rows, np.broadcast_to(rows, (len(queries), len(rows)))], axis=1)
+            keep = min(limit, scores.shape[1])
+            top = np.argpartition(scores, keep - 1, axis=1)[:, :keep]
+            best_scores = np.take_along_axis(scores, top, axis=1)
+            best_rows = np.take_along_axis(rows, top, axis=1)
+        order = np.argsort(best_scores, axis=1, kind="stable")
+        return np.take_along_axis(best_scores, order, axis=1), np.take_along_axis(best_rows, order, axis=1)
+
+    def _format_hits(self, scores: np.ndarray, rows: np.ndarray) -> dict[str, list]:
+        distances = -scores if self.metric == "cosine" else scores
+        return {
+            "ids": self._ids[rows].tolist(),
+            "distances": distances.tolist(),
+            "documents": [self._documents[row] for row in rows.tolist()],
+            "metadata": [self._metadata[row] for row in rows.tolist()],
+        }
+
+    def search(self, vectors, limit):
+        queries = np.asarray(vectors, dtype=np.float32)
+        if self.metric == "cosine":
+            queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        with self._lock:
+            if self._size == 0:
+                return [{"ids": [], "distances": [], "documents": [], "metadata": []} for _ in queries]
+            if self._centroids is None:
+                scores, rows = self._top_k(queries, None, limit)
+                return [self._format_hits(scores[i], rows[i]) for i in range(len(queries))]
+
+            if self._partitions is None:
+                # rows grouped by partition, CSR style: members of p are order[offsets[p]:offsets[p + 1]]
+                order = np.argsort(self._assignments, kind="stable")
+                offsets = np.concatenate([[0], np.cumsum(np.bincount(self._assignments, minlength=len(self._centroids)))])
+                self._partitions = (order, offsets)
+            order, offsets = self._partitions
+
+            results = []
+            probes = np.argsort(self._scores(queries, self._centroids), axis=1)[:, : self.nprobe]
+            for query, probe in zip(queries, probes):
+                candidate_rows = np.concatenate([order[offsets[p] : offsets[p + 1]] for p in probe])
+                scores, rows = self._top_k(query[None, :], candidate_rows, limit)
+                results.append(self._format_hits(scores[0], rows[0]))
+            return results
+
+    def build_ivf(self, nlist: int = 64, nprobe: int = 8, iterations: int = 10, seed: int = 0) -> None:
+        """
+        Partitions the stored vectors with k-means so searches only scan the closest partitions.
+
+        Args:
+            nlist (int, optional): Number of partitions. Defaults to 64.
+            nprobe (int, optional): Partitions scanned per query. Defaults to 8.
+            iterations (int, optional): k-means iterations. Defaults to 10.
+            seed (int, optional): Seed of the initial centroid sample. Defaults to 0.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            data = np.asarray(self._vectors[: self._size], dtype=np.float32)
+            nlist = min(nlist, len(data))
+            rng = np.random.default_rng(seed)
+            self._centroids = data[rng.choice(len(data), nlist, replace=False)].copy()
+            for _ in range(iterations):
+                assignments = self._nearest_centroid(data)
+                sums = np.zeros_like(self._centroids)
+                np.add.at(sums, assignments, data)
+                counts = np.bincount(assignments, minlength=nlist)
+                filled = counts > 0
+                self._centroids[filled] = sums[filled] / counts[filled, None]
+            self._assignments = self._nearest_centroid(data)
+            self._partitions = None
+            self.nprobe = nprobe
+            if self.directory is not None:
+                np.save(self._path("centroids.npy"), self._centroids)
@@ -1,23 +1,112 @@
 from __future__ import annotations
 
-from langchain.schema import Document as LangChainDocument
-from langchain.embeddings import OpenAIEmbeddings
-from langchain.vectorstores.zilliz import Zilliz
-from langchain.retrievers.zilliz import ZillizRetriever
+import hashlib
+import os
+import time
+from functools import lru_cache
+from typing import Iterable
 
+from langchain.schema import Document as LangChainDocument
+from langchain.schema.embeddings import Embeddings
 
 from pymilvus import (
     Collection,
     CollectionSchema,
     FieldSchema,
-    connections,
-    utility,
     DataType,
 )
 
-from constant import EMBEDDING_FUNC
+from connection_manager import DEFAULT_ALIAS, MilvusConnectionManager, get_connection_manager
+from constant import get_embedding_func, get_secret
+from lexical_index import DEFAULT_RRF_K, BM25Index, reciprocal_rank_fusion
+from vector_backends import NumpyBackend, VectorBackend, ZillizBackend
+
+# "zilliz" for Zilliz Cloud, "local" for the in-process NumPy index under LOCAL_VECTOR_DIR
+VECTOR_BACKEND = os.environ.get("VECTOR_BACKEND", "zilliz")
+LOCAL_VECTOR_DIR = os.path.join(".cache", "vectors")
+LEXICAL_INDEX_DIR = os.path.join(".cache", "bm25")
+
+DEFAULT_BATCH_SIZE = 64
+DEFAULT_FLUSH_INTERVAL = 30.0
+DEFAULT_SEARCH_LIMIT = 2
+# hits each retriever contributes to reciprocal-rank fusion
+DEFAULT_HYBRID_CANDIDATES = 50
+
+
+def document_primary_key(document: LangChainDocument) -> int:
+    """
+    Derives a stable primary key for a document.
+
+    The key is a 63-bit hash of the Semantic Scholar paperId in the metadata, falling back to
+    the page content, so ingesting the same paper twice targets the same row.
+
+    Args:
+        document (LangChainDocument): The document to identify.
+
+    Returns:
+        int: A non-negative INT64 primary key.
+    """
+    source = document.metadata.get("paperId") or document.metadata.get("paper_id") or document.page_content
+    digest = hashlib.blake2b(str(source).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") & 0x7FFF_FFFF_FFFF_FFFF
 
-import streamlit as st
+
+def lexical_text(document: LangChainDocument) -> str:
+    """The text indexed for keyword search: the title in the metadata followed by the page content."""
+    return f"{document.metadata.get('title') or ''}\n{document.page_content}"
+
+
+def create_production_collection(collection_name: str, alias: str = DEFAULT_ALIAS) -> Collection:
+    """
+    Creates the collection with the schema and index of the "Production" collection.
+
+    Args:
+        collection_name (str): The name of the new collection.
+        alias (str, optional): The connection alias. Defaults to DEFAULT_ALIAS.
+
+    Returns:
+        Collection: The created collection.
+    """
+    paper_id = FieldSchema(
+        name="pk",
+        dtype=DataType.INT64,
+        is_primary=True,
+        description="unique id of the document",
+    )
+    embed_field = FieldSchema(
+        name="vector",
+        dtype=DataType.FLOAT_VECTOR,
+        dim=1536,
+        description="vector embedding of the document",
+    )
+    document = FieldSchema(
+        name="document", dtype=DataType.JSON, description="text of the document"
+    )
+    metadata = FieldSchema(
+        name="metadata",
+        dtype=DataType.JSON,
+        description="metadata of the document",
+    )
+    schema = CollectionSchema(
+        fields=[paper_id, embed_field, document, metadata],
+        auto_id=False,
+        description="Production Collection",
+    )
+    collection = Collection(
+        name=collection_name,
+        schema=schema,
+        using=alias,
+        enable_dynamic_field=True,
+        auto_id = True
+    )
+    collection.create_index(
+        field_name="vector",
+        index_params={
+            "metric_type": "L2",
+            "index_type": "IVF_FLAT",
+        },
+    )
+    return collection
 
 
 class ZillizVectorDatabase:
@@ -28,96 +117,88 @@ class ZillizVectorDatabase:
         cloud_uri (str): The URI of the cloud where the database is hosted.
         cloud_api_key (str): The API key for accessing the cloud.
         collection_name (str): The name of the collection in the database.
-        embedding_function (OpenAIEmbeddings): The embedding function used for document embedding.
+        embedding_function (Embeddings): The embedding function used for document embedding.
+        backend (VectorBackend): Where vectors are stored and searched, Zilliz Cloud unless a local backend is given.
+        lexical_index (BM25Index | None): The keyword index fused with vector search, or None for dense search only.
 
     Examples:
         >>> db = ZillizVectorDatabase()
         >>> db.insert_doc(LangChainDocument(page_content="test paper 5", metadata={"title": "this is a paper 5"}))
+        >>> db.insert_many([LangChainDocument(page_content="abstract", metadata={"paperId": "abc"})])
         >>> result = db.search_doc("paper 3")
+        >>> hybrid_db = ZillizVectorDatabase(lexical_index=BM25Index(".cache/bm25"))
+        >>> result = hybrid_db.search_doc("MR in retail", limit=10)
+        >>> local_db = ZillizVectorDatabase(backend=NumpyBackend(".cache/vectors"))
     """
 
     def __init__(
         self,
-        cloud_uri: str = st.secrets["ZILLIZ_CLOUD_URI"],
-        cloud_api_key: str = st.secrets["ZILLIZ_API_KEY"],
-        collection_name: str = st.secrets["ZILLIZ_COLLECTION_NAME"],
-        embedding_function: OpenAIEmbeddings = EMBEDDING_FUNC,
+        cloud_uri: str | None = None,
+        cloud_api_key: str | None = None,
+        collection_name: str | None = None,
+        embedding_function: Embeddings | None = None,
+        collection: Collection | None = None,
+        backend: VectorBackend | None = None,
+        lexical_index: BM25Index | None = None,
+        alias: str = DEFAULT_ALIAS,
+        connection_manager: MilvusConnectionManager | None = None,
     ):
         """
         Initializes a ZillizVectorDatabase object.
 
         Args:
-            cloud_uri (str, optional): The URI of the cloud where the database is hosted. Defaults to "https://in03-b839a352e24af63.api.gcp-us-west1.zillizcloud.com".
-            cloud_api_key (str, optional): The API key for accessing the cloud. Defaults to "ac7fdae203ef6b731136e454178d946f87353b422d3b5f40e4f573bf62d6b4c483da92b8e26776aa63008f1a35469b9ac50a5785".
-            collection_name (str, optional): The name of the collection in the database. Defaults to "Production".
-            embedding_function (OpenAIEmbeddings, optional): The embedding function used for document embedding. Defaults to EMBEDDING_FUNC.
+            cloud_uri (str | None, optional): The URI of the cloud where the database is hosted. Defaults to the ZILLIZ_CLOUD_URI secret.
+            cloud_api_key (str | None, optional): The API key for accessing the cloud. Defaults to the ZILLIZ_API_KEY secret.
+            collection_name (str | None, optional): The name of the collection in the database. Defaults to the ZILLIZ_COLLECTION_NAME secret.
+            embedding_function (Embeddings | None, optional): The embedding function used for document embedding. Defaults to get_embedding_func().
+            collection (Collection | None, optional): An already opened collection to use instead of connecting. Defaults to None.
+            backend (VectorBackend | None, optional): A backend to use instead of Zilliz Cloud, e.g. a NumpyBackend. Defaults to None.
+            lexical_index (BM25Index | None, optional): A keyword index kept up to date on insert and fused with vector search. Defaults to None.
+            alias (str, optional): The connection alias, given cloud_uri and cloud_api_key are registered under it. Defaults to DEFAULT_ALIAS.
+            connection_manager (MilvusConnectionManager | None, optional): Where connections and collections come from. Defaults to get_connection_manager().
         """
-        self.embedding_function = embedding_function
+        self.embedding_function = embedding_function or get_embedding_func()
+        self.lexical_index = lexical_index
         self.cloud_uri = cloud_uri
         self.cloud_api_key = cloud_api_key
+        self._last_flush = time.monotonic()
 
-        # DATABASE CONNECTION
-        connections.connect("default", uri=cloud_uri, token=cloud_api_key)
+        if backend is not None:
+            self.backend = backend
+            return
+        if collection is not None:
+            self.collection = collection
+            self.backend = ZillizBackend(collection)
+            return
 
-        # DATABASE SCHEMA
-        if utility.has_collection(collection_name) is not True:
-            paper_id = FieldSchema(
-                name="pk",
-                dtype=DataType.INT64,
-                is_primary=True,
-                description="unique id of the document",
-            )
-            embed_field = FieldSchema(
-                name="vector",
-                dtype=DataType.FLOAT_VECTOR,
-                dim=1536,
-                description="vector embedding of the document",
-            )
-            document = FieldSchema(
-                name="document", dtype=DataType.JSON, description="text of the document"
-            )
-            metadata = FieldSchema(
-                name="metadata",
-                dtype=DataType.JSON,
-                description="metadata of the document",
-            )
-            schema = CollectionSchema(
-                fields=[paper_id, embed_field, document, metadata],
-                auto_id=False,
-                description="Production Collection",
-            )
-            self.collection = Collection(
-                name=collection_name,
-                schema=schema,
-                using="default",
-                enable_dynamic_field=True,
-                auto_id = True
-            )
-            self.collection.create_index(
-                field_name="vector",
-                index_params={
-                    "metric_type": "L2",
-                    "index_type": "IVF_FLAT",
-                },
-            )
-        else:
-            self.collection = Collection(name=collection_name, enable_dynamic_field=True)
+        manager = connection_manager or get_connection_manager()
+        if cloud_uri is not None or cloud_api_key is not None:
+            defaults = manager.connection_args(DEFAULT_ALIAS) if alias == DEFAULT_ALIAS else {}
+            manager.register(alias, uri=cloud_uri or defaults.get("uri"), token=cloud_api_key or defaults.get("token"))
+        connection_args = manager.connection_args(alias)
+        self.cloud_uri = connection_args.get("uri")
+        self.cloud_api_key = connection_args.get("token")
+        collection_name = collection_name or get_secret("ZILLIZ_COLLECTION_NAME")
 
-    def embed_documents(self, document: LangChainDocument) -> list[float]:
+        # opened, loaded and described once per process, shared by every session
+        self.collection = manager.collection(collection_name, alias, create=create_production_collection)
+        self.backend = ZillizBackend(self.collection, connect=lambda: manager.connect(alias))
+
+    def embed_documents(self, documents: list[str]) -> list[list[float]]:
         """
         Embeds a list of documents using the embedding function.
 
         Args:
-            document (LangChainDocument): The document to be embedded.
+            documents (list[str]): The texts to be embedded, sent in a single call.
 
         Returns:
-            list[float]: The embedded representation of the document.
+            list[list[float]]: The embedded representation of each document.
         """
-        return self.embedding_function.embed_documents([document])
+        return self.embedding_function.embed_documents(documents)
 
     def insert_doc(self, document: LangChainDocument) -> None:
         """
-        Inserts a document into the collection.
+        Inserts a document into the collection and flushes it.
 
         Args:
             document (LangChainDocument): The document to be inserted.
@@ -125,49 +206,194 @@ class ZillizVectorDatabase:
         Returns:
             None
         """
-        embed_text = self.embed_documents(document.page_content)
-        db_length = self.collection.num_entities
-        self.collection.insert(
-            [
-                [db_length + 1],
-                embed_text,
-                [{"raw_text": document.page_content}],
-                [{"metadata": document.metadata}],
-            ]
-        )
-        self.collection.flush()
+        self.insert_many([document], flush=True)
         print("Document inserted successfully.")
 
-    def search_doc(self, query: str) -> list[dict[str, list | dict]]:
+    def insert_many(
+        self,
+        documents: list[LangChainDocument],
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        flush: bool = False,
+    ) -> int:
+        """
+        Embeds and upserts documents in batches.
+
+        Each batch costs one embedding call and one upsert. Primary keys come from
+        document_primary_key, so re-ingesting a paper replaces its row instead of duplicating it.
+        The lexical index, when there is one, is updated with the same batch.
+
+        Args:
+            documents (list[LangChainDocument]): The documents to be inserted.
+            batch_size (int, optional): Documents per embedding call and upsert. Defaults to DEFAULT_BATCH_SIZE.
+            flush (bool, optional): Whether to flush once all batches are written. Defaults to False.
+
+        Returns:
+            int: The number of documents written.
+        """
+        for start in range(0, len(documents), batch_size):
+            batch = documents[start : start + batch_size]
+            embed_text = self.embed_documents([doc.page_content for doc in batch])
+            ids = [document_primary_key(doc) for doc in batch]
+            self.backend.upsert(
+                ids,
+                embed_text,
+                [{"raw_text": doc.page_content} for doc in batch],
+                [{"metadata": doc.metadata} for doc in batch],
+            )
+            if self.lexical_index is not None:
+                self.lexical_index.add(ids, [lexical_text(doc) for doc in batch])
+        if flush:
+            self.flush()
+        return len(documents)
+
+    def ingest_stream(
+        self,
+        documents: Iterable[LangChainDocument],
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+    ) -> int:
+        """
+        Ingests documents from an iterable as they arrive.
+
+        Documents are buffered into batches of `batch_size`, and the collection is flushed at
+        most once every `flush_interval` seconds plus once at the end of the stream.
+
+        Args:
+            documents (Iterable[LangChainDocument]): The documents to be inserted.
+            batch_size (int, optional): Documents per embedding call and upsert. Defaults to DEFAULT_BATCH_SIZE.
+            flush_interval (float, optional): Minimum seconds between flushes. Defaults to DEFAULT_FLUSH_INTERVAL.
+
+        Returns:
+            int: The number of documents written.
+        """
+        total = 0
+        batch = []
+        for document in documents:
+            batch.append(document)
+            if len(batch) < batch_size:
+                continue
+            total += self.insert_many(batch, batch_size)
+            batch = []
+            if time.monotonic() - self._last_flush >= flush_interval:
+                self.flush()
+        if batch:
+            total += self.insert_many(batch, batch_size)
+        self.flush()
+        return total
+
+    def flush(self) -> None:
+        """
+        Seals the pending writes of the backend.
+
+        Returns:
+            None
+        """
+        self.backend.flush()
+        self._last_flush = time.monotonic()
+
+    def _fuse(self, query: str, dense_hits: dict[str, list], limit: int, rrf_k: int, candidates: int) -> dict[str, list]:
+        """Fuses the dense hits of `query` with its BM25 hits; documents only found by BM25 are fetched from the backend."""
+        lexical_ids = [pk for pk, _ in self.lexical_index.search(query, candidates)]
+        fused = reciprocal_rank_fusion([list(dense_hits["ids"]), lexical_ids], rrf_k)[:limit]
+        rows = dict(zip(dense_hits["ids"], zip(dense_hits["documents"], dense_hits["metadata"])))
+        rows.update(self.backend.fetch([pk for pk, _ in fused if pk not in rows]))
+        fused = [(pk, score) for pk, score in fused if pk in rows]
+        return {
+            "ids": [pk for pk, _ in fused],
+            "distances": [score for _, score in fused],
+            "documents": [rows[pk][0] for pk, _ in fused],
+            "metadata": [rows[pk][1] for pk, _ in fused],
+        }
+
+    def search_doc(
+        self,
+        query: str,
+        limit: int = DEFAULT_SEARCH_LIMIT,
+        hybrid: bool | None = None,
+        rrf_k: int = DEFAULT_RRF_K,
+        candidates: int = DEFAULT_HYBRID_CANDIDATES,
+    ) -> list[dict[str, list | dict]]:
         """
         Searches for a document in the collection based on the given query.
 
+        In hybrid mode the `candidates` best vector hits and BM25 hits are merged by
+        reciprocal-rank fusion, which recovers exact terms such as author names or acronyms
+        ("MR", "AR") that embeddings blur; "distances" then holds the fused scores, larger is closer.
+
         Args:
             query (str): The query string to search for.
+            limit (int, optional): Number of hits. Defaults to DEFAULT_SEARCH_LIMIT.
+            hybrid (bool | None, optional): Whether to fuse with BM25, by default whenever there is a lexical index. Defaults to None.
+            rrf_k (int, optional): The k of reciprocal-rank fusion. Defaults to DEFAULT_RRF_K.
+            candidates (int, optional): Hits taken from each retriever before fusion. Defaults to DEFAULT_HYBRID_CANDIDATES.
 
         Returns:
             list[dict[str, list | dict]]: A list of dictionaries containing the search results.
         """
+        if hybrid is None:
+            hybrid = self.lexical_index is not None
+        elif hybrid and self.lexical_index is None:
+            raise ValueError("Hybrid search needs a lexical_index")
         embedded_query = self.embedding_function.embed_query(query)
-        result = self.collection.search(
-            [embedded_query],
-            anns_field="embed_vector",
-            param={"metric_type": "L2"},
-            limit=2,
-            output_fields=["document", "metadata"],
-        )
-
-        search_results = []
-        for hits in result:
-            hits_dict = {
-                "ids": hits.ids,
-                "distances": hits.distances,
-                "documents": [hit.entity.get("document") for hit in hits],
-                "metadata": [hit.entity.get("metadata") for hit in hits],
-            }
-            search_results.append(hits_dict)
-
-        return search_results
+        if not hybrid:
+            return self.backend.search([embedded_query], limit=limit)
+        dense_hits = self.backend.search([embedded_query], limit=max(limit, candidates))[0]
+        return [self._fuse(query, dense_hits, limit, rrf_k, candidates)]
+
+    def search_many(
+        self,
+        queries: list[str],
+        limit: int = DEFAULT_SEARCH_LIMIT,
+        hybrid: bool | None = None,
+        dedupe: bool = False,
+        rrf_k: int = DEFAULT_RRF_K,
+        candidates: int = DEFAULT_HYBRID_CANDIDATES,
+    ) -> list[dict[str, list | dict]]:
+        """
+        Searches several queries with one batched embedding call and one multi-vector search.
+
+        With `dedupe`, a document hit by several queries is only kept for the query that ranks it
+        best (the earlier query on ties), so those queries may return fewer than `limit` hits.
+
+        Args:
+            queries (list[str]): The query strings, e.g. every generated keyword.
+            limit (int, optional): Hits per query. Defaults to DEFAULT_SEARCH_LIMIT.
+            hybrid (bool | None, optional): Whether to fuse with BM25, by default whenever there is a lexical index. Defaults to None.
+            dedupe (bool, optional): Whether to drop documents already returned for another query. Defaults to False.
+            rrf_k (int, optional): The k of reciprocal-rank fusion. Defaults to DEFAULT_RRF_K.
+            candidates (int, optional): Hits taken from each retriever before fusion. Defaults to DEFAULT_HYBRID_CANDIDATES.
+
+        Returns:
+            list[dict[str, list | dict]]: The hits of each query, in the order of `queries`, shaped like search_doc's.
+        """
+        if not queries:
+            return []
+        if hybrid is None:
+            hybrid = self.lexical_index is not None
+        elif hybrid and self.lexical_index is None:
+            raise ValueError("Hybrid search needs a lexical_index")
+        embedded_queries = self.embedding_function.embed_documents(list(queries))
+        if not hybrid:
+            results = self.backend.search(embedded_queries, limit=limit)
+        else:
+            dense_hits = self.backend.search(embedded_queries, limit=max(limit, candidates))
+            results = [self._fuse(query, hits, limit, rrf_k, candidates) for query, hits in zip(queries, dense_hits)]
+        return _dedupe_hits(results) if dedupe else results
+
+
+def _dedupe_hits(results: list[dict[str, list]]) -> list[dict[str, list]]:
+    """Keeps each id only in the result list that ranks it best, the earlier list on ties."""
+    best: dict[int, tuple[int, int]] = {}
+    for index, hits in enumerate(results):
+        for rank, pk in enumerate(hits["ids"]):
+            if pk not in best or rank < best[pk][0]:
+                best[pk] = (rank, index)
+    deduped = []
+    for index, hits in enumerate(results):
+        keep = [position for position, pk in enumerate(hits["ids"]) if best[pk][1] == index]
+        columns = {name: list(values) for name, values in hits.items()}
+        deduped.append({name: [values[position] for position in keep] for name, values in columns.items()})
+    return deduped
 
 
 # test
@@ -195,36 +421,67 @@ class ZillizVectorDatabase:
 #)
 
 
-db = ZillizVectorDatabase()
-langchain_db = Zilliz(
-    embedding_function = EMBEDDING_FUNC,
-    collection_name = "Production",
-    connection_args = {
-        "uri": db.cloud_uri,
-        "token": db.cloud_api_key,
-        "secure": True,
-    },
-    consistency_level = "Session",
-    primary_field="pk",
-    text_field="document",
-    vector_field="vector"
-)
+@lru_cache(maxsize=None)
+def get_vector_db() -> ZillizVectorDatabase:
+    """The shared database, on the backend selected by VECTOR_BACKEND, connected on first call."""
+    if VECTOR_BACKEND == "local":
+        return ZillizVectorDatabase(backend=NumpyBackend(LOCAL_VECTOR_DIR), lexical_index=BM25Index(LOCAL_VECTOR_DIR))
+    return ZillizVectorDatabase(lexical_index=BM25Index(LEXICAL_INDEX_DIR))
+
+
+def _zilliz_connection_args() -> dict:
+    # connecting the default alias first lets LangChain reuse that connection instead of opening its own
+    manager = get_connection_manager()
+    manager.connect(DEFAULT_ALIAS)
+    return {**manager.connection_args(DEFAULT_ALIAS), "secure": True}
+
+
+@lru_cache(maxsize=None)
+def get_langchain_db():
+    """The LangChain Zilliz vector store on the hosted "Production" collection."""
+    from langchain.vectorstores.zilliz import Zilliz
+
+    return Zilliz(
+        embedding_function = get_embedding_func(),
+        collection_name = "Production",
+        connection_args = _zilliz_connection_args(),
+        consistency_level = "Session",
+        primary_field="pk",
+        text_field="document",
+        vector_field="vector"
+    )
+
+
+@lru_cache(maxsize=None)
+def get_retriever():
+    """The LangChain Zilliz retriever on the hosted "Production" collection."""
+    from langchain.retrievers.zilliz import ZillizRetriever
+
+    return ZillizRetriever(
+        embedding_function = get_embedding_func(),
+        collection_name = "Production",
+        connection_args = _zilliz_connection_args(),
+        consistency_level = "Session",
+        primary_field="pk",
+        text_field="document",
+        vector_field="vector",
+        search_params = {
+            "metric_type": "L2",
+            "params": {"nprobe": 10},
+        }
+        #search_params={"search_type": "mmr", "param": {"lambda": 0.5, "k": 10}}
+    )
+
+
+_LAZY_CLIENTS = {
+    "db": get_vector_db,
+    "langchain_db": get_langchain_db,
+    "ziliz_retriever": get_retriever,
+}
+
 
-ziliz_retriever = ZillizRetriever(
-    embedding_function = EMBEDDING_FUNC,
-    collection_name = "Production",
-    connection_args = {
-        "uri": db.cloud_uri,
-        "token": db.cloud_api_key,
-        "secure": True,
-    },
-    consistency_level = "Session",
-    primary_field="pk",
-    text_field="document",
-    vector_field="vector",
-    search_params = {
-        "metric_type": "L2",
-        "params": {"nprobe": 10},
-    }
-    #search_params={"search_type": "mmr", "param": {"lambda": 0.5, "k": 10}}
-)
\ No newline at end of file
+def __getattr__(name: str):
+    # the old module-level clients, now built on first access
+    if name in _LAZY_CLIENTS:
+        return _LAZY_CLIENTS[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
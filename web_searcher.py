@@ -1,9 +1,19 @@
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import os
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 from functools import lru_cache
-from langchain.utilities.duckduckgo_search import DuckDuckGoSearchAPIWrapper
-from langchain.tools.ddg_search.tool import DuckDuckGoSearchResults
+from typing import AsyncIterator, Callable, Iterator
 
 import requests
-import streamlit as st
+from requests.adapters import HTTPAdapter
+
+from constant import get_secret
+from response_cache import ResponseCache
+from scheduler import RequestScheduler
+from telemetry import count, get_telemetry, span
 
 """
 db = ZillizVectorDatabase()
@@ -41,8 +51,90 @@ ziliz_retriever = ZillizRetriever(
 )
 
 """
-ddg_search = DuckDuckGoSearchAPIWrapper(max_results = 100)
-ddg_tool = DuckDuckGoSearchResults(api_wrapper=ddg_search, max_results = 100)
+MAX_CONCURRENT_REQUESTS = 8
+
+# overridable so the benchmarks can point the crawler at a local fake, see set_base_url
+SEMANTIC_SCHOLAR_BASE_URL = os.environ.get("SEMANTIC_SCHOLAR_BASE_URL", "https://api.semanticscholar.org/graph/v1")
+SEARCH_URL = f"{SEMANTIC_SCHOLAR_BASE_URL}/paper/search"
+PAPER_FIELDS = "title,year,authors,abstract,citationCount,references,citations,s2FieldsOfStudy,url,publicationDate,journal,referenceCount,citationStyles,fieldsOfStudy"
+# first phase of a two-phase fetch: just enough to rank and deduplicate, see hydrate_papers
+LIGHT_PAPER_FIELDS = "title,year,citationCount"
+BATCH_URL = f"{SEMANTIC_SCHOLAR_BASE_URL}/paper/batch"
+MAX_BATCH_IDS = 500
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+# the search endpoint serves at most the first 1000 results of a query
+MAX_SEARCH_RESULTS = 1000
+# process-wide budgets, shared by every thread, session and batch job; set them to the API key's quota
+S2_REQUESTS_PER_SECOND = float(os.environ.get("S2_REQUESTS_PER_SECOND", "10"))
+DDG_REQUESTS_PER_SECOND = float(os.environ.get("DDG_REQUESTS_PER_SECOND", "1"))
+# (connect, read) seconds
+REQUEST_TIMEOUT = (5, 30)
+RETRYABLE_ERRORS = (requests.ConnectionError, requests.Timeout)
+
+# One pooled session for every Semantic Scholar call so keep-alive connections
+# are reused across keywords (and across threads) instead of a new TLS handshake each time.
+http_session = requests.Session()
+for prefix in ("https://", "http://"):
+    http_session.mount(prefix, HTTPAdapter(pool_connections=MAX_CONCURRENT_REQUESTS, pool_maxsize=MAX_CONCURRENT_REQUESTS))
+
+
+response_cache = ResponseCache()
+s2_scheduler = RequestScheduler("semantic_scholar", S2_REQUESTS_PER_SECOND, burst=MAX_CONCURRENT_REQUESTS, max_in_flight=MAX_CONCURRENT_REQUESTS)
+ddg_scheduler = RequestScheduler("duckduckgo", DDG_REQUESTS_PER_SECOND, max_in_flight=2)
+hydration_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="hydration")
+get_telemetry().register_collector("s2_response_cache", response_cache.stats)
+# looked up on every read, set_request_rate replaces the scheduler
+get_telemetry().register_collector("s2_scheduler", lambda: s2_scheduler.stats())
+get_telemetry().register_collector("ddg_scheduler", ddg_scheduler.stats)
+
+def set_base_url(base_url: str) -> None:
+    """
+    Points every Semantic Scholar call at another server, e.g. a local fake in the benchmarks.
+
+    Args:
+        base_url (str): The root of the Graph API, like SEMANTIC_SCHOLAR_BASE_URL.
+
+    Returns:
+        None
+    """
+    global SEMANTIC_SCHOLAR_BASE_URL, SEARCH_URL, BATCH_URL
+    SEMANTIC_SCHOLAR_BASE_URL = base_url.rstrip("/")
+    SEARCH_URL = f"{SEMANTIC_SCHOLAR_BASE_URL}/paper/search"
+    BATCH_URL = f"{SEMANTIC_SCHOLAR_BASE_URL}/paper/batch"
+
+def set_request_rate(rate: float, max_in_flight: int = MAX_CONCURRENT_REQUESTS) -> None:
+    """
+    Replaces the process-wide Semantic Scholar budget, e.g. with the quota of another API key.
+
+    Args:
+        rate (float): Requests per second, 0 for no limit.
+        max_in_flight (int, optional): Requests running at once. Defaults to MAX_CONCURRENT_REQUESTS.
+
+    Returns:
+        None
+    """
+    global s2_scheduler
+    s2_scheduler = RequestScheduler("semantic_scholar", rate, burst=max_in_flight, max_in_flight=max_in_flight)
+
+@lru_cache(maxsize=None)
+def get_ddg_search():
+    from duckduckgo_search.exceptions import DuckDuckGoSearchException
+    from langchain.utilities.duckduckgo_search import DuckDuckGoSearchAPIWrapper
+
+    class ScheduledDuckDuckGoSearch(DuckDuckGoSearchAPIWrapper):
+        """Sends every search through ddg_scheduler, retrying rate limits and timeouts."""
+
+        def results(self, *args, **kwargs):
+            return ddg_scheduler.call(super().results, *args, endpoint="text", retry_on=(DuckDuckGoSearchException,), **kwargs)
+
+    return ScheduledDuckDuckGoSearch(max_results = 100)
+
+@lru_cache(maxsize=None)
+def get_ddg_tool():
+    from langchain.tools.ddg_search.tool import DuckDuckGoSearchResults
+
+    return DuckDuckGoSearchResults(api_wrapper=get_ddg_search(), max_results = 100)
 
 query = "XR in Business Applications"
 description = """
@@ -58,25 +150,244 @@ This report will document your journey through the XR literature, key trends, an
 
 @lru_cache 
 def web_search(query: str, num_results: int):
-    results = ddg_search.results(query, num_results)
+    results = get_ddg_search().results(query, num_results)
     return [{"link": r["link"], "title": r["title"]} for r in results]
 
-def search_paper(keyword: str, field_of_study: str):
+def _s2_request(method: str, url: str, endpoint: str, span_attributes: dict, **kwargs) -> requests.Response:
+    """
+    Sends one Semantic Scholar request through s2_scheduler.
+
+    Throttled (429), failed (5xx) and unreachable attempts are retried, each attempt counted
+    and timed on its own.
+
+    Raises:
+        requests.HTTPError: When the last attempt still failed.
+        requests.RequestException: When the server could not be reached.
+        DeadlineExceeded: When the request could not get its turn in time.
+    """
+    headers = {
+        'x-api-key': get_secret("SEMANTIC_SCHOLAR_API")
+    }
+
+    def attempt() -> requests.Response:
+        with span(f"s2_{endpoint}", **span_attributes) as request_span:
+            response = http_session.request(method, url, headers=headers, timeout=REQUEST_TIMEOUT, **kwargs)
+            request_span.set(status=response.status_code, bytes=len(response.content))
+        count("http_requests", endpoint=endpoint, status=response.status_code)
+        count("http_response_bytes", len(response.content), endpoint=endpoint)
+        return response
+
+    response = s2_scheduler.call(attempt, endpoint=endpoint, retry_on=RETRYABLE_ERRORS)
+    response.raise_for_status()
+    return response
+
+def fetch_search_page(
+    keyword: str,
+    field_of_study: str,
+    offset: int = 0,
+    limit: int = DEFAULT_PAGE_SIZE,
+    fields: str = PAPER_FIELDS,
+    year: str | None = None,
+    use_cache: bool = True,
+) -> dict:
+    """
+    Fetches one page of the Semantic Scholar paper search.
+
+    Args:
+        keyword (str): The search query.
+        field_of_study (str): Comma separated list of fields of study, empty for all.
+        offset (int, optional): Rank of the first result. Defaults to 0.
+        limit (int, optional): Results on the page, at most MAX_PAGE_SIZE. Defaults to DEFAULT_PAGE_SIZE.
+        fields (str, optional): The paper fields to return. Defaults to PAPER_FIELDS.
+        year (str | None, optional): A year filter such as "2019-" or "2015-2020". Defaults to None.
+        use_cache (bool, optional): Whether to go through the response cache. Defaults to True.
+
+    Returns:
+        dict: The decoded response with "total", "offset", "data" and "next" when more results exist.
+
+    Raises:
+        requests.RequestException: When Semantic Scholar kept failing, see _s2_request.
+        ValueError: When a successful response carries no papers and is not an empty result.
+    """
     data = {
         "query": keyword,
         "fieldsOfStudy": field_of_study,
-        "fields": "title,year,authors,abstract,citationCount,references,citations,s2FieldsOfStudy,url,publicationDate,journal,referenceCount,citationStyles,fieldsOfStudy",
-        "limit": 20
-    }
-    BASE_URL = f"https://api.semanticscholar.org/graph/v1/paper/search?query={data['query']}&fieldsOfStudy={data['fieldsOfStudy']}&fields={data['fields']}&limit={data['limit']}"
-    payload = {}
-    headers = {
-        'x-api-key': st.secrets["SEMANTIC_SCHOLAR_API"]
+        "fields": fields,
+        "limit": limit
     }
+    if offset:
+        data["offset"] = offset
+    if year:
+        data["year"] = year
+    if use_cache and (cached := response_cache.get(data)) is not None:
+        count("cache_lookups", cache="s2_response", result="hit")
+        return cached
+    count("cache_lookups", cache="s2_response", result="miss")
 
-    response = requests.request("GET", BASE_URL, headers=headers, data=payload)
-    
-    return response.json()
+    # requests encodes the parameters, keywords may contain spaces, '&' or '#'
+    params = {name: value for name, value in data.items() if value != ""}
+    result = _s2_request("GET", SEARCH_URL, "search", {"keyword": keyword, "offset": offset}, params=params).json()
+    if "data" not in result and result.get("total") != 0:
+        # a 200 without papers is an error body unless it reports no results at all; never cache it
+        raise ValueError(f"Semantic Scholar returned no papers for {keyword!r} at offset {offset}: {result}")
+    if use_cache:
+        response_cache.set(data, result)
+
+    return result
+
+def search_paper(keyword: str, field_of_study: str, use_cache: bool = True):
+    return fetch_search_page(keyword, field_of_study, use_cache=use_cache)
+
+async def iter_papers(
+    keyword: str,
+    field_of_study: str,
+    max_papers: int = 100,
+    page_size: int = DEFAULT_PAGE_SIZE,
+    max_rank: int = MAX_SEARCH_RESULTS,
+    min_year: int | None = None,
+    is_relevant: Callable[[dict], bool] | None = None,
+    seen: set[str] | None = None,
+    fields: str = PAPER_FIELDS,
+    stats: dict | None = None,
+) -> AsyncIterator[dict]:
+    """
+    Pages through the search results of a keyword, one page in memory at a time.
+
+    Iteration stops as soon as `max_papers` unique papers accepted by `is_relevant` were yielded,
+    when the next page would start past relevance rank `max_rank`, or when the results run out.
+    Papers older than `min_year` are filtered out by the API itself.
+
+    Args:
+        keyword (str): The search query.
+        field_of_study (str): Comma separated list of fields of study, empty for all.
+        max_papers (int, optional): Unique relevant papers to collect. Defaults to 100.
+        page_size (int, optional): Results per request, at most MAX_PAGE_SIZE. Defaults to DEFAULT_PAGE_SIZE.
+        max_rank (int, optional): Do not look past this many results, ranked by relevance. Defaults to MAX_SEARCH_RESULTS.
+        min_year (int | None, optional): Oldest publication year to keep. Defaults to None.
+        is_relevant (Callable[[dict], bool] | None, optional): Extra filter on each paper. Defaults to None.
+        seen (set[str] | None, optional): paperIds to skip, updated in place, e.g. shared across keywords. Defaults to None.
+        fields (str, optional): The paper fields to return. Defaults to PAPER_FIELDS.
+        stats (dict | None, optional): Filled with the reported "total" and the number of "pages" fetched. Defaults to None.
+
+    Yields:
+        dict: Each new paper, in relevance order.
+    """
+    seen = set() if seen is None else seen
+    stats = {} if stats is None else stats
+    stats.setdefault("pages", 0)
+    year = f"{min_year}-" if min_year is not None else None
+    max_rank = min(max_rank, MAX_SEARCH_RESULTS)
+    offset = 0
+    collected = 0
+    while collected < max_papers and offset < max_rank:
+        limit = min(page_size, MAX_PAGE_SIZE, max_rank - offset)
+        page = await asyncio.to_thread(fetch_search_page, keyword, field_of_study, offset, limit, fields, year)
+        stats["pages"] += 1
+        stats.setdefault("total", page.get("total", 0))
+        papers = page.get("data") or []
+        for paper in papers:
+            if paper["paperId"] in seen or (is_relevant is not None and not is_relevant(paper)):
+                continue
+            seen.add(paper["paperId"])
+            collected += 1
+            yield paper
+            if collected >= max_papers:
+                return
+        if not papers or "next" not in page:
+            return
+        offset = page["next"]
+
+def search_paper_pages(keyword: str, field_of_study: str, max_papers: int = DEFAULT_PAGE_SIZE, **kwargs) -> dict:
+    """
+    Collects up to `max_papers` papers of a keyword across pages, shaped like a single search response.
+
+    Args:
+        keyword (str): The search query.
+        field_of_study (str): Comma separated list of fields of study, empty for all.
+        max_papers (int, optional): Unique relevant papers to collect. Defaults to DEFAULT_PAGE_SIZE.
+        **kwargs: Passed on to iter_papers.
+
+    Returns:
+        dict: "total" as reported by the API, "offset" 0 and the collected papers under "data".
+    """
+    stats = {}
+
+    async def collect():
+        return [paper async for paper in iter_papers(keyword, field_of_study, max_papers, stats=stats, **kwargs)]
+
+    papers = asyncio.run(collect())
+    return {"total": stats.get("total", 0), "offset": 0, "data": papers}
+
+def hydrate_papers(paper_ids: list[str], fields: str = PAPER_FIELDS, use_cache: bool = True) -> dict[str, dict]:
+    """
+    Fetches the full details of papers found with LIGHT_PAPER_FIELDS through the /paper/batch endpoint.
+
+    Papers are cached one by one, and only uncached ids are requested, MAX_BATCH_IDS per call.
+
+    Args:
+        paper_ids (list[str]): The Semantic Scholar paperIds, typically after deduplication.
+        fields (str, optional): The paper fields to return. Defaults to PAPER_FIELDS.
+        use_cache (bool, optional): Whether to go through the response cache. Defaults to True.
+
+    Returns:
+        dict[str, dict]: Each known paperId mapped to its paper; ids unknown to Semantic Scholar are left out.
+
+    Raises:
+        requests.RequestException: When Semantic Scholar kept failing, see _s2_request.
+    """
+    papers = {}
+    missing = []
+    for paper_id in dict.fromkeys(paper_ids):
+        if use_cache and (cached := response_cache.get({"paperId": paper_id, "fields": fields})) is not None:
+            papers[paper_id] = cached
+        else:
+            missing.append(paper_id)
+
+    for start in range(0, len(missing), MAX_BATCH_IDS):
+        chunk = missing[start : start + MAX_BATCH_IDS]
+        response = _s2_request("POST", BATCH_URL, "batch", {"papers": len(chunk)}, params={"fields": fields}, json={"ids": chunk})
+        for paper_id, paper in zip(chunk, response.json()):
+            if paper is None:
+                continue
+            papers[paper_id] = paper
+            if use_cache:
+                response_cache.set({"paperId": paper_id, "fields": fields}, paper)
+    return papers
+
+def hydrate_in_background(paper_ids: list[str], fields: str = PAPER_FIELDS) -> Future:
+    """
+    Starts hydrate_papers on a background thread, in the scheduler session of the caller.
+
+    Returns:
+        Future: Resolves to the dict returned by hydrate_papers.
+    """
+    return hydration_executor.submit(contextvars.copy_context().run, hydrate_papers, list(paper_ids), fields)
+
+def search_papers_concurrently(
+    keyword_list: list[str],
+    field_of_study: str,
+    max_workers: int = MAX_CONCURRENT_REQUESTS,
+    search_func: Callable[[str, str], dict] = search_paper,
+) -> Iterator[tuple[str, dict]]:
+    """
+    Searches every keyword with a bounded thread pool, each in a copy of the caller's context
+    so the requests stay in the caller's scheduler session.
+
+    Args:
+        keyword_list (list[str]): The keywords to search for.
+        field_of_study (str): Comma separated list of fields of study.
+        max_workers (int, optional): Maximum number of requests in flight. Defaults to MAX_CONCURRENT_REQUESTS.
+        search_func (Callable[[str, str], dict], optional): The function doing a single search. Defaults to search_paper.
+
+    Yields:
+        tuple[str, dict]: The keyword and its search response, in completion order.
+    """
+    if not keyword_list:
+        return
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(keyword_list))) as executor:
+        futures = {executor.submit(contextvars.copy_context().run, search_func, keyword, field_of_study): keyword for keyword in keyword_list}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
 
 
 """